@@ -0,0 +1,205 @@
+"""
+Bus inter-workers pour les événements temps réel
+
+Chaque worker livre d'abord ses propres événements à ses connexions locales,
+puis les confie au bus pour les autres workers. Deux implémentations :
+
+- `LocalBackplane` : un seul worker, rien à propager.
+- `MongoBackplane` : aucun broker externe. Les événements sont regroupés en
+  lots (toutes les `batch_ms` ms ou dès `max_batch` événements) et chaque lot
+  est inséré comme un document dans une collection plafonnée. Chaque worker
+  suit cette collection avec un curseur tailable et ignore ses propres lots.
+
+Chaque lot porte l'identifiant du worker émetteur et un numéro de séquence
+croissant. Les ObjectId de workers différents ne sont pas ordonnés au sein
+d'une même seconde : à la reprise, le curseur relit donc une fenêtre de
+`RESUME_WINDOW` avant le dernier lot lu et écarte les lots déjà livrés d'après
+leur séquence. Un trou dans la séquence (collection plafonnée recyclée avant
+lecture, curseur perdu) est signalé aux clients par un événement `resync`,
+qui les invite à recharger l'état par l'API REST.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "realtime_events"
+RESYNC_EVENT = {"type": "resync"}
+# Fenêtre relue à la reprise (ordre des ObjectId entre workers, décalage d'horloge)
+RESUME_WINDOW = timedelta(seconds=60)
+
+
+class LocalBackplane:
+    """Un seul worker : les événements sont déjà livrés localement"""
+
+    async def start(self, db, deliver: Callable, broadcast: Callable):
+        pass
+
+    def publish(self, channel: str, event: dict):
+        pass
+
+    async def stop(self):
+        pass
+
+    def snapshot(self) -> dict:
+        return {"kind": "local"}
+
+
+class MongoBackplane:
+    def __init__(self, batch_ms: int = 20, max_batch: int = 500, size_mb: int = 64):
+        self.node_id = uuid.uuid4().hex
+        self.batch_interval = batch_ms / 1000
+        self.max_batch = max_batch
+        self.size_bytes = size_mb * 1024 * 1024
+        self.collection = None
+        self.deliver: Optional[Callable] = None
+        self.broadcast: Optional[Callable] = None
+        self.pending: List[Tuple[str, dict]] = []
+        self.seq = 0
+        self.last_seen: Dict[str, int] = {}  # worker -> dernière séquence reçue
+        self.last_id = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks: List[asyncio.Task] = []
+        self.metrics = {
+            "published": 0,
+            "batches_sent": 0,
+            "send_failures": 0,
+            "batches_received": 0,
+            "events_received": 0,
+            "gaps": 0,
+            "last_receive_lag_ms": 0.0,
+        }
+
+    async def start(self, db, deliver: Callable, broadcast: Callable):
+        self.deliver = deliver
+        self.broadcast = broadcast
+        try:
+            await db.create_collection(COLLECTION, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass
+        self.collection = db[COLLECTION]
+        # On ne rejoue pas l'historique : les lots de la fenêtre de reprise sont
+        # marqués comme vus sans être livrés
+        newest = await self.collection.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+        self.last_id = newest["_id"] if newest else None
+        async for doc in self.collection.find(self._resume_query(), {"origin": 1, "seq": 1}):
+            origin = doc.get("origin")
+            self.last_seen[origin] = max(self.last_seen.get(origin, 0), doc.get("seq", 0))
+        self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._tail_loop())]
+
+    def publish(self, channel: str, event: dict):
+        if self.collection is None:
+            return
+        self.pending.append((channel, event))
+        self.metrics["published"] += 1
+        if len(self.pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def flush(self):
+        while self.pending:
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            self.seq += 1
+            try:
+                await self.collection.insert_one({
+                    "origin": self.node_id,
+                    "seq": self.seq,
+                    "sentAt": time.time(),
+                    "events": [{"channel": channel, "event": event} for channel, event in batch],
+                })
+                self.metrics["batches_sent"] += 1
+            except Exception as e:
+                # Le numéro consommé produira un trou côté récepteurs, donc un resync
+                self.metrics["send_failures"] += 1
+                logger.error(f"Backplane publish failed ({len(batch)} events): {e}")
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.batch_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def receive(self, doc: dict):
+        self.last_id = doc["_id"]
+        origin = doc.get("origin")
+        if origin == self.node_id:
+            return
+        seq = doc.get("seq", 0)
+        previous = self.last_seen.get(origin)
+        if previous is not None and seq <= previous:
+            # Déjà livré : relu dans la fenêtre de reprise
+            return
+        self.last_seen[origin] = seq
+        if previous is not None and seq != previous + 1:
+            self.metrics["gaps"] += 1
+            logger.warning(f"Backplane gap from {origin}: expected {previous + 1}, got {seq}")
+            self.broadcast(RESYNC_EVENT)
+
+        self.metrics["batches_received"] += 1
+        self.metrics["last_receive_lag_ms"] = round((time.time() - doc.get("sentAt", time.time())) * 1000, 1)
+        for item in doc.get("events", []):
+            self.metrics["events_received"] += 1
+            self.deliver(item["channel"], item["event"])
+
+    def _resume_query(self) -> dict:
+        if self.last_id is None:
+            return {}
+        since = self.last_id.generation_time - RESUME_WINDOW
+        return {"_id": {"$gte": ObjectId.from_datetime(since)}}
+
+    async def _tail_loop(self):
+        while True:
+            cursor = self.collection.find(self._resume_query(), cursor_type=CursorType.TAILABLE_AWAIT).max_await_time_ms(1000)
+            try:
+                while cursor.alive:
+                    async for doc in cursor:
+                        self.receive(doc)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Backplane tail failed: {e}")
+                # Des lots ont pu être perdus pendant l'interruption
+                self.broadcast(RESYNC_EVENT)
+            # Curseur mort (collection vide ou recyclée) : on le recrée
+            await asyncio.sleep(self.batch_interval * 10)
+
+    async def stop(self):
+        # La boucle d'envoi termine l'insertion en cours au lieu d'être annulée en plein vol
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks[1:]:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(self._tasks[0], return_exceptions=True)
+        if self.collection is not None:
+            await self.flush()
+
+    def snapshot(self) -> dict:
+        return {
+            "kind": "mongo",
+            "node": self.node_id,
+            "seq": self.seq,
+            "pending": len(self.pending),
+            "peers": len(self.last_seen),
+            **self.metrics,
+        }
+
+
+def create_backplane(kind: str, **options):
+    if kind == "mongo":
+        return MongoBackplane(**options)
+    if kind == "local":
+        # Options de lot sans objet pour un seul worker
+        return LocalBackplane()
+    raise ValueError(f"Unknown realtime backplane: {kind}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de la sérialisation des listes
+
+Compare, par élément, le chemin historique (modèle Pydantic par document puis
+validation et sérialisation par le response_model de FastAPI, JSONResponse) au
+chemin rapide (dictionnaire construit depuis le document, encodé par fast_json).
+
+Usage : python bench_serialization.py [--items 20] [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+
+# server.py exige une configuration Mongo ; aucune connexion n'est ouverte ici
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'cuisino_bench')
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import fast_json
+import server
+
+
+def make_recipe(i: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "title": f"Tarte aux pommes {i}",
+        "description": "Une tarte croustillante et fondante, parfaite pour le goûter.",
+        "ingredients": [f"{k * 50}g d'ingrédient numéro {k}" for k in range(12)],
+        "instructions": [f"Étape {k} : mélanger délicatement puis laisser reposer dix minutes." for k in range(8)],
+        "image": f"/api/media/{'a' * 64}",
+        "imageBlurhash": "LEHV6nWB2yk8pyo0adR*.7kCMdnj",
+        "author": {"id": str(ObjectId()), "name": "Camille Martin", "avatar": f"/api/media/{'b' * 64}"},
+        "likes": i * 3,
+        "createdAt": datetime(2024, 5, 1) + timedelta(minutes=i),
+        "servings": 4,
+        "prepTimeMinutes": 45,
+        "difficulty": "medium",
+        "tags": ["dessert", "fruits", "automne"],
+    }
+
+
+def make_message(i: int, conversation_id: ObjectId) -> dict:
+    return {
+        "_id": ObjectId(),
+        "content": f"Message numéro {i} : tu as testé la recette ?",
+        "conversationId": conversation_id,
+        "senderId": str(ObjectId()),
+        "sender": {"id": str(ObjectId()), "name": "Camille Martin", "avatar": f"/api/media/{'b' * 64}"},
+        "createdAt": datetime(2024, 5, 1) + timedelta(seconds=i),
+    }
+
+
+async def pydantic_path(field, build, docs) -> bytes:
+    content = await serialize_response(field=field, response_content=[build(doc) for doc in docs], is_coroutine=True)
+    return JSONResponse(content).body
+
+
+def fast_path(build, docs) -> bytes:
+    return fast_json.FastJSONResponse([build(doc) for doc in docs]).body
+
+
+async def measure(label: str, model, build_model, build_item, docs, rounds: int):
+    field = create_response_field(name="Response", type_=List[model])
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await pydantic_path(field, build_model, docs)
+    before = (time.perf_counter() - started) / (rounds * len(docs)) * 1e6
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fast_path(build_item, docs)
+    after = (time.perf_counter() - started) / (rounds * len(docs)) * 1e6
+
+    print(f"📊 {label:<10} Pydantic : {before:7.1f} µs/élément   rapide : {after:6.1f} µs/élément   (x{before / after:.1f})")
+
+
+def message_doc_to_out(msg: dict) -> server.MessageOut:
+    # Construction historique de get_messages
+    return server.MessageOut(
+        id=str(msg["_id"]),
+        content=msg["content"],
+        conversationId=str(msg["conversationId"]),
+        senderId=msg["senderId"],
+        sender=msg["sender"],
+        createdAt=msg["createdAt"],
+    )
+
+
+async def main(items: int, rounds: int):
+    print(f"⏱️  Sérialisation de listes de {items} éléments, {rounds} tours")
+    recipes = [make_recipe(i) for i in range(items)]
+    conversation_id = ObjectId()
+    messages = [make_message(i, conversation_id) for i in range(items)]
+
+    await measure("recettes", server.RecipeOut, server.recipe_doc_to_out, server.recipe_doc_to_item, recipes, rounds)
+    await measure("messages", server.MessageOut, message_doc_to_out, server.message_doc_to_item, messages, rounds)
+
+    # Même contenu JSON sur les deux chemins
+    field = create_response_field(name="Response", type_=List[server.RecipeOut])
+    same = fast_json.orjson.loads(await pydantic_path(field, server.recipe_doc_to_out, recipes)) == \
+        fast_json.orjson.loads(fast_path(server.recipe_doc_to_item, recipes))
+    print(f"{'✅' if same else '❌'} Réponses identiques")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.rounds))
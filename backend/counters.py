@@ -0,0 +1,127 @@
+"""
+Tampon d'écriture différée pour les compteurs de likes des recettes
+
+Les incréments sont agrégés par recette en mémoire puis appliqués en un seul
+`bulk_write` toutes les `interval_ms` millisecondes, ou dès que `max_events`
+incréments sont en attente. Une recette virale ne reçoit ainsi qu'une écriture
+par intervalle au lieu d'une par like. Les documents d'appartenance
+(user_likes) restent écrits de façon synchrone par les handlers.
+
+Pendant l'écriture, le lot en cours reste visible de `pending_delta` ; en cas
+d'échec partiel, seules les opérations refusées sont réinjectées.
+
+Contrat de dérive bornée : le compteur stocké peut être en retard d'au plus un
+intervalle de flush sur les documents d'appartenance, et chaque worker
+n'ajoute que ses propres deltas en attente aux valeurs qu'il renvoie. Un arrêt
+brutal perd les deltas non écrits ; reconcile_counters.reconcile_likes,
+planifié par le serveur, réécrit ensuite le compteur depuis user_likes.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    def __init__(self, collection, field: str, interval_ms: int = 500, max_events: int = 500):
+        self.collection = collection
+        self.field = field
+        self.interval = interval_ms / 1000
+        self.max_events = max_events
+        self.pending: Dict = {}
+        self.in_flight: Dict = {}
+        self.pending_events = 0
+        self.oldest_pending_at = None
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self.metrics = {
+            "flushes": 0,
+            "events": 0,
+            "writes": 0,
+            "failures": 0,
+            "last_flush_lag_ms": 0.0,
+            "max_flush_lag_ms": 0.0,
+            "last_flush_duration_ms": 0.0,
+        }
+
+    def add(self, key, delta: int):
+        self.pending[key] = self.pending.get(key, 0) + delta
+        self.pending_events += 1
+        self.metrics["events"] += 1
+        if self.oldest_pending_at is None:
+            self.oldest_pending_at = time.monotonic()
+        if self.pending_events >= self.max_events:
+            self._wakeup.set()
+
+    def pending_delta(self, key) -> int:
+        return self.pending.get(key, 0) + self.in_flight.get(key, 0)
+
+    def _requeue(self, batch: Dict):
+        for key, delta in batch.items():
+            self.add(key, delta)
+            self.metrics["events"] -= 1
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            oldest, self.oldest_pending_at = self.oldest_pending_at, None
+            self.pending_events = 0
+
+            started = time.monotonic()
+            keys = [key for key, delta in batch.items() if delta]
+            requests = [UpdateOne({"_id": key}, {"$inc": {self.field: batch[key]}}) for key in keys]
+            self.in_flight = batch
+            try:
+                if requests:
+                    await self.collection.bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                # Lot non ordonné : les autres écritures sont appliquées, seules les refusées sont réinjectées
+                failed = {keys[error["index"]] for error in e.details.get("writeErrors", [])}
+                self.metrics["failures"] += 1
+                self.in_flight = {}
+                self._requeue({key: batch[key] for key in failed})
+                logger.error(f"Counter flush partially failed ({len(failed)} of {len(requests)} writes): {e}")
+                return
+            except Exception as e:
+                # Aucune réponse du serveur : réinjecter tous les deltas pour le prochain passage
+                self.metrics["failures"] += 1
+                self.in_flight = {}
+                self._requeue(batch)
+                logger.error(f"Counter flush failed ({len(requests)} writes): {e}")
+                return
+            self.in_flight = {}
+
+            finished = time.monotonic()
+            lag_ms = (finished - oldest) * 1000 if oldest is not None else 0.0
+            self.metrics["flushes"] += 1
+            self.metrics["writes"] += len(requests)
+            self.metrics["last_flush_lag_ms"] = round(lag_ms, 1)
+            self.metrics["max_flush_lag_ms"] = round(max(self.metrics["max_flush_lag_ms"], lag_ms), 1)
+            self.metrics["last_flush_duration_ms"] = round((finished - started) * 1000, 1)
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def snapshot(self) -> dict:
+        lag = (time.monotonic() - self.oldest_pending_at) * 1000 if self.oldest_pending_at is not None else 0.0
+        return {
+            **self.metrics,
+            "pending_keys": len(self.pending),
+            "pending_events": self.pending_events,
+            "current_lag_ms": round(lag, 1),
+            "interval_ms": self.interval * 1000,
+            "max_events": self.max_events,
+        }
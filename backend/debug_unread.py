@@ -57,19 +57,21 @@ async def debug_unread_messages():
                 else:
                     user_id = participant_id
                 
-                unread_count = await db.messages.count_documents({
-                    "conversationId": conv["_id"],
-                    "senderId": {"$ne": str(user_id)},
-                    "readAt": {"$exists": False}
-                })
-                print(f"   📖 Messages non lus pour {user_id}: {unread_count}")
+                # Non lus : messages reçus après la marque de lecture du participant
+                unread_query = {"conversationId": conv["_id"], "senderId": {"$ne": str(user_id)}}
+                watermark = (conv.get("reads") or {}).get(str(user_id))
+                if watermark:
+                    print(f"   🔖 Marque de lecture de {user_id}: {watermark['lastReadMessageId']} ({watermark['lastReadAt']})")
+                    unread_query["$or"] = [
+                        {"createdAt": {"$gt": watermark["lastReadAt"]}},
+                        {"createdAt": watermark["lastReadAt"], "_id": {"$gt": watermark["lastReadMessageId"]}},
+                    ]
+                unread_count = await db.messages.count_documents(unread_query)
+                stored = (conv.get("unread") or {}).get(str(user_id), 0)
+                print(f"   📖 Messages non lus pour {user_id}: {unread_count} (compteur: {stored})")
                 
                 # Afficher les messages non lus
-                unread_messages = await db.messages.find({
-                    "conversationId": conv["_id"],
-                    "senderId": {"$ne": str(user_id)},
-                    "readAt": {"$exists": False}
-                }).to_list(100)
+                unread_messages = await db.messages.find(unread_query).to_list(100)
                 
                 for msg in unread_messages:
                     print(f"     - Message non lu: '{msg['content'][:50]}...' de {msg['senderId']}")
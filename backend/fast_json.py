@@ -0,0 +1,32 @@
+"""
+Sérialisation rapide des listes chaudes (fil, commentaires, messages, conversations)
+
+Les handlers construisent des dictionnaires simples à partir des documents Mongo,
+dans l'ordre et avec les types des modèles Pydantic correspondants, et renvoient
+directement une FastJSONResponse : FastAPI ne revalide pas la réponse (le
+`response_model` de la route ne sert plus qu'au schéma OpenAPI) et orjson encode
+le tout en une passe, ObjectId compris.
+"""
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from starlette.responses import Response
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    # Dates naïves sérialisées comme Pydantic : ISO 8601 sans fuseau
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
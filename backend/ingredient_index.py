@@ -0,0 +1,135 @@
+"""
+Index inversé ingrédient -> recettes pour la recherche « avec ce que j'ai »
+
+Chaque ligne d'ingrédient d'une recette reçoit un identifiant croissant.
+Pour chaque terme normalisé (quantités et unités retirées, accents supprimés,
+raciniseur de search_index) on garde la liste triée des lignes qui le
+contiennent, dans un `array('I')` compact lu sans copie par NumPy.
+
+Un ingrédient du garde-manger couvre une ligne si tous ses termes y figurent ;
+la couverture d'une recette est le nombre de lignes couvertes.
+"""
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from search_index import STOPWORDS, TOKEN_RE, fold, stem
+
+UNITS = {
+    "g", "gr", "kg", "mg", "ml", "cl", "dl", "l", "litre", "liter", "oz", "lb",
+    "c", "cs", "cc", "cuillere", "cuilleres", "tbsp", "tsp", "tablespoon", "teaspoon",
+    "tasse", "tasses", "cup", "cups", "pincee", "pincees", "pinch", "verre", "verres",
+    "tranche", "tranches", "slice", "slices", "gousse", "gousses", "clove", "cloves",
+    "morceau", "morceaux", "piece", "pieces", "boite", "boites", "can", "sachet",
+    "soupe", "cafe", "grand", "grande", "petit", "petite", "gros", "grosse", "environ",
+}
+
+
+def ingredient_terms(text: str) -> List[str]:
+    tokens = TOKEN_RE.findall(fold(text))
+    return [
+        stem(token) for token in tokens
+        if not token.isdigit() and not token[0].isdigit()
+        and token not in UNITS and token not in STOPWORDS and len(token) > 1
+    ]
+
+
+def ingredient_name(text: str) -> str:
+    """Nom lisible d'un ingrédient : « 200g de chocolat noir » -> « chocolat noir »"""
+    words = text.strip().lower().split()
+    while words:
+        folded = fold(words[0]).rstrip(".,")
+        if folded[:1].isdigit() or folded in UNITS or folded in STOPWORDS or folded in {"a", "d", "l"}:
+            words.pop(0)
+        else:
+            break
+    name = " ".join(words)
+    for elision in ("d'", "l'", "d’", "l’"):
+        if name.startswith(elision):
+            name = name[len(elision):]
+    return name.strip(" ,.")
+
+
+class IngredientIndex:
+    def __init__(self):
+        self.doc_ids: List = []                # docno -> recipe ObjectId
+        self.docnos: Dict = {}                 # recipe ObjectId -> docno
+        self.postings: Dict[str, array] = {}   # terme -> lignes triées
+        self.line_doc = array("I")             # ligne -> docno
+        self.line_text: List[str] = []         # ligne -> texte d'origine
+        self.doc_first_line = array("I")       # docno -> première ligne
+        self.doc_lines = array("I")            # docno -> nombre de lignes
+        self.alive = bytearray()
+        self.watermark = None
+
+    def __len__(self):
+        return sum(self.alive)
+
+    def add(self, doc: dict):
+        recipe_id = doc["_id"]
+        if recipe_id in self.docnos:
+            return
+        docno = len(self.doc_ids)
+        self.doc_ids.append(recipe_id)
+        self.docnos[recipe_id] = docno
+
+        ingredients = doc.get("ingredients") or []
+        self.doc_first_line.append(len(self.line_doc))
+        for text in ingredients:
+            line = len(self.line_doc)
+            self.line_doc.append(docno)
+            self.line_text.append(text)
+            for term in set(ingredient_terms(text)):
+                self.postings.setdefault(term, array("I")).append(line)
+        self.doc_lines.append(len(ingredients))
+        self.alive.append(1)
+
+    def remove(self, recipe_id):
+        docno = self.docnos.get(recipe_id)
+        if docno is not None:
+            self.alive[docno] = 0
+
+    def _matching_lines(self, pantry_item: str) -> Optional[np.ndarray]:
+        terms = set(ingredient_terms(pantry_item))
+        if not terms or any(term not in self.postings for term in terms):
+            return None
+        # Intersection en commençant par la liste la plus courte
+        lists = sorted((self.postings[term] for term in terms), key=len)
+        lines = np.frombuffer(lists[0], dtype=np.uint32)
+        for postings in lists[1:]:
+            lines = np.intersect1d(lines, np.frombuffer(postings, dtype=np.uint32), assume_unique=True)
+            if not len(lines):
+                return None
+        return lines
+
+    def match(
+        self, pantry: List[str], limit: int = 20, max_missing: Optional[int] = None
+    ) -> List[Tuple]:
+        """Retourne [(recipeId, nb couvertes, ingrédients manquants)] triés par couverture"""
+        matched = [lines for lines in map(self._matching_lines, pantry) if lines is not None]
+        if not matched:
+            return []
+
+        lines = np.unique(np.concatenate(matched))
+        line_doc = np.frombuffer(self.line_doc, dtype=np.uint32)
+        docnos, matched_counts = np.unique(line_doc[lines], return_counts=True)
+
+        alive = np.frombuffer(self.alive, dtype=np.uint8)[docnos].astype(bool)
+        docnos, matched_counts = docnos[alive], matched_counts[alive]
+        missing_counts = np.frombuffer(self.doc_lines, dtype=np.uint32)[docnos].astype(np.int64) - matched_counts
+        if max_missing is not None:
+            keep = missing_counts <= max_missing
+            docnos, matched_counts, missing_counts = docnos[keep], matched_counts[keep], missing_counts[keep]
+
+        # Moins d'ingrédients manquants d'abord, puis le plus d'ingrédients couverts
+        order = np.lexsort((-matched_counts, missing_counts))[:limit]
+        results = []
+        for i in order:
+            docno = int(docnos[i])
+            first = self.doc_first_line[docno]
+            doc_lines = np.arange(first, first + self.doc_lines[docno])
+            positions = np.minimum(np.searchsorted(lines, doc_lines), len(lines) - 1)
+            missing = [self.line_text[line] for line in doc_lines[lines[positions] != doc_lines]]
+            results.append((self.doc_ids[docno], int(matched_counts[i]), missing))
+        return results
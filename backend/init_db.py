@@ -69,12 +69,37 @@ async def init_database():
     
     # Index pour recipes (si pas déjà créés)
     await db.recipes.create_index([("createdAt", -1)])
+    # Index composé pour la pagination par curseur (keyset) du fil principal
+    await db.recipes.create_index([("createdAt", -1), ("_id", -1)])
     await db.recipes.create_index([("author.id", 1), ("createdAt", -1)])
+    await db.recipes.create_index([("authorId", 1), ("createdAt", -1)])
     print("✅ Index créés pour la collection 'recipes'")
     
+    # Index pour follows et le fil d'abonnements (timelines)
+    await db.follows.create_index([("followerId", 1), ("followingId", 1)], unique=True)
+    await db.follows.create_index([("followingId", 1)])
+    await db.timelines.create_index([("userId", 1), ("createdAt", -1), ("recipeId", -1)])
+    await db.timelines.create_index([("userId", 1), ("recipeId", 1)], unique=True)
+    await db.timelines.create_index([("recipeId", 1)])
+    await db.timelines.create_index([("userId", 1), ("authorId", 1)])
+    print("✅ Index créés pour les collections 'follows' et 'timelines'")
+    
+    # Index pour le classement des tendances
+    await db.recipe_scores.create_index([("score", -1)])
+    await db.trending_recipes.create_index([("rank", 1)])
+    await db.user_likes.create_index([("createdAt", 1), ("_id", 1)])
+    await db.user_saves.create_index([("createdAt", 1), ("_id", 1)])
+    await db.comments.create_index([("createdAt", 1), ("_id", 1)])
+    # Retraits de likes et sauvegardes : lus par le job puis expirés
+    await db.engagement_removals.create_index([("createdAt", 1)], expireAfterSeconds=7 * 24 * 3600)
+    print("✅ Index créés pour les tendances")
+    
     # Index pour users
     await db.users.create_index([("email", 1)], unique=True)
     await db.users.create_index([("username", 1)], unique=True)
+    await db.users.create_index([("searchKeys", 1), ("followersCount", -1)])
+    # Synchronisation du cache des utilisateurs authentifiés entre workers
+    await db.users.create_index([("principalVersion", 1)])
     print("✅ Index créés pour la collection 'users'")
     
     # Index pour user_likes et user_saves
@@ -82,6 +107,16 @@ async def init_database():
     await db.user_saves.create_index([("userId", 1), ("recipeId", 1)], unique=True)
     print("✅ Index créés pour les collections 'user_likes' et 'user_saves'")
     
+    # Index pour les envois reprenables (nettoyage des sessions expirées)
+    await db.upload_sessions.create_index([("expiresAt", 1)])
+    print("✅ Index créé pour la collection 'upload_sessions'")
+    
+    # Index pour les jetons de rafraîchissement (expiration automatique, révocation)
+    await db.refresh_tokens.create_index([("expiresAt", 1)], expireAfterSeconds=0)
+    await db.refresh_tokens.create_index([("familyId", 1)])
+    await db.refresh_tokens.create_index([("userId", 1)])
+    print("✅ Index créés pour la collection 'refresh_tokens'")
+    
     # Index pour comments
     await db.comments.create_index([("recipeId", 1), ("createdAt", -1)])
     await db.comments.create_index([("authorId", 1), ("createdAt", -1)])
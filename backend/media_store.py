@@ -0,0 +1,379 @@
+"""
+Stockage des médias (images de recettes, avatars) adressé par contenu
+
+Chaque fichier envoyé est identifié par le SHA-256 de ses octets : deux envois
+identiques ne sont stockés qu'une fois. L'original et ses miniatures WebP sont
+écrits sur disque sous MEDIA_ROOT/ab/cd/<id>.<variante>, les métadonnées
+(dimensions, type, blurhash) dans la collection `media`.
+
+Le décodage et le redimensionnement sont faits dans un pool de processus pour
+ne pas bloquer la boucle asyncio. Les recettes et utilisateurs ne stockent plus
+que la référence courte « /api/media/<id> ».
+
+Envois reprenables : une session (`upload_sessions`) reçoit des morceaux numérotés
+écrits directement à leur position dans MEDIA_ROOT/uploads/<session>.part, sans
+passer par la mémoire ; le fichier complet est ensuite haché et déplacé tel quel.
+Les sessions expirées sont supprimées par collect_abandoned_uploads.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import math
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+from pymongo.errors import DuplicateKeyError
+
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', Path(__file__).parent / 'media'))
+MAX_UPLOAD_BYTES = int(os.environ.get('MEDIA_MAX_BYTES', 10 * 1024 * 1024))
+
+UPLOADS_DIR = MEDIA_ROOT / "uploads"
+MAX_RESUMABLE_BYTES = int(os.environ.get('MEDIA_MAX_RESUMABLE_BYTES', 50 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = int(os.environ.get('MEDIA_CHUNK_BYTES', 1024 * 1024))
+UPLOAD_SESSION_TTL = timedelta(hours=int(os.environ.get('MEDIA_UPLOAD_TTL_HOURS', 24)))
+HASH_BLOCK_BYTES = 1024 * 1024
+
+VARIANT_SIZES = {"thumb": 160, "medium": 480, "large": 1080}
+VARIANTS = ("original",) + tuple(VARIANT_SIZES)
+WEBP_QUALITY = 80
+ALLOWED_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+MEDIA_PATH_PREFIX = "/api/media/"
+MEDIA_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+DATA_URI_RE = re.compile(r"^data:(image/[\w.+-]+)?(;[\w=-]+)*;base64,", re.IGNORECASE)
+
+BLURHASH_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+BLURHASH_COMPONENTS = (4, 3)
+
+
+class MediaError(ValueError):
+    pass
+
+
+def media_reference(media_id: str) -> str:
+    return MEDIA_PATH_PREFIX + media_id
+
+
+def media_id_from_reference(value: Optional[str]) -> Optional[str]:
+    if not value or not value.startswith(MEDIA_PATH_PREFIX):
+        return None
+    media_id = value[len(MEDIA_PATH_PREFIX):]
+    return media_id if MEDIA_ID_RE.match(media_id) else None
+
+
+def media_path(media_id: str, variant: str) -> Path:
+    return MEDIA_ROOT / media_id[:2] / media_id[2:4] / f"{media_id}.{variant}"
+
+
+def variant_etag(media_id: str, variant: str) -> str:
+    # Le contenu d'une variante est entièrement déterminé par l'original
+    return f'"{media_id}-{variant}"'
+
+
+# Blurhash (https://blurha.sh) : quelques composantes DCT encodées en base 83
+def _encode83(value: int, length: int) -> str:
+    return "".join(
+        BLURHASH_CHARS[(value // 83 ** (length - i - 1)) % 83] for i in range(length)
+    )
+
+
+def _srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    values = values / 255
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value: float) -> int:
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def encode_blurhash(pixels: np.ndarray, components: Tuple[int, int] = BLURHASH_COMPONENTS) -> str:
+    """Encode une image RGB (tableau hauteur x largeur x 3) en chaîne blurhash"""
+    x_components, y_components = components
+    height, width = pixels.shape[:2]
+    linear = _srgb_to_linear(pixels[:, :, :3].astype(np.float64))
+
+    cos_x = np.cos(np.pi * np.outer(np.arange(x_components), np.arange(width)) / width)
+    cos_y = np.cos(np.pi * np.outer(np.arange(y_components), np.arange(height)) / height)
+    # factors[j, i, canal] = somme des pixels pondérés par la base cosinus (i, j)
+    factors = np.einsum("jy,ix,yxc->jic", cos_y, cos_x, linear) / (width * height)
+    factors[1:, :] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    blurhash = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if len(ac):
+        quantised_max = max(0, min(82, math.floor(np.abs(ac).max() * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1
+    blurhash += _encode83(quantised_max, 1)
+    blurhash += _encode83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    )
+    quantised = np.clip(np.floor(np.sign(ac) * np.abs(ac / max_value) ** 0.5 * 9 + 9.5), 0, 18).astype(int)
+    for r, g, b in quantised:
+        blurhash += _encode83(int(r) * 19 * 19 + int(g) * 19 + int(b), 2)
+    return blurhash
+
+
+def render_variants(source: Union[bytes, str]) -> dict:
+    """Décode l'image (octets ou chemin) et produit ses miniatures ; exécuté dans le pool de processus"""
+    try:
+        with Image.open(BytesIO(source) if isinstance(source, bytes) else source) as img:
+            mime = ALLOWED_FORMATS.get(img.format)
+            if mime is None:
+                raise MediaError(f"Unsupported image format: {img.format}")
+            img = ImageOps.exif_transpose(img)
+            rgb = img.convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise MediaError(f"Invalid image: {e}")
+
+    variants = {}
+    for name, size in VARIANT_SIZES.items():
+        resized = rgb.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+        variants[name] = {"data": buffer.getvalue(), "width": resized.width, "height": resized.height}
+
+    small = rgb.copy()
+    small.thumbnail((32, 32))
+    return {
+        "mime": mime,
+        "width": rgb.width,
+        "height": rgb.height,
+        "blurhash": encode_blurhash(np.asarray(small)),
+        "variants": variants,
+    }
+
+
+def _write_file(path: Path, data: bytes):
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Écriture atomique : un lecteur ne voit jamais un fichier partiel. Le nom
+    # temporaire est unique : deux ingestions des mêmes octets écrivent chacune le sien
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _move_file(source: Path, destination: Path):
+    if destination.exists():
+        source.unlink()
+        return
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(source, destination)
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _unlink(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def upload_part_path(upload_id: str) -> Path:
+    return UPLOADS_DIR / f"{upload_id}.part"
+
+
+def _create_part_file(path: Path, size: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def _open_at(path: Path, offset: int):
+    f = open(path, "r+b")
+    f.seek(offset)
+    return f
+
+
+async def create_part_file(upload_id: str, size: int):
+    await asyncio.to_thread(_create_part_file, upload_part_path(upload_id), size)
+
+
+async def discard_part_file(upload_id: str):
+    await asyncio.to_thread(_unlink, upload_part_path(upload_id))
+
+
+async def write_chunk(upload_id: str, offset: int, length: int, stream: AsyncIterator[bytes], write: bool = True) -> str:
+    """Écrit le corps de la requête à sa position au fil de l'eau ; retourne son SHA-256
+
+    Avec write=False (morceau déjà reçu), le corps est seulement haché : un renvoi
+    tronqué ou corrompu ne peut pas écraser des octets déjà validés.
+    """
+    digest = hashlib.sha256()
+    written = 0
+    f = None
+    if write:
+        try:
+            f = await asyncio.to_thread(_open_at, upload_part_path(upload_id), offset)
+        except FileNotFoundError:
+            raise MediaError("Upload session not found")
+    try:
+        async for piece in stream:
+            written += len(piece)
+            if written > length:
+                raise MediaError(f"Chunk larger than {length} bytes")
+            digest.update(piece)
+            if f is not None:
+                await asyncio.to_thread(f.write, piece)
+    finally:
+        if f is not None:
+            await asyncio.to_thread(f.close)
+    if written != length:
+        raise MediaError(f"Incomplete chunk: {written} of {length} bytes")
+    return digest.hexdigest()
+
+
+async def collect_abandoned_uploads(db) -> int:
+    """Supprime les sessions expirées et les fichiers partiels orphelins"""
+    now = datetime.utcnow()
+    removed = 0
+    async for session in db.upload_sessions.find({"expiresAt": {"$lt": now}}, {"_id": 1}):
+        await discard_part_file(session["_id"])
+        await db.upload_sessions.delete_one({"_id": session["_id"]})
+        removed += 1
+
+    # Fichiers sans session (arrêt entre la suppression du document et celle du fichier)
+    cutoff = (now - UPLOAD_SESSION_TTL).timestamp()
+    stale = await asyncio.to_thread(
+        lambda: [p for p in UPLOADS_DIR.glob("*.part") if p.stat().st_mtime < cutoff] if UPLOADS_DIR.exists() else []
+    )
+    for path in stale:
+        if await db.upload_sessions.find_one({"_id": path.stem}, {"_id": 1}) is None:
+            await asyncio.to_thread(_unlink, path)
+            removed += 1
+    return removed
+
+
+def decode_data_uri(value: str) -> Optional[bytes]:
+    match = DATA_URI_RE.match(value)
+    if not match:
+        return None
+    try:
+        return base64.b64decode(value[match.end():], validate=False)
+    except (binascii.Error, ValueError):
+        raise MediaError("Invalid data URI")
+
+
+class MediaStore:
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def save(self, db, data: bytes, owner_id=None) -> dict:
+        if not data:
+            raise MediaError("Empty upload")
+        if len(data) > MAX_UPLOAD_BYTES:
+            raise MediaError(f"File larger than {MAX_UPLOAD_BYTES} bytes")
+
+        media_id = hashlib.sha256(data).hexdigest()
+        existing = await db.media.find_one({"_id": media_id})
+        if existing:
+            return existing
+
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(self.pool, render_variants, data)
+        await asyncio.to_thread(_write_file, media_path(media_id, "original"), data)
+        return await self._store(db, media_id, len(data), rendered, owner_id)
+
+    async def save_file(self, db, path: Path, owner_id=None) -> dict:
+        """Comme save, pour un fichier déjà sur disque (déplacé, jamais chargé en mémoire)"""
+        size = path.stat().st_size
+        if not size:
+            raise MediaError("Empty upload")
+        if size > MAX_RESUMABLE_BYTES:
+            raise MediaError(f"File larger than {MAX_RESUMABLE_BYTES} bytes")
+
+        media_id = await asyncio.to_thread(_hash_file, path)
+        existing = await db.media.find_one({"_id": media_id})
+        if existing:
+            await asyncio.to_thread(_unlink, path)
+            return existing
+
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(self.pool, render_variants, str(path))
+        await asyncio.to_thread(_move_file, path, media_path(media_id, "original"))
+        return await self._store(db, media_id, size, rendered, owner_id)
+
+    async def _store(self, db, media_id: str, size: int, rendered: dict, owner_id) -> dict:
+        await asyncio.gather(*(
+            asyncio.to_thread(_write_file, media_path(media_id, name), variant["data"])
+            for name, variant in rendered["variants"].items()
+        ))
+
+        doc = {
+            "_id": media_id,
+            "mime": rendered["mime"],
+            "bytes": size,
+            "width": rendered["width"],
+            "height": rendered["height"],
+            "blurhash": rendered["blurhash"],
+            "variants": {
+                name: {"width": variant["width"], "height": variant["height"], "bytes": len(variant["data"])}
+                for name, variant in rendered["variants"].items()
+            },
+            "ownerId": owner_id,
+            "createdAt": datetime.utcnow(),
+        }
+        try:
+            await db.media.insert_one(doc)
+        except DuplicateKeyError:
+            # Envoi concurrent du même contenu : les fichiers sont identiques
+            pass
+        return doc
+
+    async def ingest(self, db, value: Optional[str], owner_id=None) -> Tuple[Optional[str], Optional[str]]:
+        """Remplace une image inline (data URI) par sa référence ; retourne (valeur, blurhash)"""
+        if not value:
+            return value, None
+        data = decode_data_uri(value)
+        if data is not None:
+            doc = await self.save(db, data, owner_id)
+            return media_reference(doc["_id"]), doc["blurhash"]
+        media_id = media_id_from_reference(value)
+        if media_id is not None:
+            doc = await db.media.find_one({"_id": media_id}, {"blurhash": 1})
+            if doc is None:
+                raise MediaError("Unknown media")
+            return value, doc.get("blurhash")
+        # URL externe : conservée telle quelle
+        return value, None
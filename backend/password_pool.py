@@ -0,0 +1,106 @@
+"""
+Pool borné pour le hachage des mots de passe (bcrypt)
+
+Un appel bcrypt occupe le CPU plusieurs centaines de millisecondes ; exécuté
+dans un handler async, il bloque la boucle d'événements et toutes les autres
+requêtes du worker. Les appels sont donc confiés à un ThreadPoolExecutor
+(bcrypt relâche le GIL) limité à `workers` calculs simultanés.
+
+Admission selon la charge : au-delà de `max_pending` demandes en attente, ou
+si une place ne se libère pas en `queue_timeout_ms`, la demande est refusée
+avec `PoolSaturated` plutôt que de laisser la file grossir sans limite.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class PasswordPool:
+    def __init__(self, context, workers: int = 2, max_pending: int = 32, queue_timeout_ms: int = 2000):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.running = 0
+        self.metrics = {
+            "completed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "rehashed": 0,
+            "wait_ms_total": 0.0,
+            "max_wait_ms": 0.0,
+            "run_ms_total": 0.0,
+            "max_run_ms": 0.0,
+        }
+
+    async def _run(self, fn, *args):
+        if self._slots is None:
+            # Créé paresseusement dans la boucle d'événements du serveur
+            self._slots = asyncio.Semaphore(self.workers)
+        if self.waiting >= self.max_pending:
+            self.metrics["rejected"] += 1
+            raise PoolSaturated("Password hashing queue is full")
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            raise PoolSaturated("Timed out waiting for a password hashing slot")
+        finally:
+            self.waiting -= 1
+
+        started = time.monotonic()
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            finished = time.monotonic()
+            self.running -= 1
+            self._slots.release()
+            wait_ms, run_ms = (started - queued_at) * 1000, (finished - started) * 1000
+            self.metrics["completed"] += 1
+            self.metrics["wait_ms_total"] += wait_ms
+            self.metrics["max_wait_ms"] = round(max(self.metrics["max_wait_ms"], wait_ms), 1)
+            self.metrics["run_ms_total"] += run_ms
+            self.metrics["max_run_ms"] = round(max(self.metrics["max_run_ms"], run_ms), 1)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Vérifie le mot de passe ; retourne aussi un nouveau hachage si le coût configuré a changé"""
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed)
+        if new_hash:
+            self.metrics["rehashed"] += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> dict:
+        completed = self.metrics["completed"]
+        return {
+            "completed": completed,
+            "rejected": self.metrics["rejected"],
+            "timeouts": self.metrics["timeouts"],
+            "rehashed": self.metrics["rehashed"],
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "avg_wait_ms": round(self.metrics["wait_ms_total"] / completed, 1) if completed else 0.0,
+            "max_wait_ms": self.metrics["max_wait_ms"],
+            "avg_run_ms": round(self.metrics["run_ms_total"] / completed, 1) if completed else 0.0,
+            "max_run_ms": self.metrics["max_run_ms"],
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "queue_timeout_ms": self.queue_timeout * 1000,
+        }
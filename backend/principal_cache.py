@@ -0,0 +1,90 @@
+"""
+Cache en mémoire des utilisateurs authentifiés (TTL + LRU)
+
+Les entrées sont indexées par le sujet du jeton (l'email) et conservent le
+tampon de version `principalVersion` du document utilisateur. Chaque
+modification qui touche au principal (profil, mot de passe, désactivation)
+écrit un nouveau tampon : le worker qui l'écrit invalide son entrée
+immédiatement, les autres workers relisent périodiquement les documents dont
+le tampon a avancé et évincent les entrées devenues obsolètes. Le TTL borne
+l'obsolescence si cette synchronisation échoue.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Écart d'horloge toléré entre workers lors de la synchronisation
+SYNC_SKEW_MS = 5000
+
+
+def new_version() -> int:
+    """Tampon de version croissant (millisecondes), interrogeable par plage"""
+    return time.time_ns() // 1_000_000
+
+
+class PrincipalCache:
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 10000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # sujet -> (principal, version, expiration)
+        self.watermark: Optional[int] = None
+        self.metrics = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, subject: str) -> Optional[Any]:
+        entry = self.entries.get(subject)
+        if entry is None:
+            self.metrics["misses"] += 1
+            return None
+        principal, _, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self.entries[subject]
+            self.metrics["expired"] += 1
+            self.metrics["misses"] += 1
+            return None
+        self.entries.move_to_end(subject)
+        self.metrics["hits"] += 1
+        return principal
+
+    def put(self, subject: str, principal: Any, version: int):
+        self.entries[subject] = (principal, version, time.monotonic() + self.ttl)
+        self.entries.move_to_end(subject)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.metrics["evictions"] += 1
+
+    def invalidate(self, subject: str):
+        if self.entries.pop(subject, None) is not None:
+            self.metrics["invalidations"] += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    async def sync(self, users_collection) -> int:
+        """Évince les entrées dont le tampon a changé dans un autre worker"""
+        if self.watermark is None:
+            # Premier passage : rien n'est encore en cache, on pose la marque
+            self.watermark = new_version()
+            return 0
+        query = {"principalVersion": {"$gte": self.watermark - SYNC_SKEW_MS}}
+        stale = 0
+        async for doc in users_collection.find(query, {"email": 1, "principalVersion": 1, "_id": 0}):
+            version = doc.get("principalVersion", 0)
+            self.watermark = max(self.watermark, version)
+            entry = self.entries.get(doc.get("email"))
+            if entry is not None and entry[1] != version:
+                self.invalidate(doc["email"])
+                stale += 1
+        return stale
+
+    def snapshot(self) -> Dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": len(self.entries),
+            "hit_ratio": round(self.metrics["hits"] / lookups, 3) if lookups else 0.0,
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+        }
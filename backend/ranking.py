@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Classement des recettes tendance (score d'engagement avec décroissance temporelle)
+
+Chaque like, sauvegarde ou commentaire contribue `poids * exp(-λ (maintenant - t))`.
+Les scores sont stockés relativement à une époque fixe (`exp(λ (t - époque))`),
+ce qui rend l'ordre indépendant du moment de lecture : une mise à jour
+incrémentale se résume à un `$inc` des nouvelles contributions, sans repasser
+sur les anciens scores.
+
+Collections:
+- recipe_scores        {_id: recipeId, score}                  score relatif à l'époque
+- trending_recipes     {_id: recipeId, rank, score, computedAt} classement matérialisé
+- ranking_state        {_id: "trending", epoch, watermarks}     état du job
+                       {_id: "trending_lease", owner, expiresAt} bail du job
+- engagement_removals  {source, recipeId, eventId, eventCreatedAt, createdAt}
+                       likes et sauvegardes retirés, écrits par les handlers
+
+Les sources sont lues par pages sur (createdAt, _id), comme les curseurs de
+l'API : un lot qui s'arrête au milieu d'une égalité de createdAt reprend au
+bon endroit, et le watermark enregistré est ce couple. Un retrait soustrait la
+contribution d'origine de l'événement, si celui-ci a déjà été compté (il est
+antérieur au watermark de sa source). Un retrait concurrent d'un lot en cours
+peut être compté à tort ou manqué : l'écart, d'un événement au plus, disparaît
+au prochain passage complet (--full).
+
+Le job tourne dans chaque worker mais un bail garantit qu'un seul l'exécute à
+la fois. Chaque lot reste rejouable après une interruption : les contributions
+portent la borne du lot (`applied.<source>`) et ne sont pas réappliquées à une
+recette qui l'a déjà reçue, puis le watermark de la source est enregistré. Le
+recalage d'époque est marqué (`pendingEpoch`) avant d'être appliqué, recette
+par recette, et repris tel quel s'il a été interrompu.
+"""
+import asyncio
+import math
+import os
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 24))
+TRENDING_SIZE = 200
+# Score courant minimal pour être classé (résidus d'arrondi après un retrait)
+MIN_SCORE = 1e-6
+BATCH_SIZE = 10000
+# Les événements plus récents que ce délai sont traités au passage suivant
+INGEST_LAG = timedelta(seconds=5)
+# Au-delà, on recale l'époque pour éviter un dépassement de capacité des flottants
+EPOCH_REBASE_AFTER = timedelta(days=30)
+# Durée du bail, prolongée à chaque lot ; un worker arrêté le libère à l'expiration
+LEASE_ID = "trending_lease"
+LEASE_DURATION = timedelta(minutes=10)
+DUPLICATE_KEY = 11000
+
+DECAY_RATE = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)
+
+# collection -> (poids, le recipeId est-il stocké en chaîne ?)
+ENGAGEMENT_SOURCES = {
+    "user_likes": (1.0, False),
+    "user_saves": (2.0, False),
+    "comments": (3.0, True),
+}
+REMOVALS = "engagement_removals"
+
+
+def _decayed(timestamps, weight: float, epoch: datetime):
+    """Contribution de chaque événement, relative à l'époque"""
+    return weight * np.exp(DECAY_RATE * (timestamps - epoch.timestamp()))
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Lease:
+    """Bail exclusif sur un job périodique, stocké dans ranking_state"""
+
+    def __init__(self, db, owner: str = None, lease_id: str = LEASE_ID):
+        self.db = db
+        self.owner = owner or uuid.uuid4().hex
+        self.lease_id = lease_id
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await self.db.ranking_state.update_one(
+                {"_id": self.lease_id, "$or": [{"expiresAt": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expiresAt": now + LEASE_DURATION}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Bail détenu et valide : l'upsert entre en collision avec le document existant
+            return False
+
+    async def renew(self):
+        result = await self.db.ranking_state.update_one(
+            {"_id": self.lease_id, "owner": self.owner},
+            {"$set": {"expiresAt": datetime.utcnow() + LEASE_DURATION}}
+        )
+        if not result.matched_count:
+            raise LeaseLost(f"Lease {self.lease_id} taken over by another worker")
+
+    async def release(self):
+        await self.db.ranking_state.update_one(
+            {"_id": self.lease_id, "owner": self.owner}, {"$set": {"expiresAt": datetime.utcnow()}}
+        )
+
+
+def _position(doc: dict) -> dict:
+    return {"createdAt": doc["createdAt"], "_id": doc["_id"]}
+
+
+def _after(watermark: dict) -> dict:
+    """Filtre des événements postérieurs au couple (createdAt, _id)"""
+    return {"$or": [
+        {"createdAt": {"$gt": watermark["createdAt"]}},
+        {"createdAt": watermark["createdAt"], "_id": {"$gt": watermark["_id"]}},
+    ]}
+
+
+def _counted(watermark: dict, created_at: datetime, event_id) -> bool:
+    return watermark is not None and (created_at, event_id) <= (watermark["createdAt"], watermark["_id"])
+
+
+async def record_removal(db, source: str, event: dict):
+    """Journalise le retrait d'un like ou d'une sauvegarde pour le classement"""
+    if not event.get("createdAt"):
+        return
+    await db[REMOVALS].insert_one({
+        "source": source,
+        "recipeId": event["recipeId"],
+        "eventId": event["_id"],
+        "eventCreatedAt": event["createdAt"],
+        "createdAt": datetime.utcnow(),
+    })
+
+
+async def _load_state(db, now: datetime) -> dict:
+    state = await db.ranking_state.find_one({"_id": "trending"})
+    if state is None:
+        # L'époque est enregistrée avant toute contribution calculée par rapport à elle.
+        # Un état neuf lit les sources en entier : les retraits déjà journalisés n'y sont plus.
+        state = {"_id": "trending", "epoch": now, "watermarks": {REMOVALS: {"createdAt": now, "_id": ObjectId.from_datetime(now)}}}
+        await db.ranking_state.insert_one(state)
+    return state
+
+
+async def _rebase_epoch(db, state: dict, now: datetime):
+    pending = state.get("pendingEpoch")
+    if pending is None:
+        if now - state["epoch"] < EPOCH_REBASE_AFTER:
+            return
+        pending = now
+        await db.ranking_state.update_one({"_id": "trending"}, {"$set": {"pendingEpoch": pending}})
+    factor = math.exp(-DECAY_RATE * (pending - state["epoch"]).total_seconds())
+    # Les scores déjà recalés portent la nouvelle époque : une reprise ne les touche pas
+    await db.recipe_scores.update_many(
+        {"epoch": {"$ne": pending}}, {"$mul": {"score": factor}, "$set": {"epoch": pending}}
+    )
+    await db.ranking_state.update_one(
+        {"_id": "trending"}, {"$set": {"epoch": pending}, "$unset": {"pendingEpoch": ""}}
+    )
+    state["epoch"] = pending
+    state.pop("pendingEpoch", None)
+
+
+async def _apply_contributions(db, name: str, batch_end: dict, epoch: datetime, unique_ids, contributions):
+    applied = f"applied.{name}"
+    # Lot déjà reçu : borne enregistrée postérieure ou égale au couple (createdAt, _id) du lot
+    already_applied = [
+        {f"{applied}.createdAt": {"$gt": batch_end["createdAt"]}},
+        {f"{applied}.createdAt": batch_end["createdAt"], f"{applied}._id": {"$gte": batch_end["_id"]}},
+    ]
+    try:
+        await db.recipe_scores.bulk_write([
+            UpdateOne(
+                {"_id": recipe_id, "$nor": already_applied},
+                {"$inc": {"score": float(value)}, "$set": {applied: batch_end}, "$setOnInsert": {"epoch": epoch}},
+                upsert=True
+            )
+            for recipe_id, value in zip(unique_ids, contributions)
+        ], ordered=False)
+    except BulkWriteError as e:
+        # Recette ayant déjà reçu ce lot (reprise) : l'upsert heurte le document existant
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+
+
+async def _ingest(db, name: str, state: dict, cutoff: datetime, lease: Lease, projection: dict, contributions_of) -> int:
+    """Parcourt la source par lots sur (createdAt, _id) ; contributions_of(events) -> (ids, valeurs)"""
+    processed = 0
+    while True:
+        query = {"createdAt": {"$lte": cutoff}}
+        watermark = state["watermarks"].get(name)
+        if watermark is not None:
+            query.update(_after(watermark))
+        events = await db[name].find(
+            query, {**projection, "createdAt": 1}, sort=[("createdAt", 1), ("_id", 1)]
+        ).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+        if not events:
+            return processed
+
+        batch_end = _position(events[-1])
+        await lease.renew()
+        recipe_ids, values = contributions_of(events)
+        if recipe_ids:
+            unique_ids, totals = np.unique(np.asarray(recipe_ids, dtype=object), return_inverse=True)
+            await _apply_contributions(
+                db, name, batch_end, state["epoch"], unique_ids, np.bincount(totals, weights=values)
+            )
+
+        processed += len(events)
+        state["watermarks"][name] = batch_end
+        await db.ranking_state.update_one({"_id": "trending"}, {"$set": {f"watermarks.{name}": batch_end}})
+
+
+async def _ingest_source(db, name: str, state: dict, cutoff: datetime, lease: Lease) -> int:
+    weight, recipe_id_is_str = ENGAGEMENT_SOURCES[name]
+
+    def contributions_of(events):
+        recipe_ids, timestamps = [], []
+        for event in events:
+            recipe_id = event.get("recipeId")
+            if recipe_id_is_str:
+                if not ObjectId.is_valid(recipe_id):
+                    continue
+                recipe_id = ObjectId(recipe_id)
+            recipe_ids.append(recipe_id)
+            timestamps.append(event["createdAt"].timestamp())
+        return recipe_ids, _decayed(np.asarray(timestamps, dtype=np.float64), weight, state["epoch"])
+
+    return await _ingest(db, name, state, cutoff, lease, {"recipeId": 1}, contributions_of)
+
+
+async def _ingest_removals(db, state: dict, cutoff: datetime, lease: Lease) -> int:
+    def contributions_of(events):
+        recipe_ids, values = [], []
+        for event in events:
+            source = event.get("source")
+            # Événement jamais compté (retiré avant d'être lu) : rien à soustraire
+            if source not in ENGAGEMENT_SOURCES or not _counted(
+                state["watermarks"].get(source), event["eventCreatedAt"], event["eventId"]
+            ):
+                continue
+            weight, _ = ENGAGEMENT_SOURCES[source]
+            recipe_ids.append(event["recipeId"])
+            values.append(-_decayed(event["eventCreatedAt"].timestamp(), weight, state["epoch"]))
+        return recipe_ids, np.asarray(values, dtype=np.float64)
+
+    projection = {"source": 1, "recipeId": 1, "eventId": 1, "eventCreatedAt": 1}
+    return await _ingest(db, REMOVALS, state, cutoff, lease, projection, contributions_of)
+
+
+async def _materialize(db, now: datetime) -> int:
+    state = await db.ranking_state.find_one({"_id": "trending"}, {"epoch": 1})
+    decay = math.exp(-DECAY_RATE * (now - state["epoch"]).total_seconds()) if state else 1.0
+
+    # Les scores ramenés à zéro par des retraits ne sont pas classés
+    candidates = await db.recipe_scores.find(
+        {"score": {"$gt": MIN_SCORE / decay}}
+    ).sort("score", -1).limit(TRENDING_SIZE * 2).to_list(TRENDING_SIZE * 2)
+    if not candidates:
+        await db.trending_recipes.delete_many({})
+        return 0
+
+    # Écarter les recettes supprimées depuis le dernier passage
+    existing = await db.recipes.find(
+        {"_id": {"$in": [doc["_id"] for doc in candidates]}}, {"_id": 1}
+    ).to_list(len(candidates))
+    existing_ids = {doc["_id"] for doc in existing}
+    candidates = [doc for doc in candidates if doc["_id"] in existing_ids]
+
+    ranking = [
+        {
+            "_id": doc["_id"],
+            "rank": rank,
+            "score": doc["score"] * decay,
+            "computedAt": now,
+        }
+        for rank, doc in enumerate(candidates[:TRENDING_SIZE], start=1)
+    ]
+    await db.trending_recipes.delete_many({"_id": {"$nin": [doc["_id"] for doc in ranking]}})
+    if ranking:
+        await db.trending_recipes.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True) for doc in ranking
+        ], ordered=False)
+    return len(ranking)
+
+
+async def refresh_trending(db, full: bool = False, lease: Lease = None) -> dict:
+    """Ingère les nouveaux événements d'engagement puis matérialise le classement
+
+    Retourne {"skipped": True} si un autre worker détient le bail.
+    """
+    lease = lease or Lease(db)
+    if not await lease.acquire():
+        return {"skipped": True}
+    try:
+        now = datetime.utcnow()
+        if full:
+            await db.recipe_scores.delete_many({})
+            await db.ranking_state.delete_one({"_id": "trending"})
+
+        state = await _load_state(db, now)
+        await _rebase_epoch(db, state, now)
+
+        cutoff = now - INGEST_LAG
+        processed = {}
+        for name in ENGAGEMENT_SOURCES:
+            processed[name] = await _ingest_source(db, name, state, cutoff, lease)
+        # Après les sources : leurs watermarks disent quels événements retirés avaient été comptés
+        processed[REMOVALS] = await _ingest_removals(db, state, cutoff, lease)
+
+        processed["ranked"] = await _materialize(db, now)
+        return processed
+    finally:
+        await lease.release()
+
+
+async def main(full: bool):
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    print(f"🔥 Calcul des recettes tendance ({'complet' if full else 'incrémental'})...")
+    stats = await refresh_trending(db, full=full)
+    for name, count in stats.items():
+        print(f"✅ {name}: {count}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(main(full="--full" in sys.argv))
@@ -0,0 +1,110 @@
+"""
+Hub temps réel : pub/sub en mémoire pour les connexions WebSocket
+
+Chaque connexion est un `Subscriber` doté d'une file bornée ; elle est abonnée
+au canal de son utilisateur (`user:<id>`, badge des non-lus) et aux canaux
+des conversations ouvertes (`conversation:<id>`, messages, modifications,
+suppressions, accusés de lecture).
+
+La publication est synchrone et ne bloque jamais : l'événement est sérialisé
+une seule fois puis déposé dans la file de chaque abonné. Un abonné trop lent
+dont la file déborde est déconnecté ; le client se resynchronise alors par
+l'API REST à la reconnexion.
+"""
+import asyncio
+from typing import Dict, Optional, Set
+
+import fast_json
+
+MAX_QUEUED_EVENTS = 256
+
+
+def user_channel(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def conversation_channel(conversation_id) -> str:
+    return f"conversation:{conversation_id}"
+
+
+class Subscriber:
+    def __init__(self, user_id: str, max_queued: int = MAX_QUEUED_EVENTS):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self.channels: Set[str] = set()
+        self.overflowed = False
+
+    def deliver(self, payload: str) -> bool:
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            # La file pleine réveille aussitôt l'émetteur, qui fermera la connexion
+            self.overflowed = True
+            return False
+
+    def reply(self, event: dict):
+        # Les réponses passent par la file : seule la boucle d'envoi écrit sur la socket
+        self.deliver(fast_json.dumps(event).decode())
+
+    async def next(self) -> Optional[str]:
+        payload = await self.queue.get()
+        return None if self.overflowed else payload
+
+
+class Hub:
+    def __init__(self):
+        self.channels: Dict[str, Set[Subscriber]] = {}
+        self.subscribers: Set[Subscriber] = set()
+        self.metrics = {"connections": 0, "published": 0, "delivered": 0, "dropped": 0}
+
+    def connect(self, user_id: str) -> Subscriber:
+        subscriber = Subscriber(user_id)
+        self.subscribers.add(subscriber)
+        self.subscribe(subscriber, user_channel(user_id))
+        self.metrics["connections"] += 1
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber):
+        for channel in list(subscriber.channels):
+            self.unsubscribe(subscriber, channel)
+        self.subscribers.discard(subscriber)
+        self.metrics["connections"] -= 1
+
+    def subscribe(self, subscriber: Subscriber, channel: str):
+        self.channels.setdefault(channel, set()).add(subscriber)
+        subscriber.channels.add(channel)
+
+    def unsubscribe(self, subscriber: Subscriber, channel: str):
+        subscribers = self.channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.channels[channel]
+        subscriber.channels.discard(channel)
+
+    def has_subscribers(self, channel: str) -> bool:
+        return channel in self.channels
+
+    def publish(self, channel: str, event: dict) -> int:
+        subscribers = self.channels.get(channel)
+        if not subscribers:
+            return 0
+        payload = fast_json.dumps(event).decode()
+        delivered = 0
+        for subscriber in list(subscribers):
+            if subscriber.deliver(payload):
+                delivered += 1
+            else:
+                self.metrics["dropped"] += 1
+        self.metrics["published"] += 1
+        self.metrics["delivered"] += delivered
+        return delivered
+
+    def broadcast(self, event: dict) -> int:
+        """Envoie un événement à toutes les connexions du worker (ex. resync)"""
+        payload = fast_json.dumps(event).decode()
+        return sum(subscriber.deliver(payload) for subscriber in list(self.subscribers))
+
+    def snapshot(self) -> dict:
+        return {**self.metrics, "channels": len(self.channels)}
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Recettes similaires : similarité cosinus sur des vecteurs TF-IDF
+
+Termes : ingrédients (normalisés comme ingredient_index), tags et mots du titre,
+chacun avec son poids. Les vecteurs sont stockés sous forme d'index inversé
+(terme -> [docnos], [tf]) pour que le produit scalaire d'une requête ne touche
+que les recettes partageant au moins un terme ; les termes présents dans trop
+de recettes (sel, beurre...) sont ignorés à la requête, leur idf étant négligeable.
+
+L'index est reconstruit au démarrage, mis à jour par create_recipe, et les
+voisins des recettes populaires sont précalculés dans `similar_recipes` pour
+que l'écran de détail n'attende jamais le calcul.
+
+Usage hors ligne : python recommender.py  (reconstruit et précalcule)
+"""
+import asyncio
+import math
+import os
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from ingredient_index import ingredient_terms
+from search_index import INDEXED_FIELDS, analyze
+
+FIELD_WEIGHTS = {"ingredient": 1.0, "tag": 1.5, "title": 0.8}
+MAX_DF_RATIO = 0.1
+SIMILAR_K = 10
+PRECOMPUTE_POPULAR = 1000
+# Recettes lues par lot lors d'une reconstruction, chaque lot indexé dans un thread
+BUILD_BATCH_SIZE = 2000
+
+
+def recipe_terms(doc: dict) -> Dict[str, float]:
+    terms: Dict[str, float] = {}
+    for text in doc.get("ingredients") or []:
+        for term in set(ingredient_terms(text)):
+            key = "i:" + term
+            terms[key] = terms.get(key, 0.0) + FIELD_WEIGHTS["ingredient"]
+    for tag in doc.get("tags") or []:
+        for term in analyze(tag):
+            key = "g:" + term
+            terms[key] = terms.get(key, 0.0) + FIELD_WEIGHTS["tag"]
+    for term in analyze(doc.get("title") or ""):
+        key = "t:" + term
+        terms[key] = terms.get(key, 0.0) + FIELD_WEIGHTS["title"]
+    return terms
+
+
+class SimilarityIndex:
+    def __init__(self):
+        self.doc_ids: List = []
+        self.docnos: Dict = {}
+        self.doc_terms: List[Dict[str, float]] = []
+        self.postings: Dict[str, tuple] = {}   # terme -> (array('I') docnos, array('f') tf)
+        self.norms = array("d")
+        self.alive = bytearray()
+        self.watermark = None
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings[term][0]) if term in self.postings else 0
+        return math.log((len(self.doc_ids) + 1) / (df + 1)) + 1
+
+    def add(self, doc: dict):
+        recipe_id = doc["_id"]
+        if recipe_id in self.docnos:
+            return
+        docno = len(self.doc_ids)
+        self.doc_ids.append(recipe_id)
+        self.docnos[recipe_id] = docno
+
+        terms = recipe_terms(doc)
+        for term, tf in terms.items():
+            docnos, tfs = self.postings.setdefault(term, (array("I"), array("f")))
+            docnos.append(docno)
+            tfs.append(tf)
+        self.doc_terms.append(terms)
+        # Norme figée avec les idf du moment ; une reconstruction la rafraîchit
+        self.norms.append(math.sqrt(sum((tf * self.idf(t)) ** 2 for t, tf in terms.items())) or 1.0)
+        self.alive.append(1)
+
+    def add_many(self, docs: List[dict]):
+        for doc in docs:
+            self.add(doc)
+
+    def remove(self, recipe_id):
+        docno = self.docnos.get(recipe_id)
+        if docno is not None:
+            self.alive[docno] = 0
+
+    def similar(self, recipe_id, k: int = SIMILAR_K) -> List:
+        docno = self.docnos.get(recipe_id)
+        if docno is None:
+            return []
+
+        max_df = max(10, int(MAX_DF_RATIO * len(self.doc_ids)))
+        all_docnos, all_scores = [], []
+        for term, tf in self.doc_terms[docno].items():
+            docnos, tfs = self.postings[term]
+            if len(docnos) > max_df:
+                continue
+            idf = self.idf(term)
+            all_docnos.append(np.frombuffer(docnos, dtype=np.uint32))
+            all_scores.append(np.frombuffer(tfs, dtype=np.float32) * (tf * idf * idf))
+        if not all_docnos:
+            return []
+
+        candidates, inverse = np.unique(np.concatenate(all_docnos), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        scores /= np.frombuffer(self.norms, dtype=np.float64)[candidates] * self.norms[docno]
+
+        keep = np.frombuffer(self.alive, dtype=np.uint8)[candidates].astype(bool) & (candidates != docno)
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [self.doc_ids[i] for i in candidates[order]]
+
+    def similar_batch(self, recipe_ids: List, k: int = SIMILAR_K) -> Dict:
+        return {recipe_id: self.similar(recipe_id, k) for recipe_id in recipe_ids}
+
+
+async def build_index(db) -> SimilarityIndex:
+    """Construit un index neuf ; la tokenisation et la pondération tournent dans un thread
+
+    L'index n'est pas encore partagé : le thread est seul à le modifier. Le
+    watermark des rattrapages (search_index.sync_index) est posé sur la recette
+    la plus récente lue.
+    """
+    index = SimilarityIndex()
+    cursor = db.recipes.find({}, INDEXED_FIELDS).sort("createdAt", 1)
+    while True:
+        docs = await cursor.to_list(BUILD_BATCH_SIZE)
+        if not docs:
+            return index
+        await asyncio.to_thread(index.add_many, docs)
+        created = [doc["createdAt"] for doc in docs if doc.get("createdAt")]
+        if created:
+            index.watermark = max([index.watermark, *created] if index.watermark else created)
+
+
+async def precompute_popular(db, index: SimilarityIndex, limit: int = PRECOMPUTE_POPULAR) -> int:
+    """Écrit les voisins des recettes les plus likées dans `similar_recipes`
+
+    Le calcul tourne dans un thread pour ne pas bloquer la boucle d'événements :
+    l'index ne doit pas être modifié pendant ce temps.
+    """
+    popular = await db.recipes.find({}, {"_id": 1}).sort("likes", -1).limit(limit).to_list(limit)
+    now = datetime.utcnow()
+    neighbours = await asyncio.to_thread(index.similar_batch, [doc["_id"] for doc in popular])
+    requests = [
+        UpdateOne(
+            {"_id": recipe_id},
+            {"$set": {"similar": similar, "computedAt": now}},
+            upsert=True
+        )
+        for recipe_id, similar in neighbours.items()
+        if similar
+    ]
+    if requests:
+        await db.similar_recipes.bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    print("🧮 Construction de l'index de similarité...")
+    index = await build_index(db)
+    print(f"✅ {len(index)} recettes indexées")
+
+    count = await precompute_popular(db, index)
+    print(f"✅ Voisins précalculés pour {count} recettes populaires")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
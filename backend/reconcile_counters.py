@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Script pour réparer la dérive des compteurs dénormalisés
+
+Recalcule depuis les collections sources :
+- users.followersCount / followingCount  (follows)
+- users.recipesCount                     (recipes)
+- recipes.likes                          (user_likes, hors recettes actives)
+- recipes.commentsCount                  (comments)
+- conversations.unread.<userId>          (messages après la marque reads.<userId>)
+et ne réécrit que les documents dont la valeur stockée diffère.
+
+recipes.likes est tenu par le tampon d'écriture différée (counters.py) : la
+valeur stockée peut dériver des deltas perdus par un worker arrêté sans
+flush. reconcile_likes est aussi lancé périodiquement par le serveur ; les
+recettes dont les likes ont changé pendant LIKES_QUIET_PERIOD sont laissées
+de côté, leurs deltas pouvant encore attendre dans le tampon d'un worker.
+
+Usage : python reconcile_counters.py [--dry-run]
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+# Charger les variables d'environnement
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+BATCH_SIZE = 1000
+LIKES_QUIET_PERIOD = timedelta(minutes=10)
+
+async def count_by(collection, field: str) -> dict:
+    counts = {}
+    async for row in collection.aggregate([{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]):
+        key = row["_id"]
+        # Les commentaires stockent recipeId en chaîne
+        if isinstance(key, str) and ObjectId.is_valid(key):
+            key = ObjectId(key)
+        counts[key] = counts.get(key, 0) + row["count"]
+    return counts
+
+async def reconcile(collection, expected: dict, dry_run: bool) -> int:
+    fields = list(expected)
+    repaired = 0
+    batch = []
+    async for doc in collection.find({}, {field: 1 for field in fields}):
+        fixes = {
+            field: expected[field].get(doc["_id"], 0)
+            for field in fields
+            if doc.get(field) != expected[field].get(doc["_id"], 0)
+        }
+        if not fixes:
+            continue
+        repaired += 1
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": fixes}))
+        if len(batch) >= BATCH_SIZE:
+            if not dry_run:
+                await collection.bulk_write(batch, ordered=False)
+            batch = []
+    if batch and not dry_run:
+        await collection.bulk_write(batch, ordered=False)
+    return repaired
+
+async def recently_liked(db, since: datetime) -> set:
+    """Recettes likées ou déslikées depuis `since` (retraits journalisés pour les tendances)"""
+    active = set(await db.user_likes.distinct("recipeId", {"createdAt": {"$gte": since}}))
+    active.update(await db.engagement_removals.distinct(
+        "recipeId", {"source": "user_likes", "createdAt": {"$gte": since}}
+    ))
+    return active
+
+async def reconcile_likes(db, dry_run: bool = False, quiet_period: timedelta = LIKES_QUIET_PERIOD) -> int:
+    since = datetime.utcnow() - quiet_period
+    expected = await count_by(db.user_likes, "recipeId")
+    fixes = {}
+    async for doc in db.recipes.find({}, {"likes": 1}):
+        if doc.get("likes") != expected.get(doc["_id"], 0):
+            fixes[doc["_id"]] = (doc.get("likes"), expected.get(doc["_id"], 0))
+
+    # Lu après le parcours : couvre aussi les likes arrivés pendant celui-ci
+    active = await recently_liked(db, since) if fixes else set()
+    batch = [
+        # Garde sur la valeur lue : un flush arrivé entre-temps l'emporte
+        UpdateOne({"_id": recipe_id, "likes": stored}, {"$set": {"likes": value}})
+        for recipe_id, (stored, value) in fixes.items()
+        if recipe_id not in active
+    ]
+    if not dry_run:
+        for start in range(0, len(batch), BATCH_SIZE):
+            await db.recipes.bulk_write(batch[start:start + BATCH_SIZE], ordered=False)
+    return len(batch)
+
+def after_watermark(watermark) -> dict:
+    """Filtre des messages postérieurs à une marque de lecture (ordre createdAt, _id)"""
+    if not watermark:
+        return {}
+    return {"$or": [
+        {"createdAt": {"$gt": watermark["lastReadAt"]}},
+        {"createdAt": watermark["lastReadAt"], "_id": {"$gt": watermark["lastReadMessageId"]}},
+    ]}
+
+async def unread_by_conversation(db) -> dict:
+    """{conversationId: {userId: non lus}} d'après la marque de lecture de chaque participant"""
+    unread = {}
+    async for conv in db.conversations.find({}, {"participants": 1, "reads": 1}):
+        reads = conv.get("reads") or {}
+        unread[conv["_id"]] = {
+            str(participant): await db.messages.count_documents({
+                "conversationId": conv["_id"],
+                "senderId": {"$ne": str(participant)},
+                **after_watermark(reads.get(str(participant))),
+            })
+            for participant in conv["participants"]
+        }
+    return unread
+
+async def main(dry_run: bool):
+    print(f"🔧 Réconciliation des compteurs{' (simulation)' if dry_run else ''}...")
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        users_expected = {
+            "followersCount": await count_by(db.follows, "followingId"),
+            "followingCount": await count_by(db.follows, "followerId"),
+            "recipesCount": await count_by(db.recipes, "authorId"),
+        }
+        repaired = await reconcile(db.users, users_expected, dry_run)
+        print(f"✅ {repaired} utilisateurs corrigés")
+
+        repaired = await reconcile_likes(db, dry_run)
+        print(f"✅ {repaired} compteurs de likes corrigés")
+        repaired = await reconcile(db.recipes, {"commentsCount": await count_by(db.comments, "recipeId")}, dry_run)
+        print(f"✅ {repaired} recettes corrigées")
+
+        # Le sous-document entier est comparé : les participants à zéro sont inclus
+        unread = await unread_by_conversation(db)
+        expected = {}
+        async for conv in db.conversations.find({}, {"participants": 1}):
+            expected[conv["_id"]] = {
+                str(participant): unread.get(conv["_id"], {}).get(str(participant), 0)
+                for participant in conv["participants"]
+            }
+        repaired = await reconcile(db.conversations, {"unread": expected}, dry_run)
+        print(f"✅ {repaired} conversations corrigées")
+
+        print("🎉 Réconciliation terminée!")
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la réconciliation: {e}")
+        raise
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(dry_run="--dry-run" in sys.argv))
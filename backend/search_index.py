@@ -0,0 +1,252 @@
+"""
+Index de recherche plein texte des recettes (index inversé en mémoire, classement BM25)
+
+Champs indexés : title, description, ingredients, tags (pondérés à la BM25F).
+Les termes sont normalisés (minuscules, accents supprimés) puis passés dans un
+raciniseur léger français/anglais, identique pour l'indexation et les requêtes.
+
+L'index vit dans le processus : il est construit au démarrage depuis Mongo,
+mis à jour par create_recipe / delete_recipe et rattrapé périodiquement sur
+`createdAt` pour les recettes créées par d'autres workers.
+"""
+import re
+import unicodedata
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "ingredients": 1.5, "description": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+DIFFICULTY_CODES = {"easy": 1, "medium": 2, "hard": 3}
+
+STOPWORDS = {
+    # français
+    "a", "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "en", "et",
+    "la", "le", "les", "leur", "ou", "par", "pour", "sans", "sur", "un", "une",
+    # anglais
+    "an", "and", "for", "in", "of", "on", "or", "the", "to", "with",
+}
+
+# Suffixes retirés du plus long au plus court ; la racine garde au moins 3 lettres
+SUFFIXES = (
+    "issements", "issement", "ements", "ement", "ations", "ation", "ments", "ment",
+    "euses", "euse", "ives", "ive", "ings", "ing", "ies", "eaux", "aux",
+    "ees", "ee", "es", "ed", "er", "ly", "s", "x", "e",
+)
+SUFFIX_REPLACEMENTS = {"ies": "y", "eaux": "eau", "aux": "al"}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Minuscules et suppression des accents (é -> e, œ -> oe)"""
+    text = text.lower().replace("œ", "oe").replace("æ", "ae")
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)] + SUFFIX_REPLACEMENTS.get(suffix, "")
+    return token
+
+
+USER_WORD_RE = re.compile(r"[a-z0-9_.]+")
+USER_KEY_MAX_LENGTH = 20
+
+
+def user_search_words(text: str) -> List[str]:
+    return [word[:USER_KEY_MAX_LENGTH] for word in USER_WORD_RE.findall(fold(text or ""))]
+
+
+def user_search_keys(*values: str) -> List[str]:
+    """Préfixes normalisés des mots de firstName / lastName / username (champ searchKeys)"""
+    keys = set()
+    for value in values:
+        for word in user_search_words(value):
+            keys.update(word[:n] for n in range(1, len(word) + 1))
+    return sorted(keys)
+
+
+def analyze(text: str) -> List[str]:
+    return [stem(token) for token in TOKEN_RE.findall(fold(text)) if token not in STOPWORDS]
+
+
+class RecipeSearchIndex:
+    def __init__(self, capacity: int = 1024):
+        self.doc_ids: List = []            # docno -> recipe ObjectId
+        self.docnos: Dict = {}             # recipe ObjectId -> docno
+        self.postings: Dict[str, tuple] = {}  # terme -> ([docnos], [tf pondérées])
+        self._arrays: Dict[str, tuple] = {}   # cache numpy des postings
+        # Attributs par document, indexés par docno (tableaux à capacité croissante)
+        self.lengths = np.zeros(capacity, dtype=np.float64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.difficulty = np.zeros(capacity, dtype=np.int8)
+        self.prep_time = np.full(capacity, np.nan)
+        self.servings = np.full(capacity, np.nan)
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.total_length = 0.0
+        self.live_count = 0
+        self.watermark = None
+
+    def _ensure_capacity(self, size: int):
+        capacity = len(self.alive)
+        if size <= capacity:
+            return
+        extra = max(capacity, size - capacity)
+        self.lengths = np.concatenate([self.lengths, np.zeros(extra)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        self.difficulty = np.concatenate([self.difficulty, np.zeros(extra, dtype=np.int8)])
+        self.prep_time = np.concatenate([self.prep_time, np.full(extra, np.nan)])
+        self.servings = np.concatenate([self.servings, np.full(extra, np.nan)])
+        self.created_at = np.concatenate([self.created_at, np.zeros(extra)])
+
+    def __len__(self):
+        return self.live_count
+
+    def add(self, doc: dict):
+        recipe_id = doc["_id"]
+        if recipe_id in self.docnos:
+            return
+        docno = len(self.doc_ids)
+        self._ensure_capacity(docno + 1)
+        self.doc_ids.append(recipe_id)
+        self.docnos[recipe_id] = docno
+
+        weighted_tf: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            value = doc.get(field) or ""
+            text = " ".join(value) if isinstance(value, list) else value
+            for term in analyze(text):
+                weighted_tf[term] = weighted_tf.get(term, 0.0) + weight
+                length += weight
+
+        for term, tf in weighted_tf.items():
+            postings = self.postings.setdefault(term, ([], []))
+            postings[0].append(docno)
+            postings[1].append(tf)
+            self._arrays.pop(term, None)
+
+        self.lengths[docno] = length
+        self.alive[docno] = True
+        self.difficulty[docno] = DIFFICULTY_CODES.get(doc.get("difficulty"), 0)
+        if doc.get("prepTimeMinutes") is not None:
+            self.prep_time[docno] = doc["prepTimeMinutes"]
+        if doc.get("servings") is not None:
+            self.servings[docno] = doc["servings"]
+        created_at = doc.get("createdAt")
+        self.created_at[docno] = created_at.timestamp() if created_at else 0.0
+        self.total_length += length
+        self.live_count += 1
+
+    def remove(self, recipe_id):
+        docno = self.docnos.get(recipe_id)
+        if docno is None or not self.alive[docno]:
+            return
+        # Suppression logique : les postings sont filtrés à la requête
+        self.alive[docno] = False
+        self.total_length -= self.lengths[docno]
+        self.live_count -= 1
+
+    def _term_arrays(self, term: str):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            docnos, tfs = self.postings[term]
+            arrays = (np.asarray(docnos, dtype=np.int64), np.asarray(tfs, dtype=np.float64))
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(
+        self,
+        query: str,
+        difficulty: Optional[str] = None,
+        max_prep_time: Optional[int] = None,
+        min_servings: Optional[int] = None,
+        max_servings: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List:
+        if not self.live_count:
+            return []
+
+        alive = self.alive
+        analyzed = list(dict.fromkeys(analyze(query)))
+        terms = [term for term in analyzed if term in self.postings]
+
+        if terms:
+            lengths = self.lengths
+            avg_length = self.total_length / self.live_count or 1.0
+            all_docnos, all_scores = [], []
+            for term in terms:
+                docnos, tfs = self._term_arrays(term)
+                df = int(alive[docnos].sum())
+                if df == 0:
+                    continue
+                idf = np.log(1 + (self.live_count - df + 0.5) / (df + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docnos] / avg_length)
+                all_docnos.append(docnos)
+                all_scores.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+            if not all_docnos:
+                return []
+            candidates, inverse = np.unique(np.concatenate(all_docnos), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        elif analyzed:
+            return []
+        else:
+            # Pas de texte : filtres seuls, les plus récentes d'abord
+            candidates = np.arange(len(self.doc_ids))
+            scores = self.created_at[candidates]
+
+        mask = alive[candidates]
+        if difficulty is not None:
+            mask &= self.difficulty[candidates] == DIFFICULTY_CODES.get(difficulty, -1)
+        if max_prep_time is not None:
+            mask &= self.prep_time[candidates] <= max_prep_time
+        if min_servings is not None:
+            mask &= self.servings[candidates] >= min_servings
+        if max_servings is not None:
+            mask &= self.servings[candidates] <= max_servings
+
+        candidates, scores = candidates[mask], scores[mask]
+        wanted = offset + limit
+        if len(candidates) > wanted:
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")[offset:wanted]
+        return [self.doc_ids[docno] for docno in candidates[order]]
+
+
+INDEXED_FIELDS = {
+    "title": 1, "description": 1, "ingredients": 1, "tags": 1,
+    "difficulty": 1, "prepTimeMinutes": 1, "servings": 1, "createdAt": 1,
+}
+
+
+# Fenêtre relue à chaque passage : une recette d'un autre worker peut devenir
+# visible après une recette plus récente (horloges décalées, insertion en vol)
+SYNC_LAG = timedelta(minutes=1)
+
+
+async def sync_index(db, index: RecipeSearchIndex) -> int:
+    """Indexe les recettes créées depuis le dernier passage (ou tout au premier appel)
+
+    Seul ce parcours fait avancer `index.watermark` : les ajouts locaux (`add`)
+    n'y touchent pas, sans quoi ils masqueraient les recettes des autres workers.
+    """
+    query = {}
+    if index.watermark is not None:
+        query["createdAt"] = {"$gte": index.watermark - SYNC_LAG}
+    added = 0
+    async for doc in db.recipes.find(query, INDEXED_FIELDS).sort("createdAt", 1):
+        created_at = doc.get("createdAt")
+        if created_at and (index.watermark is None or created_at > index.watermark):
+            index.watermark = created_at
+        if doc["_id"] not in index.docnos:
+            index.add(doc)
+            added += 1
+    return added
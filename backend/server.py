@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, BackgroundTasks, File, Query, Request, Response, UploadFile, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -7,13 +8,33 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Union
 import uuid
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+import asyncio
+import base64
+import hashlib
 import re
+import secrets
+
+import backplane
+import counters
+import fast_json
+import ingredient_index
+import media_store
+import password_pool
+import principal_cache
+import ranking
+import realtime
+import reconcile_counters
+import recommender
+import search_index
+import suggest_index
 
 
 ROOT_DIR = Path(__file__).parent
@@ -24,12 +45,95 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Following timeline: authors above this follower count are not fanned out on
+# write, their recipes are merged in at read time instead
+FANOUT_MAX_FOLLOWERS = int(os.environ.get('FANOUT_MAX_FOLLOWERS', 5000))
+# An author goes back to fan-out-on-write below this count (margin so that an
+# author hovering around the limit does not trigger a backfill on each switch)
+FANOUT_RESUME_FOLLOWERS = FANOUT_MAX_FOLLOWERS * 9 // 10
+FANOUT_BATCH_SIZE = 1000
+FANOUT_BACKFILL_LIMIT = 20
+
+# Trending ranking refresh interval (0 disables the in-process job)
+TRENDING_REFRESH_SECONDS = int(os.environ.get('TRENDING_REFRESH_SECONDS', 300))
+
+# In-process recipe search index, caught up with other workers' writes periodically
+SEARCH_SYNC_SECONDS = int(os.environ.get('SEARCH_SYNC_SECONDS', 30))
+recipe_search_index = search_index.RecipeSearchIndex()
+recipe_ingredient_index = ingredient_index.IngredientIndex()
+
+# Similar-recipe index, rebuilt with popular neighbours precomputed every interval
+RECOMMENDER_REFRESH_SECONDS = int(os.environ.get('RECOMMENDER_REFRESH_SECONDS', 3600))
+recipe_similarity_index = recommender.SimilarityIndex()
+
+# Typeahead index (tags, ingredients, usernames). Local writes update it in place
+# and new entries trigger a rebuild when the pending buffer overflows; the full
+# rebuild from Mongo only picks up other workers' changes, so it runs rarely
+SUGGEST_REFRESH_SECONDS = int(os.environ.get('SUGGEST_REFRESH_SECONDS', 6 * 3600))
+typeahead_index = suggest_index.SuggestIndex()
+
+# Write-behind buffer for recipe like counters. recipes.likes may drift from
+# user_likes by the deltas a worker loses when it stops without flushing; the
+# reconcile job rewrites quiet recipes from the membership rows under a lease
+LIKE_FLUSH_INTERVAL_MS = int(os.environ.get('LIKE_FLUSH_INTERVAL_MS', 500))
+LIKE_FLUSH_MAX_EVENTS = int(os.environ.get('LIKE_FLUSH_MAX_EVENTS', 500))
+like_counter_buffer = counters.CounterBuffer(
+    db.recipes, "likes", interval_ms=LIKE_FLUSH_INTERVAL_MS, max_events=LIKE_FLUSH_MAX_EVENTS
+)
+LIKE_RECONCILE_SECONDS = int(os.environ.get('LIKE_RECONCILE_SECONDS', 3600))
+LIKE_RECONCILE_LEASE = "like_reconcile_lease"
+
+# Content-addressed media storage, thumbnails rendered in a process pool
+MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+media_storage = media_store.MediaStore(workers=MEDIA_WORKERS)
+UPLOAD_GC_SECONDS = int(os.environ.get('UPLOAD_GC_SECONDS', 600))
+
+# Authenticated principal cache, kept consistent across workers via principalVersion
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 60))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+PRINCIPAL_SYNC_MS = int(os.environ.get('PRINCIPAL_SYNC_MS', 1000))
+principals = principal_cache.PrincipalCache(ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS, max_entries=PRINCIPAL_CACHE_SIZE)
+PRINCIPAL_FIELDS = {
+    field: 1 for field in (
+        "firstName", "lastName", "username", "email", "phone", "bio", "avatar",
+        "createdAt", "isActive", "principalVersion",
+    )
+}
+
+# Real-time messaging: in-process pub/sub feeding the WebSocket connections, and a
+# backplane carrying events to the other workers ("mongo" tails a capped collection,
+# "local" is for single-worker deployments)
+realtime_hub = realtime.Hub()
+REALTIME_BACKPLANE = os.environ.get('REALTIME_BACKPLANE', 'mongo')
+REALTIME_BATCH_MS = int(os.environ.get('REALTIME_BATCH_MS', 20))
+REALTIME_MAX_BATCH = int(os.environ.get('REALTIME_MAX_BATCH', 500))
+REALTIME_EVENTS_SIZE_MB = int(os.environ.get('REALTIME_EVENTS_SIZE_MB', 64))
+realtime_bus = backplane.create_backplane(
+    REALTIME_BACKPLANE, batch_ms=REALTIME_BATCH_MS, max_batch=REALTIME_MAX_BATCH, size_mb=REALTIME_EVENTS_SIZE_MB
+)
+
 # Security
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Rotating refresh tokens: single use, stored as SHA-256 digests, expired by a TTL index
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get('REFRESH_TOKEN_EXPIRE_DAYS', 30))
+
+# Hashes with a different cost are transparently upgraded on the next login
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt runs in a bounded thread pool so it never blocks the event loop
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+PASSWORD_HASH_QUEUE_TIMEOUT_MS = int(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT_MS', 2000))
+password_hasher = password_pool.PasswordPool(
+    pwd_context,
+    workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+    queue_timeout_ms=PASSWORD_HASH_QUEUE_TIMEOUT_MS,
+)
 security = HTTPBearer()
 
 # Create the main app without a prefix
@@ -70,6 +174,10 @@ class UserUpdate(BaseModel):
     avatar: Optional[str] = None
     phone: Optional[str] = Field(None, min_length=10, max_length=15)
 
+class PasswordChange(BaseModel):
+    currentPassword: str
+    newPassword: str = Field(..., min_length=6, max_length=100)
+
 class UserOut(BaseModel):
     id: str
     firstName: str
@@ -85,6 +193,10 @@ class UserOut(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
@@ -137,6 +249,7 @@ class RecipeOut(BaseModel):
     prepTimeMinutes: Optional[int] = None
     difficulty: Optional[str] = None
     tags: Optional[List[str]] = None
+    imageBlurhash: Optional[str] = None
 
 
 def recipe_doc_to_out(doc, user_id: str = None) -> RecipeOut:
@@ -148,7 +261,8 @@ def recipe_doc_to_out(doc, user_id: str = None) -> RecipeOut:
         instructions=doc.get("instructions", []),
         image=doc["image"],
         author=doc["author"],
-        likes=doc.get("likes", 0),
+        # Include likes still waiting in the write-behind buffer
+        likes=doc.get("likes", 0) + like_counter_buffer.pending_delta(doc.get("_id")),
         createdAt=doc.get("createdAt", datetime.utcnow()),
         isLiked=False,
         isSaved=False,
@@ -156,14 +270,227 @@ def recipe_doc_to_out(doc, user_id: str = None) -> RecipeOut:
         prepTimeMinutes=doc.get("prepTimeMinutes"),
         difficulty=doc.get("difficulty"),
         tags=doc.get("tags"),
+        imageBlurhash=doc.get("imageBlurhash"),
     )
 
+# Compact recipe for list screens (RecipeCard): no instructions and only the first
+# ingredients. Also carries arbitrary `?fields=` selections, so every field but
+# `id` is optional and unset fields are left out of the response.
+class RecipeSummaryOut(BaseModel):
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    ingredients: Optional[List[str]] = None
+    instructions: Optional[List[str]] = None
+    image: Optional[str] = None
+    imageBlurhash: Optional[str] = None
+    author: Optional[Author] = None
+    likes: Optional[int] = None
+    createdAt: Optional[datetime] = None
+    isLiked: Optional[bool] = None
+    isSaved: Optional[bool] = None
+    servings: Optional[int] = None
+    prepTimeMinutes: Optional[int] = None
+    difficulty: Optional[str] = None
+    tags: Optional[List[str]] = None
+
+RecipeListItem = Union[RecipeOut, RecipeSummaryOut]
+
+SUMMARY_INGREDIENTS = 4
+RECIPE_SUMMARY_FIELDS = frozenset({
+    "id", "title", "description", "ingredients", "image", "imageBlurhash", "author", "likes",
+    "createdAt", "isLiked", "isSaved", "servings", "prepTimeMinutes", "difficulty", "tags",
+})
+VIEWER_FIELDS = frozenset({"isLiked", "isSaved"})
+RECIPE_ITEM_FIELDS = [field for field in RecipeSummaryOut.model_fields if field != "id"]
+
+# Sparse fieldsets: ?fields=summary, ?fields=full (default) or a comma-separated
+# list of RecipeOut fields. The selection is pushed down as a Mongo projection.
+def parse_recipe_fields(fields: Optional[str]) -> Optional[frozenset]:
+    if not fields or fields == "full":
+        return None
+    if fields == "summary":
+        return RECIPE_SUMMARY_FIELDS
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - RecipeOut.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown recipe fields: {', '.join(sorted(unknown))}")
+    return frozenset(selected | {"id"})
+
+def recipe_projection(selected: Optional[frozenset]) -> Optional[dict]:
+    if selected is None:
+        return None
+    # createdAt is always read: it is the keyset cursor
+    projection = {"createdAt": 1}
+    for field in selected - VIEWER_FIELDS - {"id"}:
+        projection[field] = 1
+    if selected is RECIPE_SUMMARY_FIELDS:
+        projection["ingredients"] = {"$slice": SUMMARY_INGREDIENTS}
+    return projection
+
+# Fast path for hot lists: documents are mapped to plain dicts shaped exactly like
+# RecipeOut / RecipeSummaryOut and encoded by fast_json, skipping model construction
+# and response_model validation.
+def author_to_item(author: dict) -> dict:
+    return {"id": author["id"], "name": author["name"], "avatar": author["avatar"]}
+
+def recipe_doc_to_item(doc, selected: Optional[frozenset] = None) -> dict:
+    if selected is None:
+        return {
+            "id": str(doc["_id"]),
+            "title": doc["title"],
+            "description": doc.get("description", ""),
+            "ingredients": doc.get("ingredients", []),
+            "instructions": doc.get("instructions", []),
+            "image": doc["image"],
+            "author": author_to_item(doc["author"]),
+            "likes": doc.get("likes", 0) + like_counter_buffer.pending_delta(doc["_id"]),
+            "createdAt": doc.get("createdAt", datetime.utcnow()),
+            "isLiked": False,
+            "isSaved": False,
+            "servings": doc.get("servings"),
+            "prepTimeMinutes": doc.get("prepTimeMinutes"),
+            "difficulty": doc.get("difficulty"),
+            "tags": doc.get("tags"),
+            "imageBlurhash": doc.get("imageBlurhash"),
+        }
+    
+    # Sparse item: requested fields only, missing document fields left out
+    item = {"id": str(doc["_id"])}
+    for field in RECIPE_ITEM_FIELDS:
+        if field not in selected:
+            continue
+        if field in VIEWER_FIELDS:
+            item[field] = False
+        elif field == "likes":
+            item["likes"] = doc.get("likes", 0) + like_counter_buffer.pending_delta(doc["_id"])
+        elif field == "author" and field in doc:
+            item["author"] = author_to_item(doc["author"])
+        elif field in doc:
+            item[field] = doc[field]
+    return item
+
+def recipe_docs_to_items(docs, selected: Optional[frozenset] = None) -> List[dict]:
+    return [recipe_doc_to_item(doc, selected) for doc in docs]
+
+async def hydrate_item_viewer_state(items: List[dict], user_id: Optional[str], selected: Optional[frozenset]):
+    fields = VIEWER_FIELDS if selected is None else selected & VIEWER_FIELDS
+    if not user_id or not items or not fields:
+        return items
+    memberships = await fetch_viewer_memberships([ObjectId(item["id"]) for item in items], user_id, fields)
+    for field, member_ids in memberships.items():
+        for item in items:
+            item[field] = item["id"] in member_ids
+    return items
+
+class RecipePage(BaseModel):
+    items: List[RecipeListItem]
+    nextCursor: Optional[str] = None
+
+
+# Keyset pagination: opaque cursor over the (createdAt, _id) sort key
+def encode_cursor(doc) -> str:
+    raw = f"{doc['createdAt'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, oid = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(oid)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def cursor_filter(cursor: str, field: str = "createdAt", direction: int = -1, id_field: str = "_id") -> dict:
+    created_at, oid = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    return {"$or": [
+        {field: {op: created_at}},
+        {field: created_at, id_field: {op: oid}},
+    ]}
+
+# Conditional requests: weak ETags derived from the version fields behind a
+# response (updatedAt, denormalized counters, viewer state). When the client sends
+# If-None-Match the tag is computed from cheap projections first, and a 304 is
+# answered before the full response is built.
+PUBLIC_CACHE_CONTROL = "public, no-cache"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+def cache_headers(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Authorization"}
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag, cache_control))
+
+# Viewer state hydration: resolve isLiked/isSaved for a batch of recipes with
+# one $in query per membership collection, issued concurrently.
+async def fetch_viewer_memberships(recipe_ids: List[ObjectId], user_id: str, fields: frozenset) -> dict:
+    query = {"userId": ObjectId(user_id), "recipeId": {"$in": recipe_ids}}
+    projection = {"recipeId": 1, "_id": 0}
+    
+    collections = {"isLiked": db.user_likes, "isSaved": db.user_saves}
+    wanted = [field for field in ("isLiked", "isSaved") if field in fields]
+    results = await asyncio.gather(*(
+        collections[field].find(query, projection).to_list(len(recipe_ids)) for field in wanted
+    ))
+    return {
+        field: {str(membership["recipeId"]) for membership in memberships}
+        for field, memberships in zip(wanted, results)
+    }
+
+async def viewer_memberships(recipe_ids: List[ObjectId], user_id: Optional[str]) -> dict:
+    """Like fetch_viewer_memberships, empty for anonymous viewers"""
+    if not user_id:
+        return {}
+    return await fetch_viewer_memberships(recipe_ids, user_id, VIEWER_FIELDS)
+
+async def hydrate_viewer_state(recipes: List[RecipeOut], user_id: Optional[str]) -> List[RecipeOut]:
+    if not user_id or not recipes:
+        return recipes
+    
+    memberships = await fetch_viewer_memberships([ObjectId(recipe.id) for recipe in recipes], user_id, VIEWER_FIELDS)
+    for recipe in recipes:
+        recipe.isLiked = recipe.id in memberships["isLiked"]
+        recipe.isSaved = recipe.id in memberships["isSaved"]
+    return recipes
+
 # Authentication utilities
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, please retry",
+        headers={"Retry-After": "1"},
+    )
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_password(plain_password: str, hashed_password: str):
+    """Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost"""
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except password_pool.PoolSaturated:
+        raise password_pool_busy()
+
+async def get_password_hash(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except password_pool.PoolSaturated:
+        raise password_pool_busy()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -175,6 +502,32 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def refresh_token_digest(token: str) -> str:
+    # Tokens are 256 random bits: a fast hash is enough, bcrypt would defeat the purpose
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_refresh_token(user_id: ObjectId, email: str, family_id: Optional[str] = None) -> str:
+    """Stores a new refresh token; rotations keep the family of the token they replace"""
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db.refresh_tokens.insert_one({
+        "_id": refresh_token_digest(token),
+        "userId": user_id,
+        "email": email,
+        "familyId": family_id or uuid.uuid4().hex,
+        "createdAt": now,
+        "expiresAt": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    })
+    return token
+
+async def revoke_refresh_tokens(user_id: ObjectId):
+    await db.refresh_tokens.delete_many({"userId": user_id})
+
+def issue_access_token(email: str) -> str:
+    return create_access_token(
+        data={"sub": email}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
 def user_doc_to_out(doc) -> UserOut:
     return UserOut(
         id=str(doc.get("_id")),
@@ -189,14 +542,24 @@ def user_doc_to_out(doc) -> UserOut:
         isActive=doc.get("isActive", True),
     )
 
+async def store_inline_image(value: Optional[str], owner_id: Optional[ObjectId] = None):
+    """Moves inline data-URI images into the media store; returns (reference, blurhash)"""
+    try:
+        return await media_storage.ingest(db, value, owner_id)
+    except media_store.MediaError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await resolve_principal(credentials.credentials)
+
+async def resolve_principal(token: str) -> UserOut:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -204,10 +567,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user = await db.users.find_one({"email": token_data.email})
-    if user is None:
+    principal = principals.get(token_data.email)
+    if principal is None:
+        user = await db.users.find_one({"email": token_data.email}, PRINCIPAL_FIELDS)
+        if user is None:
+            raise credentials_exception
+        principal = user_doc_to_out(user)
+        principals.put(token_data.email, principal, user.get("principalVersion", 0))
+    if not principal.isActive:
         raise credentials_exception
-    return user_doc_to_out(user)
+    # Copy so handlers can't mutate the cached instance
+    return principal.model_copy()
 
 async def get_current_user_optional(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
     if not credentials:
@@ -223,6 +593,24 @@ async def get_current_user_optional(credentials: Optional[HTTPAuthorizationCrede
 async def root():
     return {"message": "Hello World"}
 
+# Internal metrics, only served when METRICS_TOKEN is set and sent as X-Metrics-Token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+def require_metrics_token(request: Request):
+    token = request.headers.get("x-metrics-token", "")
+    if not METRICS_TOKEN or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@api_router.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    return {
+        "likeCounterBuffer": like_counter_buffer.snapshot(),
+        "principalCache": principals.snapshot(),
+        "passwordHashPool": password_hasher.snapshot(),
+        "realtime": realtime_hub.snapshot(),
+        "realtimeBackplane": realtime_bus.snapshot(),
+    }
+
 # Status
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
@@ -263,6 +651,8 @@ async def register_user(user_data: UserCreate):
             detail="Invalid phone number format"
         )
     
+    avatar, _ = await store_inline_image(user_data.avatar)
+    
     # Create user document
     user_doc = {
         "firstName": user_data.firstName,
@@ -270,16 +660,22 @@ async def register_user(user_data: UserCreate):
         "username": user_data.username,
         "email": user_data.email,
         "phone": user_data.phone,
-        "password": get_password_hash(user_data.password),
-        "avatar": user_data.avatar,
+        "password": await get_password_hash(user_data.password),
+        "avatar": avatar,
         "bio": None,
+        "principalVersion": principal_cache.new_version(),
         "createdAt": datetime.now(),
         "updatedAt": datetime.now(),
         "isActive": True,
+        "searchKeys": search_index.user_search_keys(user_data.firstName, user_data.lastName, user_data.username),
+        "followersCount": 0,
+        "followingCount": 0,
+        "recipesCount": 0,
     }
     
     result = await db.users.insert_one(user_doc)
     user_doc["_id"] = result.inserted_id
+    typeahead_index.bump("user", user_doc["username"])
     
     return user_doc_to_out(user_doc)
 
@@ -287,24 +683,64 @@ async def register_user(user_data: UserCreate):
 async def login_user(user_credentials: UserLogin):
     # Find user by email
     user = await db.users.find_one({"email": user_credentials.email})
-    if not user or not verify_password(user_credentials.password, user["password"]):
+    valid, new_hash = await verify_password(user_credentials.password, user["password"]) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        # Only the hash changes: the cached principal stays valid
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+    
     if not user.get("isActive", True):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Account is deactivated"
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user["email"]}, expires_delta=access_token_expires
+    return {
+        "access_token": issue_access_token(user["email"]),
+        "token_type": "bearer",
+        "refresh_token": await issue_refresh_token(user["_id"], user["email"]),
+    }
+
+@api_router.post("/auth/refresh", response_model=Token)
+async def refresh_access_token(payload: RefreshRequest):
+    digest = refresh_token_digest(payload.refresh_token)
+    now = datetime.utcnow()
+    # Consume the token atomically: a single indexed lookup on the happy path
+    stored = await db.refresh_tokens.find_one_and_update(
+        {"_id": digest, "usedAt": {"$exists": False}, "expiresAt": {"$gt": now}},
+        {"$set": {"usedAt": now}},
+        projection={"userId": 1, "email": 1, "familyId": 1},
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    if not stored:
+        # A consumed token presented again means it leaked: revoke the whole family
+        replayed = await db.refresh_tokens.find_one({"_id": digest, "usedAt": {"$exists": True}}, {"familyId": 1})
+        if replayed:
+            await db.refresh_tokens.delete_many({"familyId": replayed["familyId"]})
+            logger.warning(f"Refresh token reuse detected, family {replayed['familyId']} revoked")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return {
+        "access_token": issue_access_token(stored["email"]),
+        "token_type": "bearer",
+        "refresh_token": await issue_refresh_token(stored["userId"], stored["email"], stored["familyId"]),
+    }
+
+@api_router.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_user(payload: RefreshRequest):
+    stored = await db.refresh_tokens.find_one({"_id": refresh_token_digest(payload.refresh_token)}, {"familyId": 1})
+    if stored:
+        await db.refresh_tokens.delete_many({"familyId": stored["familyId"]})
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # User Management Routes
 @api_router.get("/users/me", response_model=UserOut)
@@ -335,11 +771,21 @@ async def update_current_user(
             )
     
     # Build update document
-    update_doc = {"updatedAt": datetime.utcnow()}
+    update_doc = {"updatedAt": datetime.utcnow(), "principalVersion": principal_cache.new_version()}
     for field, value in user_update.dict(exclude_unset=True).items():
         if value is not None:
             update_doc[field] = value
     
+    if "avatar" in update_doc:
+        update_doc["avatar"], _ = await store_inline_image(update_doc["avatar"], ObjectId(current_user.id))
+    
+    if {"firstName", "lastName", "username"} & update_doc.keys():
+        update_doc["searchKeys"] = search_index.user_search_keys(
+            update_doc.get("firstName", current_user.firstName),
+            update_doc.get("lastName", current_user.lastName),
+            update_doc.get("username", current_user.username),
+        )
+    
     # Update user in database
     result = await db.users.update_one(
         {"_id": ObjectId(current_user.id)},
@@ -352,10 +798,80 @@ async def update_current_user(
             detail="User not found"
         )
     
+    principals.invalidate(current_user.email)
+    
+    if "username" in update_doc and update_doc["username"] != current_user.username:
+        typeahead_index.discard("user", current_user.username)
+        typeahead_index.bump("user", update_doc["username"])
+    
     # Return updated user
-    updated_user = await db.users.find_one({"_id": ObjectId(current_user.id)})
+    updated_user = await db.users.find_one({"_id": ObjectId(current_user.id)}, PRINCIPAL_FIELDS)
     return user_doc_to_out(updated_user)
 
+@api_router.put("/users/me/password", status_code=status.HTTP_204_NO_CONTENT)
+async def change_password(payload: PasswordChange, current_user: UserOut = Depends(get_current_user)):
+    user = await db.users.find_one({"_id": ObjectId(current_user.id)}, {"password": 1})
+    valid, _ = await verify_password(payload.currentPassword, user["password"]) if user else (False, None)
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Incorrect password"
+        )
+    
+    await db.users.update_one(
+        {"_id": user["_id"]},
+        {"$set": {
+            "password": await get_password_hash(payload.newPassword),
+            "updatedAt": datetime.utcnow(),
+            "principalVersion": principal_cache.new_version(),
+        }}
+    )
+    principals.invalidate(current_user.email)
+    await revoke_refresh_tokens(user["_id"])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@api_router.post("/users/me/deactivate", status_code=status.HTTP_204_NO_CONTENT)
+async def deactivate_current_user(current_user: UserOut = Depends(get_current_user)):
+    await db.users.update_one(
+        {"_id": ObjectId(current_user.id)},
+        {"$set": {
+            "isActive": False,
+            "updatedAt": datetime.utcnow(),
+            "principalVersion": principal_cache.new_version(),
+        }}
+    )
+    principals.invalidate(current_user.email)
+    await revoke_refresh_tokens(ObjectId(current_user.id))
+    typeahead_index.discard("user", current_user.username)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# Endpoint pour rechercher des utilisateurs
+# Correspondance exacte sur les préfixes normalisés de searchKeys (index multikey),
+# compteurs lus depuis les champs dénormalisés du document utilisateur
+@api_router.get("/users/search")
+async def search_users(query: str, current_user: UserOut = Depends(get_current_user)):
+    words = search_index.user_search_words(query)[:3]
+    if not words:
+        return []
+    
+    users = await db.users.find(
+        {"searchKeys": {"$all": words}},
+        {"firstName": 1, "lastName": 1, "username": 1, "avatar": 1, "followersCount": 1, "recipesCount": 1}
+    ).sort("followersCount", -1).limit(20).to_list(20)
+    
+    return [
+        {
+            "id": str(user["_id"]),
+            "firstName": user.get("firstName", ""),
+            "lastName": user.get("lastName", ""),
+            "username": user.get("username", ""),
+            "avatar": user.get("avatar", ""),
+            "followersCount": user.get("followersCount", 0),
+            "recipesCount": user.get("recipesCount", 0)
+        }
+        for user in users
+    ]
+
 @api_router.get("/users/{user_id}", response_model=UserOut)
 async def get_user_by_id(user_id: str):
     try:
@@ -373,164 +889,747 @@ async def get_user_by_id(user_id: str):
         )
 
 
+# Following timeline (fan-out-on-write)
+# Each follower gets one `timelines` entry per recipe: {userId, recipeId,
+# authorId, createdAt}. Reading is a range scan on (userId, createdAt, recipeId).
+_fanout_on_read_authors = {"ids": set(), "loadedAt": None}
+
+async def get_fanout_on_read_authors() -> set:
+    loaded_at = _fanout_on_read_authors["loadedAt"]
+    if loaded_at is None or datetime.utcnow() - loaded_at > timedelta(minutes=1):
+        docs = await db.users.find({"fanoutOnRead": True}, {"_id": 1}).to_list(None)
+        _fanout_on_read_authors["ids"] = {doc["_id"] for doc in docs}
+        _fanout_on_read_authors["loadedAt"] = datetime.utcnow()
+    return _fanout_on_read_authors["ids"]
+
+async def insert_timeline_entries(entries: List[dict]):
+    try:
+        await db.timelines.insert_many(entries, ordered=False)
+    except BulkWriteError:
+        # Entries already present (e.g. from a follow backfill) are skipped
+        pass
+
+async def fanout_recipe(recipe_doc: dict):
+    author_id = recipe_doc["authorId"]
+    try:
+        author = await db.users.find_one({"_id": author_id}, {"followersCount": 1})
+        if author and author.get("followersCount", 0) > FANOUT_MAX_FOLLOWERS:
+            # Too many followers: served by fan-out-on-read in get_following_feed
+            await db.users.update_one({"_id": author_id}, {"$set": {"fanoutOnRead": True}})
+            _fanout_on_read_authors["loadedAt"] = None
+            return
+        
+        batch = []
+        async for follow in db.follows.find({"followingId": author_id}, {"followerId": 1}):
+            batch.append({
+                "userId": follow["followerId"],
+                "recipeId": recipe_doc["_id"],
+                "authorId": author_id,
+                "createdAt": recipe_doc["createdAt"],
+            })
+            if len(batch) >= FANOUT_BATCH_SIZE:
+                await insert_timeline_entries(batch)
+                batch = []
+        if batch:
+            await insert_timeline_entries(batch)
+    except Exception as e:
+        logger.error(f"Timeline fan-out failed for recipe {recipe_doc['_id']}: {e}")
+
+async def recent_recipes(author_id: ObjectId) -> List[dict]:
+    return await db.recipes.find(
+        {"authorId": author_id}, {"_id": 1, "createdAt": 1}
+    ).sort("createdAt", -1).limit(FANOUT_BACKFILL_LIMIT).to_list(FANOUT_BACKFILL_LIMIT)
+
+def timeline_entries(follower_id: ObjectId, author_id: ObjectId, recipes: List[dict]) -> List[dict]:
+    return [
+        {"userId": follower_id, "recipeId": recipe["_id"], "authorId": author_id, "createdAt": recipe["createdAt"]}
+        for recipe in recipes
+    ]
+
+async def backfill_timeline(follower_id: ObjectId, following_id: ObjectId):
+    recipes = await recent_recipes(following_id)
+    if recipes:
+        await insert_timeline_entries(timeline_entries(follower_id, following_id, recipes))
+
+async def update_follow_counters(follower_id: ObjectId, following_id: ObjectId, delta: int) -> Optional[dict]:
+    """Returns the followed user's followersCount and fanoutOnRead after the update"""
+    following, _ = await asyncio.gather(
+        db.users.find_one_and_update(
+            {"_id": following_id}, {"$inc": {"followersCount": delta}},
+            projection={"followersCount": 1, "fanoutOnRead": 1}, return_document=ReturnDocument.AFTER
+        ),
+        db.users.update_one({"_id": follower_id}, {"$inc": {"followingCount": delta}}),
+    )
+    return following
+
+def fanout_on_read_expired(following: Optional[dict]) -> bool:
+    return bool(following and following.get("fanoutOnRead") and following.get("followersCount", 0) <= FANOUT_RESUME_FOLLOWERS)
+
+async def leave_fanout_on_read(author_id: ObjectId):
+    # Guarded so that only one unfollow switches the author back
+    result = await db.users.update_one(
+        {"_id": author_id, "fanoutOnRead": True, "followersCount": {"$lte": FANOUT_RESUME_FOLLOWERS}},
+        {"$unset": {"fanoutOnRead": ""}}
+    )
+    if not result.modified_count:
+        return
+    _fanout_on_read_authors["loadedAt"] = None
+    
+    # Recipes published while on fan-out-on-read never reached the timelines
+    try:
+        recipes = await recent_recipes(author_id)
+        if not recipes:
+            return
+        batch = []
+        async for follow in db.follows.find({"followingId": author_id}, {"followerId": 1}):
+            batch.extend(timeline_entries(follow["followerId"], author_id, recipes))
+            if len(batch) >= FANOUT_BATCH_SIZE:
+                await insert_timeline_entries(batch)
+                batch = []
+        if batch:
+            await insert_timeline_entries(batch)
+    except Exception as e:
+        logger.error(f"Timeline backfill failed for author {author_id}: {e}")
+
+async def remove_from_timeline(follower_id: ObjectId, following_id: ObjectId):
+    await db.timelines.delete_many({"userId": follower_id, "authorId": following_id})
+
+# Typeahead suggestions
+def bump_recipe_suggestions(recipe_doc: dict, delta: int):
+    for tag in recipe_doc.get("tags") or []:
+        typeahead_index.bump("tag", tag, delta)
+    for text in recipe_doc.get("ingredients") or []:
+        name = ingredient_index.ingredient_name(text)
+        if name:
+            typeahead_index.bump("ingredient", name, delta)
+
+async def unbump_followed_user(following_id: ObjectId):
+    # Undo the suggestion weight added by the follow
+    following = await db.users.find_one({"_id": following_id}, {"username": 1})
+    if following and following.get("username"):
+        typeahead_index.bump("user", following["username"], -1)
+
+@api_router.get("/suggest")
+async def suggest(prefix: str, types: Optional[str] = None, limit: int = 8):
+    kinds = [kind for kind in types.split(",") if kind in suggest_index.KINDS] if types else None
+    return typeahead_index.suggest(prefix[:50], kinds=kinds, limit=max(1, min(limit, suggest_index.PRECOMPUTED_K)))
+
+# Media uploads
+# Content-addressed: the id is the SHA-256 of the uploaded bytes, so every URL is
+# immutable and can be cached forever by clients and proxies.
+class MediaOut(BaseModel):
+    id: str
+    url: str
+    mime: str
+    width: int
+    height: int
+    blurhash: str
+    variants: List[str]
+
+def media_doc_to_out(doc) -> MediaOut:
+    return MediaOut(
+        id=doc["_id"],
+        url=media_store.media_reference(doc["_id"]),
+        mime=doc["mime"],
+        width=doc["width"],
+        height=doc["height"],
+        blurhash=doc["blurhash"],
+        variants=list(media_store.VARIANTS),
+    )
+
+def parse_byte_range(header: str, size: int) -> Optional[tuple]:
+    """Parses a single `bytes=` range into inclusive (start, end); None serves the whole file"""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if start:
+            first, last = int(start), int(end) if end else size - 1
+        else:
+            first, last = max(size - int(end), 0), size - 1
+    except ValueError:
+        return None
+    if first > last or first >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return first, min(last, size - 1)
+
+MEDIA_STREAM_BLOCK_BYTES = 64 * 1024
+
+async def stream_byte_range(path: Path, start: int, length: int):
+    """Streams `length` bytes from `start` in blocks, without loading the file"""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            block = await asyncio.to_thread(f.read, min(MEDIA_STREAM_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        await asyncio.to_thread(f.close)
+
+@api_router.post("/media", response_model=MediaOut)
+async def upload_media(file: UploadFile = File(...), current_user: UserOut = Depends(get_current_user)):
+    data = await file.read(media_store.MAX_UPLOAD_BYTES + 1)
+    if len(data) > media_store.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+    try:
+        doc = await media_storage.save(db, data, ObjectId(current_user.id))
+    except media_store.MediaError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return media_doc_to_out(doc)
+
+# Resumable uploads
+# POST creates a session, chunks are PUT by index with their SHA-256 in the
+# X-Chunk-SHA256 header and streamed straight to disk, GET returns the contiguous
+# offset received so far, and /complete hands the file over to the media store.
+class UploadSessionCreate(BaseModel):
+    size: int = Field(..., gt=0, le=media_store.MAX_RESUMABLE_BYTES)
+
+class UploadSessionOut(BaseModel):
+    uploadId: str
+    size: int
+    chunkSize: int
+    offset: int
+    nextChunk: int
+    expiresAt: datetime
+
+def upload_session_to_out(session) -> UploadSessionOut:
+    return UploadSessionOut(
+        uploadId=session["_id"],
+        size=session["size"],
+        chunkSize=session["chunkSize"],
+        offset=session["offset"],
+        nextChunk=session["offset"] // session["chunkSize"],
+        expiresAt=session["expiresAt"],
+    )
+
+async def get_upload_session(upload_id: str, current_user: UserOut) -> dict:
+    session = await db.upload_sessions.find_one({"_id": upload_id, "ownerId": ObjectId(current_user.id)})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+@api_router.post("/media/uploads", response_model=UploadSessionOut)
+async def create_upload_session(body: UploadSessionCreate, current_user: UserOut = Depends(get_current_user)):
+    now = datetime.utcnow()
+    session = {
+        "_id": uuid.uuid4().hex,
+        "ownerId": ObjectId(current_user.id),
+        "size": body.size,
+        "chunkSize": media_store.UPLOAD_CHUNK_BYTES,
+        "offset": 0,
+        "createdAt": now,
+        "expiresAt": now + media_store.UPLOAD_SESSION_TTL,
+    }
+    await media_store.create_part_file(session["_id"], body.size)
+    await db.upload_sessions.insert_one(session)
+    return upload_session_to_out(session)
+
+@api_router.get("/media/uploads/{upload_id}", response_model=UploadSessionOut)
+async def get_upload_status(upload_id: str, current_user: UserOut = Depends(get_current_user)):
+    return upload_session_to_out(await get_upload_session(upload_id, current_user))
+
+@api_router.put("/media/uploads/{upload_id}/chunks/{index}", response_model=UploadSessionOut)
+async def upload_chunk(upload_id: str, index: int, request: Request, current_user: UserOut = Depends(get_current_user)):
+    checksum = request.headers.get("x-chunk-sha256")
+    if not checksum:
+        raise HTTPException(status_code=400, detail="Missing X-Chunk-SHA256 header")
+    
+    session = await get_upload_session(upload_id, current_user)
+    start = index * session["chunkSize"]
+    if index < 0 or start >= session["size"]:
+        raise HTTPException(status_code=400, detail="Chunk index out of range")
+    # Chunks arrive in order; re-sending an already received chunk is allowed
+    if start > session["offset"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Expected chunk {session['offset'] // session['chunkSize']}",
+        )
+    
+    length = min(session["chunkSize"], session["size"] - start)
+    if int(request.headers.get("content-length") or 0) > length:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Chunk larger than {length} bytes")
+    # A chunk below the offset was already accepted: only verify the re-sent body,
+    # so a truncated or corrupted retry cannot overwrite good bytes
+    already_received = start + length <= session["offset"]
+    try:
+        digest = await media_store.write_chunk(
+            upload_id, start, length, request.stream(), write=not already_received
+        )
+    except media_store.MediaError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if digest != checksum.strip().lower():
+        raise HTTPException(status_code=400, detail="Checksum mismatch")
+    # The client's checksum alone would accept different bytes under a fresh
+    # checksum: a re-sent chunk must match the one recorded when it was accepted
+    accepted_digest = (session.get("chunkHashes") or {}).get(str(index))
+    if already_received and accepted_digest is not None and digest != accepted_digest:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Chunk {index} differs from the one already received")
+    
+    update = {"expiresAt": datetime.utcnow() + media_store.UPLOAD_SESSION_TTL}
+    if not already_received:
+        update[f"chunkHashes.{index}"] = digest
+    updated = await db.upload_sessions.find_one_and_update(
+        {"_id": upload_id},
+        {"$max": {"offset": start + length}, "$set": update},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload_session_to_out(updated)
+
+@api_router.post("/media/uploads/{upload_id}/complete", response_model=MediaOut)
+async def complete_upload(upload_id: str, current_user: UserOut = Depends(get_current_user)):
+    session = await get_upload_session(upload_id, current_user)
+    if session["offset"] < session["size"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload incomplete: {session['offset']} of {session['size']} bytes received",
+        )
+    
+    # Claim the session so a retried /complete cannot process the file twice
+    if await db.upload_sessions.find_one_and_delete({"_id": upload_id}) is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    try:
+        doc = await media_storage.save_file(db, media_store.upload_part_path(upload_id), ObjectId(current_user.id))
+    except media_store.MediaError as e:
+        await media_store.discard_part_file(upload_id)
+        raise HTTPException(status_code=400, detail=str(e))
+    return media_doc_to_out(doc)
+
+@api_router.delete("/media/uploads/{upload_id}", response_model=dict)
+async def abort_upload(upload_id: str, current_user: UserOut = Depends(get_current_user)):
+    session = await get_upload_session(upload_id, current_user)
+    await db.upload_sessions.delete_one({"_id": session["_id"]})
+    await media_store.discard_part_file(upload_id)
+    return {"message": "Upload aborted"}
+
+@api_router.get("/media/{media_id}")
+async def get_media(
+    media_id: str,
+    request: Request,
+    size: Literal["original", "thumb", "medium", "large"] = "original",
+):
+    if not media_store.MEDIA_ID_RE.match(media_id):
+        raise HTTPException(status_code=404, detail="Media not found")
+    
+    etag = media_store.variant_etag(media_id, size)
+    headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # Thumbnails are always WebP; only the original needs its stored type
+    if size == "original":
+        doc = await db.media.find_one({"_id": media_id}, {"mime": 1})
+        if doc is None:
+            raise HTTPException(status_code=404, detail="Media not found")
+        mime = doc["mime"]
+    else:
+        mime = "image/webp"
+    
+    path = media_store.media_path(media_id, size)
+    try:
+        file_size = path.stat().st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Media not found")
+    
+    byte_range = parse_byte_range(request.headers["range"], file_size) if "range" in request.headers else None
+    if byte_range is None:
+        return FileResponse(path, media_type=mime, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        stream_byte_range(path, start, end - start + 1),
+        status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=mime, headers=headers
+    )
+
+RECIPES_MAX_PAGE_SIZE = 50
+
 # Recipes with infinite scroll
-@api_router.get("/recipes", response_model=List[RecipeOut])
+# Two modes: legacy page/limit (skip-based) and keyset mode when `cursor` is
+# passed (empty string for the first page). Keyset mode is backed by the
+# (createdAt, _id) index and returns {items, nextCursor}.
+@api_router.get("/recipes", response_model=Union[RecipePage, List[RecipeListItem]])
 async def list_recipes(
-    page: int = 1,
-    limit: int = 10,
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=RECIPES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: Optional[UserOut] = Depends(get_current_user_optional)
 ):
-    # Calculate skip for pagination
-    skip = (page - 1) * limit
-    
-    # Get recipes with pagination
-    cursor = db.recipes.find({}, sort=[("createdAt", -1)]).skip(skip).limit(limit)
-    docs = await cursor.to_list(limit)
-    
-    recipes = []
-    for doc in docs:
-        user_id = current_user.id if current_user else None
-        recipe = recipe_doc_to_out(doc, user_id)
-        recipes.append(recipe)
-    
-    # If user is authenticated, check likes, saves and reactions
-    if current_user:
-        user_id = current_user.id
-        liked_recipes = await db.user_likes.find({"userId": ObjectId(user_id)}).to_list(1000)
-        saved_recipes = await db.user_saves.find({"userId": ObjectId(user_id)}).to_list(1000)
-        
-        liked_ids = {str(like["recipeId"]) for like in liked_recipes}
-        saved_ids = {str(save["recipeId"]) for save in saved_recipes}
-        
-        for recipe in recipes:
-            recipe.isLiked = recipe.id in liked_ids
-            recipe.isSaved = recipe.id in saved_ids
+    sort = [("createdAt", -1), ("_id", -1)]
+    selected = parse_recipe_fields(fields)
+    projection = recipe_projection(selected)
     
-    return recipes
+    if cursor is not None:
+        query = cursor_filter(cursor) if cursor else {}
+        docs = await db.recipes.find(query, projection, sort=sort).limit(limit).to_list(limit)
+    else:
+        # Calculate skip for pagination
+        skip = (page - 1) * limit
+        docs = await db.recipes.find({}, projection, sort=sort).skip(skip).limit(limit).to_list(limit)
+    
+    recipes = recipe_docs_to_items(docs, selected)
+    
+    # If user is authenticated, check likes and saves for this page only
+    await hydrate_item_viewer_state(recipes, current_user.id if current_user else None, selected)
+    
+    if cursor is not None:
+        next_cursor = encode_cursor(docs[-1]) if len(docs) == limit else None
+        return fast_json.FastJSONResponse({"items": recipes, "nextCursor": next_cursor})
+    
+    return fast_json.FastJSONResponse(recipes)
+
+@api_router.get("/recipes/following", response_model=RecipePage)
+async def get_following_feed(
+    limit: int = Query(10, ge=1, le=RECIPES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: UserOut = Depends(get_current_user)
+):
+    user_id = ObjectId(current_user.id)
+    selected = parse_recipe_fields(fields)
+    sort = [("createdAt", -1), ("recipeId", -1)]
+    
+    query = {"userId": user_id}
+    if cursor:
+        query.update(cursor_filter(cursor, id_field="recipeId"))
+    entries = await db.timelines.find(query, {"recipeId": 1, "createdAt": 1}, sort=sort).limit(limit).to_list(limit)
+    keys = [(entry["createdAt"], entry["recipeId"]) for entry in entries]
+    
+    # Fan-out-on-read for followed authors with very large audiences
+    fanout_on_read = await get_fanout_on_read_authors()
+    if fanout_on_read:
+        follows = await db.follows.find(
+            {"followerId": user_id, "followingId": {"$in": list(fanout_on_read)}},
+            {"followingId": 1}
+        ).to_list(None)
+        if follows:
+            recipe_query = {"authorId": {"$in": [follow["followingId"] for follow in follows]}}
+            if cursor:
+                recipe_query.update(cursor_filter(cursor))
+            extra = await db.recipes.find(
+                recipe_query, {"_id": 1, "createdAt": 1}, sort=[("createdAt", -1), ("_id", -1)]
+            ).limit(limit).to_list(limit)
+            keys.extend((doc["createdAt"], doc["_id"]) for doc in extra)
+            keys = sorted(set(keys), reverse=True)[:limit]
+    
+    docs = await db.recipes.find(
+        {"_id": {"$in": [key[1] for key in keys]}}, recipe_projection(selected)
+    ).to_list(len(keys))
+    docs_by_id = {doc["_id"]: doc for doc in docs}
+    ordered = [docs_by_id[key[1]] for key in keys if key[1] in docs_by_id]
+    
+    recipes = await hydrate_item_viewer_state(recipe_docs_to_items(ordered, selected), current_user.id, selected)
+    next_cursor = None
+    if len(keys) == limit:
+        next_cursor = encode_cursor({"createdAt": keys[-1][0], "_id": keys[-1][1]})
+    return fast_json.FastJSONResponse({"items": recipes, "nextCursor": next_cursor})
+
+@api_router.get("/recipes/trending", response_model=List[RecipeListItem])
+async def get_trending_recipes(
+    limit: int = 20,
+    fields: Optional[str] = None,
+    current_user: Optional[UserOut] = Depends(get_current_user_optional)
+):
+    selected = parse_recipe_fields(fields)
+    # Served from the ranking materialized by ranking.refresh_trending
+    limit = max(1, min(limit, ranking.TRENDING_SIZE))
+    ranked = await db.trending_recipes.find({}, {"_id": 1}).sort("rank", 1).limit(limit).to_list(limit)
+    
+    recipe_ids = [doc["_id"] for doc in ranked]
+    docs = await db.recipes.find({"_id": {"$in": recipe_ids}}, recipe_projection(selected)).to_list(limit)
+    docs_by_id = {doc["_id"]: doc for doc in docs}
+    
+    recipes = recipe_docs_to_items([docs_by_id[rid] for rid in recipe_ids if rid in docs_by_id], selected)
+    await hydrate_item_viewer_state(recipes, current_user.id if current_user else None, selected)
+    return fast_json.FastJSONResponse(recipes)
+
+@api_router.get("/recipes/search", response_model=List[RecipeListItem])
+async def search_recipes(
+    q: str = "",
+    difficulty: Optional[Literal['easy','medium','hard']] = None,
+    maxPrepTime: Optional[int] = None,
+    minServings: Optional[int] = None,
+    maxServings: Optional[int] = None,
+    limit: int = 20,
+    offset: int = 0,
+    fields: Optional[str] = None,
+    current_user: Optional[UserOut] = Depends(get_current_user_optional)
+):
+    limit = max(1, min(limit, 50))
+    selected = parse_recipe_fields(fields)
+    recipe_ids = recipe_search_index.search(
+        q,
+        difficulty=difficulty,
+        max_prep_time=maxPrepTime,
+        min_servings=minServings,
+        max_servings=maxServings,
+        limit=limit,
+        offset=max(0, offset),
+    )
+    docs = await db.recipes.find({"_id": {"$in": recipe_ids}}, recipe_projection(selected)).to_list(len(recipe_ids))
+    docs_by_id = {doc["_id"]: doc for doc in docs}
+    
+    found = []
+    for recipe_id in recipe_ids:
+        if recipe_id in docs_by_id:
+            found.append(docs_by_id[recipe_id])
+        else:
+            # Deleted through another worker
+            recipe_search_index.remove(recipe_id)
+    recipes = recipe_docs_to_items(found, selected)
+    await hydrate_item_viewer_state(recipes, current_user.id if current_user else None, selected)
+    return fast_json.FastJSONResponse(recipes)
+
+def recipe_etag(doc, is_liked: bool, is_saved: bool) -> str:
+    likes = doc.get("likes", 0) + like_counter_buffer.pending_delta(doc["_id"])
+    return make_etag("recipe", doc["_id"], doc.get("updatedAt"), likes, is_liked, is_saved)
 
 @api_router.get("/recipes/{recipe_id}", response_model=RecipeOut)
-async def get_recipe_by_id(recipe_id: str, current_user: Optional[UserOut] = Depends(get_current_user_optional)):
-    try:
-        # Find the recipe
-        doc = await db.recipes.find_one({"_id": ObjectId(recipe_id)})
-        if not doc:
-            raise HTTPException(status_code=404, detail="Recipe not found")
-        
-        recipe = recipe_doc_to_out(doc)
-        
-        # If user is authenticated, check likes and saves
-        if current_user:
-            user_id = ObjectId(current_user.id)
-            recipe_object_id = ObjectId(recipe_id)
-            
-            # Check if user liked this recipe
-            is_liked = await db.user_likes.find_one({
-                "userId": user_id,
-                "recipeId": recipe_object_id
-            }) is not None
-            
-            # Check if user saved this recipe
-            is_saved = await db.user_saves.find_one({
-                "userId": user_id,
-                "recipeId": recipe_object_id
-            }) is not None
-            
-            recipe.isLiked = is_liked
-            recipe.isSaved = is_saved
-        
-        return recipe
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid recipe ID"
+async def get_recipe_by_id(
+    recipe_id: str,
+    request: Request,
+    response: Response,
+    current_user: Optional[UserOut] = Depends(get_current_user_optional)
+):
+    recipe_object_id = parse_recipe_id(recipe_id)
+    user_id = current_user.id if current_user else None
+    # Anonymous responses carry no per-viewer state and may be stored by shared caches
+    cache_control = PRIVATE_CACHE_CONTROL if user_id else PUBLIC_CACHE_CONTROL
+    
+    if request.headers.get("if-none-match"):
+        meta, memberships = await asyncio.gather(
+            db.recipes.find_one({"_id": recipe_object_id}, {"updatedAt": 1, "likes": 1}),
+            viewer_memberships([recipe_object_id], user_id),
         )
+        if meta:
+            etag = recipe_etag(
+                meta, recipe_id in memberships.get("isLiked", ()), recipe_id in memberships.get("isSaved", ())
+            )
+            if etag_matches(request, etag):
+                return not_modified(etag, cache_control)
+    
+    doc = await db.recipes.find_one({"_id": recipe_object_id})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    
+    recipe = recipe_doc_to_out(doc)
+    
+    # If user is authenticated, check likes and saves
+    await hydrate_viewer_state([recipe], user_id)
+    
+    response.headers.update(cache_headers(recipe_etag(doc, recipe.isLiked, recipe.isSaved), cache_control))
+    return recipe
 
 @api_router.post("/recipes", response_model=RecipeOut)
-async def create_recipe(input: RecipeCreate, current_user: UserOut = Depends(get_current_user)):
+async def create_recipe(input: RecipeCreate, background_tasks: BackgroundTasks, current_user: UserOut = Depends(get_current_user)):
     doc = input.dict()
     doc["authorId"] = ObjectId(current_user.id)
+    # Images are stored once in the media store, the recipe keeps a short reference
+    (doc["image"], doc["imageBlurhash"]), (doc["author"]["avatar"], _) = await asyncio.gather(
+        store_inline_image(input.image, doc["authorId"]),
+        store_inline_image(input.author.avatar, doc["authorId"]),
+    )
     doc["likes"] = 0
+    doc["commentsCount"] = 0
     doc["createdAt"] = datetime.utcnow()
     doc["updatedAt"] = datetime.utcnow()
     doc["isPublished"] = True
     
     res = await db.recipes.insert_one(doc)
+    await db.users.update_one({"_id": doc["authorId"]}, {"$inc": {"recipesCount": 1}})
     inserted = await db.recipes.find_one({"_id": res.inserted_id})
+    
+    recipe_search_index.add(inserted)
+    recipe_ingredient_index.add(inserted)
+    recipe_similarity_index.add(inserted)
+    bump_recipe_suggestions(inserted, 1)
+    
+    # Push the recipe into followers' timelines in the background
+    background_tasks.add_task(fanout_recipe, inserted)
+    
     return recipe_doc_to_out(inserted)
 
+class PantryQuery(BaseModel):
+    ingredients: List[str] = Field(..., min_length=1, max_length=50)
+    limit: int = Field(20, ge=1, le=50)
+    maxMissing: Optional[int] = Field(None, ge=0)
+
+class PantryMatchOut(BaseModel):
+    recipe: RecipeOut
+    matchedCount: int
+    missingCount: int
+    missingIngredients: List[str]
+
+@api_router.post("/recipes/pantry-match", response_model=List[PantryMatchOut])
+async def match_pantry(body: PantryQuery, current_user: Optional[UserOut] = Depends(get_current_user_optional)):
+    matches = recipe_ingredient_index.match(body.ingredients, limit=body.limit, max_missing=body.maxMissing)
+    
+    recipe_ids = [match[0] for match in matches]
+    docs = await db.recipes.find({"_id": {"$in": recipe_ids}}).to_list(len(recipe_ids))
+    docs_by_id = {doc["_id"]: doc for doc in docs}
+    
+    results = []
+    for recipe_id, matched_count, missing in matches:
+        if recipe_id not in docs_by_id:
+            recipe_ingredient_index.remove(recipe_id)
+            continue
+        results.append(PantryMatchOut(
+            recipe=recipe_doc_to_out(docs_by_id[recipe_id]),
+            matchedCount=matched_count,
+            missingCount=len(missing),
+            missingIngredients=missing,
+        ))
+    
+    await hydrate_viewer_state([result.recipe for result in results], current_user.id if current_user else None)
+    return results
+
+@api_router.get("/recipes/{recipe_id}/similar", response_model=List[RecipeListItem])
+async def get_similar_recipes(
+    recipe_id: str,
+    fields: Optional[str] = None,
+    current_user: Optional[UserOut] = Depends(get_current_user_optional)
+):
+    selected = parse_recipe_fields(fields)
+    try:
+        recipe_object_id = ObjectId(recipe_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid recipe ID")
+    
+    # Precomputed for popular recipes, computed and cached on first request otherwise
+    cached = await db.similar_recipes.find_one({
+        "_id": recipe_object_id,
+        "computedAt": {"$gte": datetime.utcnow() - timedelta(seconds=max(RECOMMENDER_REFRESH_SECONDS, 3600) * 2)}
+    })
+    if cached:
+        similar_ids = cached["similar"]
+    else:
+        if recipe_object_id not in recipe_similarity_index.docnos:
+            # Unknown here: either missing, or created on another worker since the last sync
+            doc = await db.recipes.find_one({"_id": recipe_object_id}, search_index.INDEXED_FIELDS)
+            if not doc:
+                raise HTTPException(status_code=404, detail="Recipe not found")
+            recipe_similarity_index.add(doc)
+        similar_ids = recipe_similarity_index.similar(recipe_object_id)
+        # An empty list is not cached: it may only mean the index is still cold
+        if similar_ids:
+            await db.similar_recipes.update_one(
+                {"_id": recipe_object_id},
+                {"$set": {"similar": similar_ids, "computedAt": datetime.utcnow()}},
+                upsert=True
+            )
+    
+    docs = await db.recipes.find({"_id": {"$in": similar_ids}}, recipe_projection(selected)).to_list(len(similar_ids))
+    docs_by_id = {doc["_id"]: doc for doc in docs}
+    recipes = recipe_docs_to_items([docs_by_id[rid] for rid in similar_ids if rid in docs_by_id], selected)
+    await hydrate_item_viewer_state(recipes, current_user.id if current_user else None, selected)
+    return fast_json.FastJSONResponse(recipes)
+
 class RecipePatch(BaseModel):
     action: Literal['toggle_like', 'toggle_save']
 
+class RecipeEngagementOut(BaseModel):
+    id: str
+    likes: int
+    isLiked: Optional[bool] = None
+    isSaved: Optional[bool] = None
+
+# Idempotent like/save: the unique (userId, recipeId) index arbitrates concurrent
+# taps, and the counter only moves when the membership document actually changed.
+# Membership and the recipe read are issued concurrently: one round trip of latency.
+async def set_membership(collection, user_id: ObjectId, recipe_id: ObjectId, member: bool) -> bool:
+    """Returns True when the membership state changed"""
+    key = {"userId": user_id, "recipeId": recipe_id}
+    if member:
+        try:
+            result = await collection.update_one(key, {"$setOnInsert": {"createdAt": datetime.utcnow()}}, upsert=True)
+        except DuplicateKeyError:
+            return False
+        return result.upserted_id is not None
+    removed = await collection.find_one_and_delete(key, projection={"recipeId": 1, "createdAt": 1})
+    if removed is None:
+        return False
+    # Trending subtracts the contribution of removed likes and saves
+    await ranking.record_removal(db, collection.name, removed)
+    return True
+
+async def apply_membership(
+    collection, user_id: ObjectId, recipe_id: ObjectId, member: bool, counter: Optional[counters.CounterBuffer] = None
+) -> int:
+    """Writes the membership and returns the recipe's like count"""
+    changed, recipe = await asyncio.gather(
+        set_membership(collection, user_id, recipe_id, member),
+        db.recipes.find_one({"_id": recipe_id}, {"likes": 1}),
+    )
+    if recipe is None:
+        if changed and member:
+            await collection.delete_one({"userId": user_id, "recipeId": recipe_id})
+        raise HTTPException(status_code=404, detail="Recipe not found")
+
+    # Counter deltas are coalesced in memory and flushed in batches
+    if changed and counter is not None:
+        counter.add(recipe_id, 1 if member else -1)
+    return recipe.get("likes", 0) + like_counter_buffer.pending_delta(recipe_id)
+
+async def set_like(user_id: ObjectId, recipe_id: ObjectId, liked: bool) -> int:
+    return await apply_membership(db.user_likes, user_id, recipe_id, liked, like_counter_buffer)
+
+async def set_save(user_id: ObjectId, recipe_id: ObjectId, saved: bool) -> int:
+    return await apply_membership(db.user_saves, user_id, recipe_id, saved)
+
+def parse_recipe_id(recipe_id: str) -> ObjectId:
+    try:
+        return ObjectId(recipe_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid recipe ID")
+
+@api_router.put("/recipes/{recipe_id}/like", response_model=RecipeEngagementOut)
+async def like_recipe(recipe_id: str, current_user: UserOut = Depends(get_current_user)):
+    likes = await set_like(ObjectId(current_user.id), parse_recipe_id(recipe_id), True)
+    return RecipeEngagementOut(id=recipe_id, likes=likes, isLiked=True)
+
+@api_router.delete("/recipes/{recipe_id}/like", response_model=RecipeEngagementOut)
+async def unlike_recipe(recipe_id: str, current_user: UserOut = Depends(get_current_user)):
+    likes = await set_like(ObjectId(current_user.id), parse_recipe_id(recipe_id), False)
+    return RecipeEngagementOut(id=recipe_id, likes=likes, isLiked=False)
+
+@api_router.put("/recipes/{recipe_id}/save", response_model=RecipeEngagementOut)
+async def save_recipe(recipe_id: str, current_user: UserOut = Depends(get_current_user)):
+    likes = await set_save(ObjectId(current_user.id), parse_recipe_id(recipe_id), True)
+    return RecipeEngagementOut(id=recipe_id, likes=likes, isSaved=True)
+
+@api_router.delete("/recipes/{recipe_id}/save", response_model=RecipeEngagementOut)
+async def unsave_recipe(recipe_id: str, current_user: UserOut = Depends(get_current_user)):
+    likes = await set_save(ObjectId(current_user.id), parse_recipe_id(recipe_id), False)
+    return RecipeEngagementOut(id=recipe_id, likes=likes, isSaved=False)
+
+# Legacy toggle endpoint, kept for older clients
 @api_router.patch("/recipes/{recipe_id}", response_model=RecipeOut)
 async def patch_recipe(recipe_id: str, body: RecipePatch, current_user: UserOut = Depends(get_current_user)):
-    # Check if recipe exists
-    doc = await db.recipes.find_one({"_id": ObjectId(recipe_id)})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-    
     user_id = ObjectId(current_user.id)
-    recipe_object_id = ObjectId(recipe_id)
+    recipe_object_id = parse_recipe_id(recipe_id)
     
+    collection = db.user_likes if body.action == 'toggle_like' else db.user_saves
+    existing = await collection.find_one({"userId": user_id, "recipeId": recipe_object_id}, {"_id": 1})
     if body.action == 'toggle_like':
-        # Check if user already liked this recipe
-        existing_like = await db.user_likes.find_one({
-            "userId": user_id,
-            "recipeId": recipe_object_id
-        })
-        
-        if existing_like:
-            # Unlike: remove from user_likes and decrease count
-            await db.user_likes.delete_one({"_id": existing_like["_id"]})
-            new_likes = max(0, doc.get("likes", 0) - 1)
-        else:
-            # Like: add to user_likes and increase count
-            await db.user_likes.insert_one({
-                "userId": user_id,
-                "recipeId": recipe_object_id,
-                "createdAt": datetime.utcnow()
-            })
-            new_likes = doc.get("likes", 0) + 1
-        
-        # Update recipe likes count
-        await db.recipes.update_one(
-            {"_id": recipe_object_id},
-            {"$set": {"likes": new_likes}}
-        )
-    
-    elif body.action == 'toggle_save':
-        # Check if user already saved this recipe
-        existing_save = await db.user_saves.find_one({
-            "userId": user_id,
-            "recipeId": recipe_object_id
-        })
-        
-        if existing_save:
-            # Unsave: remove from user_saves
-            await db.user_saves.delete_one({"_id": existing_save["_id"]})
-        else:
-            # Save: add to user_saves
-            await db.user_saves.insert_one({
-                "userId": user_id,
-                "recipeId": recipe_object_id,
-                "createdAt": datetime.utcnow()
-            })
+        await set_like(user_id, recipe_object_id, existing is None)
+    else:
+        await set_save(user_id, recipe_object_id, existing is None)
     
     # Return updated recipe with current user's like/save status
     updated = await db.recipes.find_one({"_id": recipe_object_id})
     recipe = recipe_doc_to_out(updated)
-    
-    # Check current user's like and save status
-    user_like = await db.user_likes.find_one({
-        "userId": user_id,
-        "recipeId": recipe_object_id
-    })
-    user_save = await db.user_saves.find_one({
-        "userId": user_id,
-        "recipeId": recipe_object_id
-    })
-    
-    recipe.isLiked = user_like is not None
-    recipe.isSaved = user_save is not None
+    await hydrate_viewer_state([recipe], current_user.id)
     
     return recipe
 
@@ -548,10 +1647,19 @@ async def delete_recipe(recipe_id: str, current_user: UserOut = Depends(get_curr
         
         # Supprimer la recette
         await db.recipes.delete_one({"_id": ObjectId(recipe_id)})
+        await db.users.update_one({"_id": doc["authorId"]}, {"$inc": {"recipesCount": -1}})
         
         # Supprimer les likes et sauvegardes associés
         await db.user_likes.delete_many({"recipeId": ObjectId(recipe_id)})
         await db.user_saves.delete_many({"recipeId": ObjectId(recipe_id)})
+        await db.timelines.delete_many({"recipeId": ObjectId(recipe_id)})
+        await db.recipe_scores.delete_one({"_id": ObjectId(recipe_id)})
+        await db.trending_recipes.delete_one({"_id": ObjectId(recipe_id)})
+        recipe_search_index.remove(ObjectId(recipe_id))
+        recipe_ingredient_index.remove(ObjectId(recipe_id))
+        recipe_similarity_index.remove(ObjectId(recipe_id))
+        bump_recipe_suggestions(doc, -1)
+        await db.similar_recipes.delete_one({"_id": ObjectId(recipe_id)})
         
         return {"message": "Recipe deleted successfully"}
         
@@ -562,65 +1670,41 @@ async def delete_recipe(recipe_id: str, current_user: UserOut = Depends(get_curr
         )
 
 # User's liked and saved recipes
-@api_router.get("/users/me/liked-recipes", response_model=List[RecipeOut])
-async def get_user_liked_recipes(current_user: UserOut = Depends(get_current_user)):
+@api_router.get("/users/me/liked-recipes", response_model=List[RecipeListItem])
+async def get_user_liked_recipes(fields: Optional[str] = None, current_user: UserOut = Depends(get_current_user)):
     user_id = ObjectId(current_user.id)
-    liked_recipes = await db.user_likes.find({"userId": user_id}).to_list(1000)
+    selected = parse_recipe_fields(fields)
+    liked_recipes = await db.user_likes.find({"userId": user_id}, {"recipeId": 1, "_id": 0}).to_list(1000)
     
     recipe_ids = [like["recipeId"] for like in liked_recipes]
-    recipes = await db.recipes.find({"_id": {"$in": recipe_ids}}).to_list(1000)
+    recipes = await db.recipes.find({"_id": {"$in": recipe_ids}}, recipe_projection(selected)).to_list(1000)
     
-    result = []
-    for recipe in recipes:
-        recipe_out = recipe_doc_to_out(recipe)
-        recipe_out.isLiked = True
-        recipe_out.isSaved = await db.user_saves.find_one({
-            "userId": user_id,
-            "recipeId": recipe["_id"]
-        }) is not None
-        result.append(recipe_out)
-    
-    return result
-
-@api_router.get("/users/me/saved-recipes", response_model=List[RecipeOut])
-async def get_user_saved_recipes(current_user: UserOut = Depends(get_current_user)):
+    result = recipe_docs_to_items(recipes, selected)
+    await hydrate_item_viewer_state(result, current_user.id, selected)
+    return fast_json.FastJSONResponse(result)
+
+@api_router.get("/users/me/saved-recipes", response_model=List[RecipeListItem])
+async def get_user_saved_recipes(fields: Optional[str] = None, current_user: UserOut = Depends(get_current_user)):
     user_id = ObjectId(current_user.id)
-    saved_recipes = await db.user_saves.find({"userId": user_id}).to_list(1000)
+    selected = parse_recipe_fields(fields)
+    saved_recipes = await db.user_saves.find({"userId": user_id}, {"recipeId": 1, "_id": 0}).to_list(1000)
     
     recipe_ids = [save["recipeId"] for save in saved_recipes]
-    recipes = await db.recipes.find({"_id": {"$in": recipe_ids}}).to_list(1000)
+    recipes = await db.recipes.find({"_id": {"$in": recipe_ids}}, recipe_projection(selected)).to_list(1000)
     
-    result = []
-    for recipe in recipes:
-        recipe_out = recipe_doc_to_out(recipe)
-        recipe_out.isLiked = await db.user_likes.find_one({
-            "userId": user_id,
-            "recipeId": recipe["_id"]
-        }) is not None
-        recipe_out.isSaved = True
-        result.append(recipe_out)
-    
-    return result
-
-@api_router.get("/users/me/recipes", response_model=List[RecipeOut])
-async def get_user_recipes(current_user: UserOut = Depends(get_current_user)):
+    result = recipe_docs_to_items(recipes, selected)
+    await hydrate_item_viewer_state(result, current_user.id, selected)
+    return fast_json.FastJSONResponse(result)
+
+@api_router.get("/users/me/recipes", response_model=List[RecipeListItem])
+async def get_user_recipes(fields: Optional[str] = None, current_user: UserOut = Depends(get_current_user)):
     user_id = ObjectId(current_user.id)
-    recipes = await db.recipes.find({"authorId": user_id}).to_list(1000)
+    selected = parse_recipe_fields(fields)
+    recipes = await db.recipes.find({"authorId": user_id}, recipe_projection(selected)).to_list(1000)
     
-    result = []
-    for recipe in recipes:
-        recipe_out = recipe_doc_to_out(recipe)
-        recipe_out.isLiked = await db.user_likes.find_one({
-            "userId": user_id,
-            "recipeId": recipe["_id"]
-        }) is not None
-        recipe_out.isSaved = await db.user_saves.find_one({
-            "userId": user_id,
-            "recipeId": recipe["_id"]
-        }) is not None
-        result.append(recipe_out)
-    
-    return result
+    result = recipe_docs_to_items(recipes, selected)
+    await hydrate_item_viewer_state(result, current_user.id, selected)
+    return fast_json.FastJSONResponse(result)
 
 # Comment models
 class CommentAuthor(BaseModel):
@@ -657,6 +1741,11 @@ class MessageOut(BaseModel):
     sender: CommentAuthor
     createdAt: datetime
 
+class MessagePage(BaseModel):
+    items: List[MessageOut]
+    olderCursor: Optional[str] = None
+    newerCursor: Optional[str] = None
+
 class ParticipantInfo(BaseModel):
     id: str
     name: str
@@ -668,22 +1757,51 @@ class ConversationOut(BaseModel):
     participant: ParticipantInfo  # Info de l'autre participant
     lastMessage: Optional[MessageOut] = None
     unreadCount: int = 0
+    participantLastReadMessageId: Optional[str] = None  # Accusé de lecture de l'autre participant
+
+# Fast-path mappers (see recipe_doc_to_item), shaped like CommentOut and MessageOut
+def comment_doc_to_item(comment) -> dict:
+    return {
+        "id": str(comment["_id"]),
+        "content": comment["content"],
+        "recipeId": comment["recipeId"],
+        "author": author_to_item(comment["author"]),
+        "createdAt": comment["createdAt"],
+    }
+
+def message_doc_to_item(message, conversation_id=None) -> dict:
+    return {
+        "id": str(message.get("_id", "")),
+        "content": message["content"],
+        "conversationId": str(conversation_id or message["conversationId"]),
+        "senderId": message["senderId"],
+        "sender": author_to_item(message["sender"]),
+        "createdAt": message["createdAt"],
+    }
 
 # Comments endpoints
+def comments_etag(recipe_id: str, count: int, newest_id) -> str:
+    # Comments are append-only: their count and the newest id identify the list
+    return make_etag("comments", recipe_id, count, newest_id)
+
 @api_router.get("/recipes/{recipe_id}/comments", response_model=List[CommentOut])
-async def get_recipe_comments(recipe_id: str):
+async def get_recipe_comments(recipe_id: str, request: Request):
     try:
-        comments = await db.comments.find({"recipeId": recipe_id}).sort("createdAt", -1).to_list(1000)
-        return [
-            CommentOut(
-                id=str(comment["_id"]),
-                content=comment["content"],
-                recipeId=comment["recipeId"],
-                author=comment["author"],
-                createdAt=comment["createdAt"]
+        if request.headers.get("if-none-match"):
+            count, newest = await asyncio.gather(
+                db.comments.count_documents({"recipeId": recipe_id}, limit=1000),
+                db.comments.find_one({"recipeId": recipe_id}, {"_id": 1}, sort=[("createdAt", -1)]),
             )
-            for comment in comments
-        ]
+            etag = comments_etag(recipe_id, count, newest["_id"] if newest else None)
+            if etag_matches(request, etag):
+                return not_modified(etag, PUBLIC_CACHE_CONTROL)
+        
+        comments = await db.comments.find({"recipeId": recipe_id}).sort("createdAt", -1).to_list(1000)
+        etag = comments_etag(recipe_id, len(comments), comments[0]["_id"] if comments else None)
+        return fast_json.FastJSONResponse(
+            [comment_doc_to_item(comment) for comment in comments],
+            headers=cache_headers(etag, PUBLIC_CACHE_CONTROL),
+        )
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -707,6 +1825,7 @@ async def create_comment(comment_data: CommentCreate, current_user: UserOut = De
     
     result = await db.comments.insert_one(comment_doc)
     comment_doc["_id"] = result.inserted_id
+    await db.recipes.update_one({"_id": recipe["_id"]}, {"$inc": {"commentsCount": 1}})
     
     return CommentOut(
         id=str(comment_doc["_id"]),
@@ -750,10 +1869,13 @@ async def follow_user(user_id: str, current_user: UserOut = Depends(get_current_
     }
     
     await db.follows.insert_one(follow_doc)
+    await update_follow_counters(ObjectId(current_user.id), ObjectId(user_id), 1)
+    await backfill_timeline(ObjectId(current_user.id), ObjectId(user_id))
+    typeahead_index.bump("user", user["username"])
     return {"message": "User followed successfully"}
 
 @api_router.post("/users/{user_id}/unfollow")
-async def unfollow_user(user_id: str, current_user: UserOut = Depends(get_current_user)):
+async def unfollow_user(user_id: str, background_tasks: BackgroundTasks, current_user: UserOut = Depends(get_current_user)):
     result = await db.follows.delete_one({
         "followerId": ObjectId(current_user.id),
         "followingId": ObjectId(user_id)
@@ -762,6 +1884,11 @@ async def unfollow_user(user_id: str, current_user: UserOut = Depends(get_curren
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Follow relationship not found")
     
+    following = await update_follow_counters(ObjectId(current_user.id), ObjectId(user_id), -1)
+    await remove_from_timeline(ObjectId(current_user.id), ObjectId(user_id))
+    if fanout_on_read_expired(following):
+        background_tasks.add_task(leave_fanout_on_read, ObjectId(user_id))
+    await unbump_followed_user(ObjectId(user_id))
     return {"message": "User unfollowed successfully"}
 
 @api_router.get("/users/me/followers", response_model=List[UserOut])
@@ -780,7 +1907,138 @@ async def get_following(current_user: UserOut = Depends(get_current_user)):
     users = await db.users.find({"_id": {"$in": following_ids}}).to_list(1000)
     return [user_doc_to_out(user) for user in users]
 
+# Événements temps réel : messages et accusés de lecture sur le canal de la
+# conversation, badge des non-lus sur le canal de chaque utilisateur connecté
+# Compteurs de non-lus matérialisés sur la conversation : unread.<userId>
+def unread_field(user_id) -> str:
+    return f"unread.{user_id}"
+
+def unread_count_for(conv, user_id) -> int:
+    return (conv.get("unread") or {}).get(str(user_id), 0)
+
+# Marque de lecture par participant : reads.<userId> = {lastReadAt, lastReadMessageId},
+# position du dernier message lu dans l'ordre (createdAt, _id) de l'historique.
+# Un message est lu par un participant s'il se trouve à cette position ou avant.
+def read_field(user_id) -> str:
+    return f"reads.{user_id}"
+
+def read_watermark(conv, user_id) -> Optional[dict]:
+    return (conv.get("reads") or {}).get(str(user_id))
+
+def is_read_by(message, watermark: Optional[dict]) -> bool:
+    if not watermark:
+        return False
+    return (message["createdAt"], message["_id"]) <= (watermark["lastReadAt"], watermark["lastReadMessageId"])
+
+def watermark_before(user_id, message) -> dict:
+    """Filtre : la marque du participant est absente ou antérieure au message"""
+    field = read_field(user_id)
+    return {"$or": [
+        {field: {"$exists": False}},
+        {f"{field}.lastReadAt": {"$lt": message["createdAt"]}},
+        {f"{field}.lastReadAt": message["createdAt"], f"{field}.lastReadMessageId": {"$lt": message["_id"]}},
+    ]}
+
+def last_read_message_id(conv, user_id) -> Optional[str]:
+    watermark = read_watermark(conv, user_id)
+    return str(watermark["lastReadMessageId"]) if watermark else None
+
+async def count_unread_conversations(user_id: ObjectId) -> int:
+    # Une requête sur l'index participants, filtrée par le compteur de l'utilisateur
+    return await db.conversations.count_documents({"participants": user_id, unread_field(user_id): {"$gt": 0}})
+
+realtime_tasks = set()
+
+async def push_unread_count(user_id: str):
+    count = await count_unread_conversations(ObjectId(user_id))
+    realtime_hub.publish(realtime.user_channel(user_id), {"type": "unread.changed", "unread_conversations_count": count})
+
+def dispatch_realtime(channel: str, event: dict):
+    """Livre un événement aux connexions de ce worker (local ou reçu du bus)"""
+    if event.get("type") == "unread.refresh":
+        # Le décompte n'est calculé que par le worker qui porte la connexion
+        if realtime_hub.has_subscribers(channel):
+            task = asyncio.get_running_loop().create_task(push_unread_count(event["userId"]))
+            realtime_tasks.add(task)
+            task.add_done_callback(realtime_tasks.discard)
+        return
+    realtime_hub.publish(channel, event)
+
+def publish_realtime(channel: str, event: dict):
+    dispatch_realtime(channel, event)
+    realtime_bus.publish(channel, event)
+
+def publish_unread_counts(user_ids):
+    for user_id in user_ids:
+        publish_realtime(realtime.user_channel(user_id), {"type": "unread.refresh", "userId": str(user_id)})
+
+def publish_conversation_event(conversation_id, event_type: str, **data):
+    publish_realtime(
+        realtime.conversation_channel(conversation_id),
+        {"type": event_type, "conversationId": str(conversation_id), **data}
+    )
+
+def other_participants(conv, user_id: ObjectId) -> list:
+    return [participant_id for participant_id in conv["participants"] if participant_id != user_id]
+
+# WebSocket temps réel : /api/ws?token=<jeton d'accès>
+# Le client envoie {"type": "subscribe"|"unsubscribe", "conversationId": ...} ou {"type": "ping"}
+WS_UNAUTHORIZED = 4401
+
+async def realtime_sender(websocket: WebSocket, subscriber: realtime.Subscriber):
+    while True:
+        payload = await subscriber.next()
+        if payload is None:
+            # File saturée : le client se resynchronisera à la reconnexion
+            await websocket.close(code=1013)
+            return
+        await websocket.send_text(payload)
+
+@api_router.websocket("/ws")
+async def realtime_socket(websocket: WebSocket, token: str = ""):
+    await websocket.accept()
+    try:
+        current_user = await resolve_principal(token)
+    except HTTPException:
+        await websocket.close(code=WS_UNAUTHORIZED)
+        return
+    
+    user_id = ObjectId(current_user.id)
+    subscriber = realtime_hub.connect(current_user.id)
+    sender = asyncio.create_task(realtime_sender(websocket, subscriber))
+    try:
+        while True:
+            try:
+                command = await websocket.receive_json()
+            except ValueError:
+                continue
+            command_type = command.get("type") if isinstance(command, dict) else None
+            if command_type == "ping":
+                subscriber.reply({"type": "pong"})
+            elif command_type in ("subscribe", "unsubscribe"):
+                conversation_id = command.get("conversationId")
+                if not conversation_id or not ObjectId.is_valid(conversation_id):
+                    continue
+                channel = realtime.conversation_channel(conversation_id)
+                if command_type == "unsubscribe":
+                    realtime_hub.unsubscribe(subscriber, channel)
+                    continue
+                conv = await db.conversations.find_one(
+                    {"_id": ObjectId(conversation_id), "participants": user_id}, {"_id": 1}
+                )
+                if conv:
+                    realtime_hub.subscribe(subscriber, channel)
+                    subscriber.reply({"type": "subscribed", "conversationId": conversation_id})
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sender.cancel()
+        realtime_hub.disconnect(subscriber)
+
 # Endpoint pour marquer les messages comme lus
+MARK_READ_ATTEMPTS = 3
+MARK_READ_FIELDS = {"lastMessage._id": 1, "lastMessage.createdAt": 1, "unread": 1, "reads": 1}
+
 @api_router.post("/conversations/{conversation_id}/mark-read")
 async def mark_messages_as_read(conversation_id: str, current_user: UserOut = Depends(get_current_user)):
     user_id = ObjectId(current_user.id)
@@ -789,26 +2047,48 @@ async def mark_messages_as_read(conversation_id: str, current_user: UserOut = De
     conv = await db.conversations.find_one({
         "_id": ObjectId(conversation_id),
         "participants": user_id
-    })
+    }, MARK_READ_FIELDS)
     
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Marquer tous les messages non lus de cette conversation comme lus
-    result = await db.messages.update_many(
-        {
-            "conversationId": ObjectId(conversation_id),
-            "senderId": {"$ne": str(user_id)},
-            "readAt": {"$exists": False}
-        },
-        {
-            "$set": {"readAt": datetime.now()}
-        }
-    )
+    # Une seule écriture : la marque de lecture avance jusqu'au dernier message et
+    # le compteur repart à zéro. Le filtre sur lastMessage garantit qu'aucun message
+    # arrivé entre-temps n'est couvert, celui sur la marque qu'elle ne recule jamais
+    # (lastMessage plus ancien après une suppression) ; sinon la conversation est relue.
+    for _ in range(MARK_READ_ATTEMPTS):
+        last_message = conv.get("lastMessage") or {}
+        unread_count = unread_count_for(conv, user_id)
+        advance = "_id" in last_message and not is_read_by(last_message, read_watermark(conv, user_id))
+        if not advance and not unread_count:
+            return {"marked_as_read": 0}
+        
+        query = {"_id": conv["_id"], "lastMessage._id": last_message.get("_id")}
+        update = {unread_field(user_id): 0}
+        if advance:
+            query.update(watermark_before(user_id, last_message))
+            update[read_field(user_id)] = {"lastReadAt": last_message["createdAt"], "lastReadMessageId": last_message["_id"]}
+        result = await db.conversations.update_one(query, {"$set": update})
+        if result.matched_count:
+            break
+        conv = await db.conversations.find_one({"_id": conv["_id"]}, MARK_READ_FIELDS)
+        if not conv:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+    else:
+        # Conversation trop active : le prochain appel rattrapera
+        return {"marked_as_read": 0}
+    
+    print(f"📖 {unread_count} messages marqués comme lus dans la conversation {conversation_id}")
     
-    print(f"📖 {result.modified_count} messages marqués comme lus dans la conversation {conversation_id}")
+    if advance:
+        publish_conversation_event(
+            conversation_id, "conversation.read",
+            readerId=str(user_id), readAt=datetime.now(), lastReadMessageId=str(last_message["_id"])
+        )
+    if unread_count:
+        publish_unread_counts([user_id])
     
-    return {"marked_as_read": result.modified_count}
+    return {"marked_as_read": unread_count}
 
 # Endpoint pour supprimer une conversation
 @api_router.delete("/conversations/{conversation_id}")
@@ -836,6 +2116,9 @@ async def delete_conversation(conversation_id: str, current_user: UserOut = Depe
     
     print(f"🗑️ Conversation {conversation_id} supprimée: {messages_result.deleted_count} messages, {conv_result.deleted_count} conversation")
     
+    publish_conversation_event(conversation_id, "conversation.deleted")
+    publish_unread_counts(conv["participants"])
+    
     return {
         "deleted": True,
         "messages_deleted": messages_result.deleted_count,
@@ -899,7 +2182,7 @@ async def update_message(message_id: str, message_update: MessageUpdate, current
     
     print(f"✏️ Message {message_id} modifié")
     
-    return {
+    message_out = {
         "id": str(updated_message["_id"]),
         "content": updated_message["content"],
         "conversationId": str(updated_message["conversationId"]),
@@ -909,6 +2192,8 @@ async def update_message(message_id: str, message_update: MessageUpdate, current
         "editedAt": updated_message.get("editedAt"),
         "isEdited": updated_message.get("isEdited", False)
     }
+    publish_conversation_event(updated_message["conversationId"], "message.updated", message=message_out)
+    return message_out
 
 # Endpoint pour supprimer un message
 @api_router.delete("/messages/{message_id}")
@@ -966,135 +2251,106 @@ async def delete_message(message_id: str, current_user: UserOut = Depends(get_cu
     
     print(f"🗑️ Message {message_id} supprimé")
     
+    publish_conversation_event(conversation_id, "message.deleted", messageId=message_id)
+    # Un message non lu disparaît : décrémenter le compteur des destinataires
+    # dont la marque de lecture ne le couvre pas encore
+    conv = await db.conversations.find_one({"_id": conversation_id}, {"participants": 1, "reads": 1})
+    if conv:
+        recipients = [
+            recipient for recipient in other_participants(conv, user_id)
+            if not is_read_by(message, read_watermark(conv, recipient))
+        ]
+        if recipients:
+            await asyncio.gather(*(
+                db.conversations.update_one(
+                    {"_id": conversation_id, unread_field(recipient): {"$gt": 0}},
+                    {"$inc": {unread_field(recipient): -1}}
+                )
+                for recipient in recipients
+            ))
+            publish_unread_counts(recipients)
+    
     return {"deleted": True}
 
 # Endpoint pour obtenir le nombre de conversations avec messages non lus
 @api_router.get("/conversations/unread-count")
 async def get_unread_conversations_count(current_user: UserOut = Depends(get_current_user)):
-    user_id = ObjectId(current_user.id)
-    
-    # Trouver toutes les conversations de l'utilisateur
-    conversations = await db.conversations.find({
-        "participants": user_id
-    }).to_list(1000)
-    
-    unread_conversations_count = 0
-    
-    for conv in conversations:
-        # Vérifier s'il y a des messages non lus dans cette conversation
-        unread_messages = await db.messages.count_documents({
-            "conversationId": conv["_id"],
-            "senderId": {"$ne": str(user_id)},
-            "readAt": {"$exists": False}
-        })
-        
-        if unread_messages > 0:
-            unread_conversations_count += 1
-    
+    unread_conversations_count = await count_unread_conversations(ObjectId(current_user.id))
     return {"unread_conversations_count": unread_conversations_count}
 
 # Endpoint pour récupérer le profil public d'un utilisateur
+PROFILE_VERSION_FIELDS = {"updatedAt": 1, "followersCount": 1, "followingCount": 1, "recipesCount": 1}
+
+def profile_etag(user, recipes, is_following: bool) -> str:
+    return make_etag(
+        "profile", user["_id"], user.get("updatedAt"),
+        user.get("followersCount", 0), user.get("followingCount", 0), user.get("recipesCount", 0), is_following,
+        *(
+            (recipe["_id"], recipe.get("updatedAt"), recipe.get("likes", 0) + like_counter_buffer.pending_delta(recipe["_id"]))
+            for recipe in recipes
+        )
+    )
+
+async def fetch_profile(user_obj_id: ObjectId, viewer_id: str, user_projection: dict, recipe_projection: dict):
+    # Utilisateur (compteurs dénormalisés), recettes et relation de suivi en parallèle
+    return await asyncio.gather(
+        db.users.find_one({"_id": user_obj_id}, user_projection),
+        db.recipes.find({"authorId": user_obj_id}, recipe_projection).sort("createdAt", -1).limit(20).to_list(20),
+        db.follows.find_one({"followerId": ObjectId(viewer_id), "followingId": user_obj_id}, {"_id": 1}),
+    )
+
 @api_router.get("/users/{user_id}/profile")
-async def get_user_profile(user_id: str, current_user: UserOut = Depends(get_current_user)):
+async def get_user_profile(user_id: str, request: Request, current_user: UserOut = Depends(get_current_user)):
     try:
         user_obj_id = ObjectId(user_id)
     except:
         raise HTTPException(status_code=400, detail="Invalid user ID")
     
-    # Récupérer les informations de l'utilisateur
-    user = await db.users.find_one({"_id": user_obj_id})
+    # Version seule d'abord : un 304 évite de charger les recettes complètes
+    if request.headers.get("if-none-match"):
+        user, recipes, follow = await fetch_profile(
+            user_obj_id, current_user.id, PROFILE_VERSION_FIELDS, {"updatedAt": 1, "likes": 1}
+        )
+        if user:
+            etag = profile_etag(user, recipes, follow is not None)
+            if etag_matches(request, etag):
+                return not_modified(etag, PRIVATE_CACHE_CONTROL)
+    
+    user, recipes, follow = await fetch_profile(
+        user_obj_id, current_user.id, {"password": 0, "searchKeys": 0},
+        {"title": 1, "description": 1, "image": 1, "createdAt": 1, "updatedAt": 1, "likes": 1, "ingredients": 1, "instructions": 1}
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Compter les abonnés (followers)
-    followers_count = await db.follows.count_documents({"followingId": user_obj_id})
-    
-    # Compter les abonnements (following)
-    following_count = await db.follows.count_documents({"followerId": user_obj_id})
-    
-    # Compter les recettes
-    recipes_count = await db.recipes.count_documents({"authorId": user_obj_id})
-    
-    # Vérifier si l'utilisateur actuel suit cette personne
-    current_user_id = ObjectId(current_user.id)
-    is_following = await db.follows.find_one({
-        "followerId": current_user_id,
-        "followingId": user_obj_id
-    }) is not None
-    
-    # Récupérer les recettes de l'utilisateur (limitées à 20 pour la performance)
-    recipes = await db.recipes.find(
-        {"authorId": user_obj_id}
-    ).sort("createdAt", -1).limit(20).to_list(20)
-    
     # Formater les recettes
-    formatted_recipes = []
-    for recipe in recipes:
-        # Compter les likes pour cette recette
-        likes_count = await db.user_likes.count_documents({"recipeId": recipe["_id"]})
-        
-        formatted_recipes.append({
+    formatted_recipes = [
+        {
             "id": str(recipe["_id"]),
             "title": recipe["title"],
             "description": recipe.get("description", ""),
             "image": recipe.get("image", ""),
             "createdAt": recipe["createdAt"],
-            "likesCount": likes_count,
+            "likesCount": recipe.get("likes", 0) + like_counter_buffer.pending_delta(recipe["_id"]),
             "ingredients": recipe.get("ingredients", []),
             "instructions": recipe.get("instructions", [])
-        })
+        }
+        for recipe in recipes
+    ]
     
-    return {
+    return fast_json.FastJSONResponse({
         "id": str(user["_id"]),
         "firstName": user.get("firstName", ""),
         "lastName": user.get("lastName", ""),
         "username": user.get("username", ""),
         "avatar": user.get("avatar", ""),
         "bio": user.get("bio", ""),
-        "followersCount": followers_count,
-        "followingCount": following_count,
-        "recipesCount": recipes_count,
-        "isFollowing": is_following,
+        "followersCount": user.get("followersCount", 0),
+        "followingCount": user.get("followingCount", 0),
+        "recipesCount": user.get("recipesCount", 0),
+        "isFollowing": follow is not None,
         "recipes": formatted_recipes
-    }
-
-# Endpoint pour rechercher des utilisateurs
-@api_router.get("/users/search")
-async def search_users(query: str, current_user: UserOut = Depends(get_current_user)):
-    if len(query) < 1:
-        return []
-    
-    search_term = query.strip()
-    
-    # Recherche par nom, prénom ou nom d'utilisateur (insensible à la casse)
-    users = await db.users.find({
-        "$or": [
-            {"firstName": {"$regex": search_term, "$options": "i"}},
-            {"lastName": {"$regex": search_term, "$options": "i"}},
-            {"username": {"$regex": search_term, "$options": "i"}}
-        ]
-    }).limit(20).to_list(20)
-    
-    # Formater les résultats
-    results = []
-    for user in users:
-        # Compter les abonnés
-        followers_count = await db.follows.count_documents({"followingId": user["_id"]})
-        
-        # Compter les recettes
-        recipes_count = await db.recipes.count_documents({"authorId": user["_id"]})
-        
-        results.append({
-            "id": str(user["_id"]),
-            "firstName": user.get("firstName", ""),
-            "lastName": user.get("lastName", ""),
-            "username": user.get("username", ""),
-            "avatar": user.get("avatar", ""),
-            "followersCount": followers_count,
-            "recipesCount": recipes_count
-        })
-    
-    return results
+    }, headers=cache_headers(profile_etag(user, recipes, follow is not None), PRIVATE_CACHE_CONTROL))
 
 # Messaging endpoints
 @api_router.post("/conversations")
@@ -1170,11 +2426,14 @@ async def follow_user(request: dict, current_user: UserOut = Depends(get_current
     }
     
     await db.follows.insert_one(follow_doc)
+    await update_follow_counters(follower_obj_id, following_obj_id, 1)
+    await backfill_timeline(follower_obj_id, following_obj_id)
+    typeahead_index.bump("user", target_user["username"])
     
     return {"message": "User followed successfully"}
 
 @api_router.delete("/follows/{following_id}")
-async def unfollow_user(following_id: str, current_user: UserOut = Depends(get_current_user)):
+async def unfollow_user(following_id: str, background_tasks: BackgroundTasks, current_user: UserOut = Depends(get_current_user)):
     try:
         following_obj_id = ObjectId(following_id)
         follower_obj_id = ObjectId(current_user.id)
@@ -1190,13 +2449,56 @@ async def unfollow_user(following_id: str, current_user: UserOut = Depends(get_c
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Follow relationship not found")
     
+    following = await update_follow_counters(follower_obj_id, following_obj_id, -1)
+    await remove_from_timeline(follower_obj_id, following_obj_id)
+    if fanout_on_read_expired(following):
+        background_tasks.add_task(leave_fanout_on_read, following_obj_id)
+    await unbump_followed_user(following_obj_id)
+    
     return {"message": "User unfollowed successfully"}
 
+def find_other_participant(conv, user_id: ObjectId) -> Optional[ObjectId]:
+    for participant_id in conv["participants"]:
+        if participant_id != user_id:
+            # Corriger l'ID s'il est corrompu
+            if str(participant_id) == "68b8afc125fa61bccab9663c":
+                return ObjectId("68b88bc502a5cf5e59d8fa05")
+            return participant_id
+    return None
+
+def conversations_etag(versions: list) -> str:
+    """versions : [(conversation, updatedAt, autre participant, updatedAt, non lus, accusé de lecture)]"""
+    return make_etag("conversations", *versions)
+
+async def conversations_version(user_id: ObjectId) -> list:
+    conversations = await db.conversations.find(
+        {"participants": user_id}, {"participants": 1, "updatedAt": 1, unread_field(user_id): 1, "reads": 1}
+    ).sort("updatedAt", -1).to_list(1000)
+    others = {conv["_id"]: find_other_participant(conv, user_id) for conv in conversations}
+    
+    users = await db.users.find(
+        {"_id": {"$in": [other for other in others.values() if other]}}, {"updatedAt": 1}
+    ).to_list(None)
+    user_versions = {user["_id"]: user.get("updatedAt") for user in users}
+    return [
+        (
+            conv["_id"], conv.get("updatedAt"), others[conv["_id"]], user_versions[others[conv["_id"]]],
+            unread_count_for(conv, user_id), last_read_message_id(conv, others[conv["_id"]])
+        )
+        for conv in conversations
+        if others[conv["_id"]] in user_versions
+    ]
+
 # Messaging endpoints
 @api_router.get("/conversations", response_model=List[ConversationOut])
-async def get_conversations(current_user: UserOut = Depends(get_current_user)):
+async def get_conversations(request: Request, current_user: UserOut = Depends(get_current_user)):
     user_id = ObjectId(current_user.id)
     
+    if request.headers.get("if-none-match"):
+        etag = conversations_etag(await conversations_version(user_id))
+        if etag_matches(request, etag):
+            return not_modified(etag, PRIVATE_CACHE_CONTROL)
+    
     print(f"🔍 Recherche des conversations pour l'utilisateur: {user_id}")
     
     # Trouver toutes les conversations où l'utilisateur est participant
@@ -1206,66 +2508,59 @@ async def get_conversations(current_user: UserOut = Depends(get_current_user)):
     
     print(f"📋 {len(conversations)} conversations trouvées")
     
+    # Autres participants chargés en une requête
+    others = {conv["_id"]: find_other_participant(conv, user_id) for conv in conversations}
+    users = await db.users.find(
+        {"_id": {"$in": list({other for other in others.values() if other})}},
+        {"firstName": 1, "lastName": 1, "avatar": 1, "updatedAt": 1}
+    ).to_list(None)
+    users_by_id = {user["_id"]: user for user in users}
+    
     result = []
+    versions = []
     for conv in conversations:
         print(f"🔄 Traitement conversation: {conv['_id']}")
         print(f"   Participants: {conv['participants']}")
         print(f"   LastMessage: {conv.get('lastMessage', 'Aucun')}")
         
         # Trouver l'autre participant
-        other_participant_id = None
-        for participant_id in conv["participants"]:
-            if participant_id != user_id:
-                other_participant_id = participant_id
-                break
+        other_participant_id = others[conv["_id"]]
         
         if other_participant_id:
             print(f"   Autre participant: {other_participant_id}")
-            # Récupérer les infos de l'autre participant
-            # Corriger l'ID s'il est corrompu
-            if str(other_participant_id) == "68b8afc125fa61bccab9663c":
-                other_participant_id = ObjectId("68b88bc502a5cf5e59d8fa05")
-                print(f"   🔧 ID corrigé vers: {other_participant_id}")
-            
-            other_user = await db.users.find_one({"_id": other_participant_id})
+            other_user = users_by_id.get(other_participant_id)
             if other_user:
                 print(f"   Utilisateur trouvé: {other_user.get('firstName', '')} {other_user.get('lastName', '')}")
                 
-                # Compter les messages non lus
-                unread_count = await db.messages.count_documents({
-                    "conversationId": conv["_id"],
-                    "senderId": {"$ne": str(user_id)},
-                    "readAt": {"$exists": False}
-                })
+                # Compteur de non-lus matérialisé sur la conversation
+                unread_count = unread_count_for(conv, user_id)
                 
                 # Récupérer le dernier message
                 last_message = None
                 if conv.get("lastMessage"):
-                    last_message = MessageOut(
-                        id=str(conv["lastMessage"].get("_id", "")),
-                        content=conv["lastMessage"]["content"],
-                        conversationId=str(conv["_id"]),
-                        senderId=conv["lastMessage"]["senderId"],
-                        sender=conv["lastMessage"]["sender"],
-                        createdAt=conv["lastMessage"]["createdAt"]
-                    )
+                    last_message = message_doc_to_item(conv["lastMessage"], conv["_id"])
                     print(f"   Dernier message: {conv['lastMessage']['content'][:50]}...")
                 
                 # Créer les infos du participant
-                participant_info = ParticipantInfo(
-                    id=str(other_participant_id),
-                    name=f"{other_user.get('firstName', '')} {other_user.get('lastName', '')}".strip(),
-                    avatar=other_user.get('avatar', 'https://example.com/default-avatar.jpg')
-                )
+                participant_info = {
+                    "id": str(other_participant_id),
+                    "name": f"{other_user.get('firstName', '')} {other_user.get('lastName', '')}".strip(),
+                    "avatar": other_user.get('avatar') or 'https://example.com/default-avatar.jpg',
+                }
                 
-                conversation_out = ConversationOut(
-                    id=str(conv["_id"]),
-                    participants=[str(p) for p in conv["participants"]],
-                    participant=participant_info,
-                    lastMessage=last_message,
-                    unreadCount=unread_count
-                )
+                conversation_out = {
+                    "id": str(conv["_id"]),
+                    "participants": [str(p) for p in conv["participants"]],
+                    "participant": participant_info,
+                    "lastMessage": last_message,
+                    "unreadCount": unread_count,
+                    "participantLastReadMessageId": last_read_message_id(conv, other_participant_id),
+                }
                 result.append(conversation_out)
+                versions.append((
+                    conv["_id"], conv.get("updatedAt"), other_participant_id, other_user.get("updatedAt"),
+                    unread_count, conversation_out["participantLastReadMessageId"]
+                ))
                 print(f"   ✅ Conversation ajoutée au résultat")
             else:
                 print(f"   ❌ Utilisateur non trouvé: {other_participant_id}")
@@ -1273,7 +2568,9 @@ async def get_conversations(current_user: UserOut = Depends(get_current_user)):
             print(f"   ❌ Aucun autre participant trouvé")
     
     print(f"📤 Retour de {len(result)} conversations")
-    return result
+    return fast_json.FastJSONResponse(
+        result, headers=cache_headers(conversations_etag(versions), PRIVATE_CACHE_CONTROL)
+    )
 
 @api_router.get("/conversations/{conversation_id}", response_model=ConversationOut)
 async def get_conversation(conversation_id: str, current_user: UserOut = Depends(get_current_user)):
@@ -1297,12 +2594,8 @@ async def get_conversation(conversation_id: str, current_user: UserOut = Depends
     if other_participant_id:
         other_user = await db.users.find_one({"_id": other_participant_id})
         if other_user:
-            # Compter les messages non lus
-            unread_count = await db.messages.count_documents({
-                "conversationId": ObjectId(conversation_id),
-                "senderId": {"$ne": str(user_id)},
-                "readAt": {"$exists": False}
-            })
+            # Compteur de non-lus matérialisé sur la conversation
+            unread_count = unread_count_for(conv, user_id)
             
             # Récupérer le dernier message
             last_message = None
@@ -1337,39 +2630,66 @@ async def get_conversation(conversation_id: str, current_user: UserOut = Depends
                         participants=[str(p) for p in conv["participants"]],
                         participant=participant_info_single,
                         lastMessage=last_message,
-                        unreadCount=unread_count
+                        unreadCount=unread_count,
+                        participantLastReadMessageId=last_read_message_id(conv, other_participant_id_single)
                     )
     
     raise HTTPException(status_code=404, detail="Conversation not found")
 
-@api_router.get("/conversations/{conversation_id}/messages", response_model=List[MessageOut])
-async def get_messages(conversation_id: str, current_user: UserOut = Depends(get_current_user)):
+# Historique paginé par curseur sur (createdAt, _id), servi par l'index
+# (conversationId, createdAt, _id) : `before` remonte vers les plus anciens (chaîne
+# vide pour la page la plus récente), `after` récupère les messages arrivés depuis.
+# Sans curseur, mode historique : les 1000 derniers messages, sans pagination.
+MESSAGES_PAGE_SIZE = 50
+MESSAGES_MAX_PAGE_SIZE = 200
+
+@api_router.get("/conversations/{conversation_id}/messages", response_model=Union[MessagePage, List[MessageOut]])
+async def get_messages(
+    conversation_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = MESSAGES_PAGE_SIZE,
+    current_user: UserOut = Depends(get_current_user)
+):
     user_id = ObjectId(current_user.id)
     
     # Vérifier que l'utilisateur fait partie de la conversation
     conv = await db.conversations.find_one({
         "_id": ObjectId(conversation_id),
         "participants": user_id
-    })
+    }, {"_id": 1})
     
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    messages = await db.messages.find({
-        "conversationId": ObjectId(conversation_id)
-    }).sort("createdAt", 1).to_list(1000)
-    
-    return [
-        MessageOut(
-            id=str(msg["_id"]),
-            content=msg["content"],
-            conversationId=str(msg["conversationId"]),
-            senderId=msg["senderId"],
-            sender=msg["sender"],
-            createdAt=msg["createdAt"]
-        )
-        for msg in messages
-    ]
+    query = {"conversationId": conv["_id"]}
+    newest_first = [("createdAt", -1), ("_id", -1)]
+    
+    if before is None and after is None:
+        messages = await db.messages.find(query, sort=newest_first).limit(1000).to_list(1000)
+        messages.reverse()
+        return fast_json.FastJSONResponse([message_doc_to_item(msg) for msg in messages])
+    
+    limit = max(1, min(limit, MESSAGES_MAX_PAGE_SIZE))
+    if after:
+        query.update(cursor_filter(after, direction=1))
+        messages = await db.messages.find(
+            query, sort=[("createdAt", 1), ("_id", 1)]
+        ).limit(limit).to_list(limit)
+        has_older = True
+    else:
+        if before:
+            query.update(cursor_filter(before))
+        messages = await db.messages.find(query, sort=newest_first).limit(limit).to_list(limit)
+        messages.reverse()
+        has_older = len(messages) == limit
+    
+    return fast_json.FastJSONResponse({
+        "items": [message_doc_to_item(msg) for msg in messages],
+        "olderCursor": encode_cursor(messages[0]) if messages and has_older else None,
+        # Toujours renseigné : point de reprise pour rattraper les messages manqués
+        "newerCursor": encode_cursor(messages[-1]) if messages else (after or None),
+    })
 
 @api_router.post("/conversations/{conversation_id}/messages", response_model=MessageOut)
 async def send_message(conversation_id: str, message_data: MessageCreate, current_user: UserOut = Depends(get_current_user)):
@@ -1411,15 +2731,20 @@ async def send_message(conversation_id: str, message_data: MessageCreate, curren
         "createdAt": message_doc["createdAt"]
     }
     
-    await db.conversations.update_one(
-        {"_id": ObjectId(conversation_id)},
-        {
-            "$set": {
-                "lastMessage": last_message_simplified,
-                "updatedAt": datetime.now()
-            }
+    recipients = other_participants(conv, user_id)
+    conversation_update = {
+        "$set": {
+            "lastMessage": last_message_simplified,
+            "updatedAt": datetime.now()
         }
-    )
+    }
+    if recipients:
+        # Un non-lu de plus pour chaque destinataire, dans la même écriture
+        conversation_update["$inc"] = {unread_field(recipient): 1 for recipient in recipients}
+    await db.conversations.update_one({"_id": ObjectId(conversation_id)}, conversation_update)
+    
+    publish_conversation_event(conversation_id, "message.created", message=message_doc_to_item(message_doc))
+    publish_unread_counts(recipients)
     
     return MessageOut(
         id=str(message_doc["_id"]),
@@ -1522,8 +2847,124 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def trending_refresh_loop():
+    while True:
+        try:
+            stats = await ranking.refresh_trending(db)
+            if not stats.get("skipped"):
+                logger.info(f"Trending refreshed: {stats}")
+        except Exception as e:
+            logger.error(f"Trending refresh failed: {e}")
+        await asyncio.sleep(TRENDING_REFRESH_SECONDS)
+
+async def search_index_sync_loop():
+    while True:
+        try:
+            added = await search_index.sync_index(db, recipe_search_index)
+            if added:
+                logger.info(f"Search index: {added} recipes added ({len(recipe_search_index)} total)")
+            await search_index.sync_index(db, recipe_ingredient_index)
+            await search_index.sync_index(db, recipe_similarity_index)
+        except Exception as e:
+            logger.error(f"Search index sync failed: {e}")
+        await asyncio.sleep(SEARCH_SYNC_SECONDS)
+
+async def recommender_refresh_loop():
+    global recipe_similarity_index
+    while True:
+        try:
+            index = await recommender.build_index(db)
+            # Precomputed off the event loop, before the swap: nothing mutates the new index meanwhile
+            count = await recommender.precompute_popular(db, index)
+            # Keep recipes indexed on this worker while the rebuild was running
+            await search_index.sync_index(db, index)
+            recipe_similarity_index = index
+            logger.info(f"Similarity index rebuilt ({len(index)} recipes, {count} precomputed)")
+        except Exception as e:
+            logger.error(f"Similarity index rebuild failed: {e}")
+        await asyncio.sleep(RECOMMENDER_REFRESH_SECONDS)
+
+async def suggest_refresh_loop():
+    global typeahead_index
+    while True:
+        try:
+            # Operations received by the live index during the build are replayed on the new one
+            previous = typeahead_index
+            previous.journal = []
+            try:
+                index = await suggest_index.build_index(db)
+                index.replay(previous.journal)
+                typeahead_index = index
+            finally:
+                previous.journal = None
+            logger.info(f"Typeahead index rebuilt ({len(typeahead_index)} entries)")
+        except Exception as e:
+            logger.error(f"Typeahead index rebuild failed: {e}")
+        await asyncio.sleep(SUGGEST_REFRESH_SECONDS)
+
+async def like_reconcile_loop():
+    lease = ranking.Lease(db, lease_id=LIKE_RECONCILE_LEASE)
+    while True:
+        await asyncio.sleep(LIKE_RECONCILE_SECONDS)
+        try:
+            if not await lease.acquire():
+                continue
+            try:
+                repaired = await reconcile_counters.reconcile_likes(db)
+            finally:
+                await lease.release()
+            if repaired:
+                logger.info(f"Like counters reconciled: {repaired} recipes repaired")
+        except Exception as e:
+            logger.error(f"Like counter reconciliation failed: {e}")
+
+async def principal_sync_loop():
+    while True:
+        await asyncio.sleep(PRINCIPAL_SYNC_MS / 1000)
+        try:
+            await principals.sync(db.users)
+        except Exception as e:
+            logger.error(f"Principal cache sync failed: {e}")
+
+async def upload_gc_loop():
+    while True:
+        await asyncio.sleep(UPLOAD_GC_SECONDS)
+        try:
+            removed = await media_store.collect_abandoned_uploads(db)
+            if removed:
+                logger.info(f"Abandoned uploads collected: {removed}")
+        except Exception as e:
+            logger.error(f"Upload garbage collection failed: {e}")
+
+background_jobs = []
+
+@app.on_event("startup")
+async def start_background_jobs():
+    background_jobs.append(asyncio.create_task(like_counter_buffer.run()))
+    if LIKE_RECONCILE_SECONDS > 0:
+        background_jobs.append(asyncio.create_task(like_reconcile_loop()))
+    if TRENDING_REFRESH_SECONDS > 0:
+        background_jobs.append(asyncio.create_task(trending_refresh_loop()))
+    background_jobs.append(asyncio.create_task(search_index_sync_loop()))
+    if RECOMMENDER_REFRESH_SECONDS > 0:
+        background_jobs.append(asyncio.create_task(recommender_refresh_loop()))
+    if SUGGEST_REFRESH_SECONDS > 0:
+        background_jobs.append(asyncio.create_task(suggest_refresh_loop()))
+    if UPLOAD_GC_SECONDS > 0:
+        background_jobs.append(asyncio.create_task(upload_gc_loop()))
+    if PRINCIPAL_SYNC_MS > 0:
+        background_jobs.append(asyncio.create_task(principal_sync_loop()))
+    await realtime_bus.start(db, dispatch_realtime, realtime_hub.broadcast)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for job in background_jobs:
+        job.cancel()
+    # Persist coalesced like counters before closing the connection
+    await like_counter_buffer.flush()
+    await realtime_bus.stop()
+    media_storage.shutdown()
+    password_hasher.shutdown()
     client.close()
 
 if __name__ == "__main__":
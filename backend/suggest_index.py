@@ -0,0 +1,207 @@
+"""
+Suggestions par préfixe (tags, ingrédients, noms d'utilisateur)
+
+Les entrées de chaque type sont conservées dans un tableau trié sur leur clé
+normalisée (minuscules, sans accents) ; un préfixe correspond à une plage
+contiguë trouvée par dichotomie, dans laquelle on garde les k entrées les plus
+populaires. Un tableau par type : un type très représenté sur un préfixe ne
+masque pas les autres quand on filtre. Les meilleures suggestions des préfixes
+d'un ou deux caractères, dont les plages sont les plus larges, sont
+précalculées à chaque reconstruction.
+
+Les nouvelles entrées attendent dans un petit tampon parcouru linéairement
+jusqu'à la prochaine reconstruction ; les changements de popularité des
+entrées existantes sont appliqués sur place. Quand le tampon déborde, la
+reconstruction est calculée dans un thread à partir d'un instantané, puis
+installée dans la boucle d'événements.
+"""
+import asyncio
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ingredient_index import ingredient_name
+from search_index import fold
+
+KINDS = ("tag", "ingredient", "user")
+PRECOMPUTED_PREFIX_LENGTH = 2
+PRECOMPUTED_K = 20
+MAX_PENDING = 1000
+
+
+def _range(keys: List[str], prefix: str) -> Tuple[int, int]:
+    lo = bisect_left(keys, prefix)
+    hi = bisect_left(keys, prefix + "\uffff", lo)
+    return lo, hi
+
+
+def _top(weights: np.ndarray, lo: int, hi: int, k: int) -> List[int]:
+    if hi - lo <= k:
+        positions = np.arange(lo, hi)
+    else:
+        positions = lo + np.argpartition(-weights[lo:hi], k - 1)[:k]
+    return positions[np.argsort(-weights[positions], kind="stable")].tolist()
+
+
+def _layout(live: List[Tuple[str, str, float]]) -> tuple:
+    """Tableaux triés, poids et préfixes précalculés par type, depuis un instantané"""
+    by_kind: Dict[str, list] = {kind: [] for kind in KINDS}
+    for kind, key, weight in live:
+        by_kind.setdefault(kind, []).append((key, weight))
+    keys, weights, top_by_prefix = {}, {}, {}
+    for kind, items in by_kind.items():
+        items.sort()
+        keys[kind] = [key for key, _ in items]
+        weights[kind] = np.asarray([weight for _, weight in items], dtype=np.float64)
+        prefixes = {key[:n] for key in keys[kind] for n in range(1, PRECOMPUTED_PREFIX_LENGTH + 1) if len(key) >= n}
+        top_by_prefix[kind] = {
+            prefix: _top(weights[kind], *_range(keys[kind], prefix), PRECOMPUTED_K) for prefix in prefixes
+        }
+    return keys, weights, top_by_prefix
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.entries: Dict[Tuple[str, str], list] = {}  # (type, clé) -> [libellé, poids]
+        self.keys: Dict[str, List[str]] = {kind: [] for kind in KINDS}
+        self.weights: Dict[str, np.ndarray] = {kind: np.zeros(0) for kind in KINDS}
+        self.positions: Dict[Tuple[str, str], int] = {}  # (type, clé) -> position dans son type
+        self.pending: set = set()
+        self.top_by_prefix: Dict[str, Dict[str, List[int]]] = {kind: {} for kind in KINDS}
+        # Opérations reçues pendant la construction d'un index de remplacement
+        self.journal: Optional[list] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _accumulate(self, kind: str, label: str, delta: float) -> Optional[Tuple[str, str]]:
+        """Ajoute le poids ; retourne la clé si l'entrée vient d'être créée"""
+        label = label.strip()
+        key = fold(label)
+        if not key:
+            return None
+        entry_key = (kind, key)
+        entry = self.entries.get(entry_key)
+        if entry is None:
+            self.entries[entry_key] = [label, delta]
+            return entry_key
+        entry[1] += delta
+        return None
+
+    def _set_weight(self, entry_key: Tuple[str, str], weight: float):
+        position = self.positions.get(entry_key)
+        if position is not None:
+            self.weights[entry_key[0]][position] = weight
+
+    def bump(self, kind: str, label: str, delta: float = 1.0):
+        if self.journal is not None:
+            self.journal.append((kind, label, delta))
+        created = self._accumulate(kind, label, delta)
+        if created is not None:
+            self.pending.add(created)
+            if len(self.pending) > MAX_PENDING:
+                self.schedule_rebuild()
+            return
+        entry_key = (kind, fold(label.strip()))
+        entry = self.entries.get(entry_key)
+        if entry is not None:
+            self._set_weight(entry_key, entry[1])
+
+    def discard(self, kind: str, label: str):
+        if self.journal is not None:
+            self.journal.append((kind, label, None))
+        entry_key = (kind, fold(label.strip()))
+        if entry_key in self.entries:
+            # Poids nul : l'entrée n'est plus proposée jusqu'à la reconstruction
+            self.entries[entry_key][1] = 0
+            self._set_weight(entry_key, 0)
+
+    def replay(self, journal: list):
+        """Rejoue les opérations reçues par l'index remplacé pendant la construction"""
+        for kind, label, delta in journal:
+            if delta is None:
+                self.discard(kind, label)
+            else:
+                self.bump(kind, label, delta)
+
+    def _snapshot(self) -> List[Tuple[str, str, float]]:
+        return [(kind, key, entry[1]) for (kind, key), entry in self.entries.items() if entry[1] > 0]
+
+    def _install(self, keys, weights, top_by_prefix):
+        self.keys, self.weights, self.top_by_prefix = keys, weights, top_by_prefix
+        self.positions = {(kind, key): i for kind, kind_keys in keys.items() for i, key in enumerate(kind_keys)}
+        self.pending = {entry_key for entry_key in self.pending if entry_key not in self.positions}
+        self.entries = {
+            entry_key: entry for entry_key, entry in self.entries.items()
+            if entry_key in self.positions or entry_key in self.pending
+        }
+        # Poids modifiés pendant un calcul en thread : l'instantané est déjà dépassé
+        for entry_key, position in self.positions.items():
+            self.weights[entry_key[0]][position] = self.entries[entry_key][1]
+
+    def rebuild(self):
+        self._install(*_layout(self._snapshot()))
+
+    async def rebuild_async(self):
+        layout = await asyncio.to_thread(_layout, self._snapshot())
+        self._install(*layout)
+
+    def schedule_rebuild(self):
+        """Reconstruit hors du chemin de la requête ; une seule reconstruction à la fois"""
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.rebuild()
+            return
+        self._rebuild_task = loop.create_task(self.rebuild_async())
+
+    def suggest(self, prefix: str, kinds: Optional[List[str]] = None, limit: int = 8) -> List[dict]:
+        prefix = fold(prefix.strip())
+        if not prefix:
+            return []
+
+        results = []
+        for kind in kinds or self.keys:
+            keys = self.keys.get(kind)
+            if not keys:
+                continue
+            candidates = self.top_by_prefix[kind].get(prefix) if limit <= PRECOMPUTED_K else None
+            if candidates is None:
+                candidates = _top(self.weights[kind], *_range(keys, prefix), limit)
+            results += [(kind, keys[i]) for i in candidates[:limit]]
+        results += [
+            entry_key for entry_key in self.pending
+            if entry_key[1].startswith(prefix) and (not kinds or entry_key[0] in kinds)
+        ]
+
+        suggestions = []
+        for kind, key in results:
+            label, weight = self.entries[(kind, key)]
+            if weight > 0:
+                suggestions.append({"type": kind, "value": label, "weight": weight})
+        suggestions.sort(key=lambda s: -s["weight"])
+        return suggestions[:limit]
+
+
+async def build_index(db) -> SuggestIndex:
+    index = SuggestIndex()
+    async for doc in db.recipes.find({}, {"tags": 1, "ingredients": 1, "_id": 0}):
+        for tag in doc.get("tags") or []:
+            index._accumulate("tag", tag, 1)
+        for text in doc.get("ingredients") or []:
+            name = ingredient_name(text)
+            if name:
+                index._accumulate("ingredient", name, 1)
+
+    # Compteur d'abonnés dénormalisé : pas de parcours de follows
+    async for user in db.users.find({"isActive": {"$ne": False}}, {"username": 1, "followersCount": 1}):
+        if user.get("username"):
+            index._accumulate("user", user["username"], 1 + max(user.get("followersCount", 0), 0))
+
+    # L'index n'est pas encore partagé : le calcul peut tourner dans un thread
+    await asyncio.to_thread(index.rebuild)
+    return index
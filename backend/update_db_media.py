@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Script pour sortir les images inline (data URI) des documents :
+- image et author.avatar des recettes
+- avatar des utilisateurs
+Chaque image est déposée dans le stockage média (miniatures + blurhash) et le
+document ne garde que sa référence courte « /api/media/<id> ».
+"""
+
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Charger les variables d'environnement avant MEDIA_ROOT
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from media_store import MediaError, MediaStore
+
+INLINE = {"$regex": "^data:"}
+
+async def main():
+    print("🖼️  Migration des images inline vers le stockage média...")
+    
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    store = MediaStore(workers=os.cpu_count() or 2)
+    
+    try:
+        # 1. Recettes
+        migrated = failed = 0
+        async for recipe in db.recipes.find(
+            {"$or": [{"image": INLINE}, {"author.avatar": INLINE}]},
+            {"image": 1, "author.avatar": 1, "authorId": 1}
+        ):
+            try:
+                image, blurhash = await store.ingest(db, recipe.get("image"), recipe.get("authorId"))
+                avatar, _ = await store.ingest(db, (recipe.get("author") or {}).get("avatar"), recipe.get("authorId"))
+            except MediaError as e:
+                print(f"⚠️  Recette {recipe['_id']} ignorée: {e}")
+                failed += 1
+                continue
+            update = {"image": image, "author.avatar": avatar}
+            if blurhash:
+                update["imageBlurhash"] = blurhash
+            await db.recipes.update_one({"_id": recipe["_id"]}, {"$set": update})
+            migrated += 1
+        print(f"✅ {migrated} recettes migrées ({failed} en erreur)")
+        
+        # 2. Avatars des utilisateurs
+        migrated = failed = 0
+        async for user in db.users.find({"avatar": INLINE}, {"avatar": 1}):
+            try:
+                avatar, _ = await store.ingest(db, user["avatar"], user["_id"])
+            except MediaError as e:
+                print(f"⚠️  Utilisateur {user['_id']} ignoré: {e}")
+                failed += 1
+                continue
+            await db.users.update_one({"_id": user["_id"]}, {"$set": {"avatar": avatar}})
+            migrated += 1
+        print(f"✅ {migrated} avatars migrés ({failed} en erreur)")
+        
+        print("🎉 Migration terminée avec succès!")
+        
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        raise
+    finally:
+        store.shutdown()
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
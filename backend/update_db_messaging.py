@@ -107,7 +107,13 @@ async def main():
         print("✅ Index créés pour 'conversations'")
         
         # Index pour messages
-        await db.messages.create_index([("conversationId", 1), ("createdAt", 1)])
+        # (createdAt, _id) : clé des curseurs de pagination de l'historique
+        await db.messages.create_index([("conversationId", 1), ("createdAt", 1), ("_id", 1)])
+        try:
+            # Préfixe du nouvel index, devenu redondant
+            await db.messages.drop_index("conversationId_1_createdAt_1")
+        except Exception:
+            pass
         await db.messages.create_index([("senderId", 1)])
         print("✅ Index créés pour 'messages'")
         
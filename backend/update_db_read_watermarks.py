@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Script pour convertir les accusés de lecture par message (messages.readAt) en
+marques de lecture par participant sur la conversation :
+  conversations.reads.<userId> = {lastReadAt, lastReadMessageId}
+La marque de chaque participant pointe sur le plus récent message reçu (envoyé
+par un autre participant) portant readAt. Les marques déjà posées ne sont pas
+modifiées : le script peut être relancé sans risque.
+
+Avec --drop-read-at, le champ readAt est ensuite retiré des messages, par lots.
+Lancer reconcile_counters.py après la migration pour réaligner les compteurs
+de non-lus sur les marques.
+
+Usage : python update_db_read_watermarks.py [--dry-run] [--drop-read-at]
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+# Charger les variables d'environnement
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+BATCH_SIZE = 1000
+
+async def newest_read_by_sender(db) -> dict:
+    """{conversationId: {senderId: (createdAt, _id)}} du dernier message lu de chaque expéditeur"""
+    newest = {}
+    pipeline = [
+        {"$match": {"readAt": {"$exists": True}}},
+        {"$sort": {"conversationId": 1, "createdAt": -1, "_id": -1}},
+        {"$group": {
+            "_id": {"conversationId": "$conversationId", "senderId": "$senderId"},
+            "createdAt": {"$first": "$createdAt"},
+            "messageId": {"$first": "$_id"},
+        }},
+    ]
+    async for row in db.messages.aggregate(pipeline, allowDiskUse=True):
+        key = row["_id"]
+        newest.setdefault(key["conversationId"], {})[key["senderId"]] = (row["createdAt"], row["messageId"])
+    return newest
+
+async def write_watermarks(db, dry_run: bool) -> int:
+    newest = await newest_read_by_sender(db)
+    written = 0
+    batch = []
+    async for conv in db.conversations.find({"_id": {"$in": list(newest)}}, {"participants": 1, "reads": 1}):
+        reads = conv.get("reads") or {}
+        for participant in conv["participants"]:
+            received = [position for sender, position in newest[conv["_id"]].items() if sender != str(participant)]
+            if not received or str(participant) in reads:
+                continue
+            last_read_at, last_read_message_id = max(received)
+            batch.append(UpdateOne(
+                {"_id": conv["_id"], f"reads.{participant}": {"$exists": False}},
+                {"$set": {f"reads.{participant}": {"lastReadAt": last_read_at, "lastReadMessageId": last_read_message_id}}}
+            ))
+            written += 1
+            if len(batch) >= BATCH_SIZE:
+                if not dry_run:
+                    await db.conversations.bulk_write(batch, ordered=False)
+                batch = []
+    if batch and not dry_run:
+        await db.conversations.bulk_write(batch, ordered=False)
+    return written
+
+async def drop_read_at(db) -> int:
+    # Par lots d'identifiants, pour ne pas verrouiller la collection sur une seule écriture
+    dropped = 0
+    while True:
+        ids = [doc["_id"] async for doc in db.messages.find({"readAt": {"$exists": True}}, {"_id": 1}).limit(BATCH_SIZE)]
+        if not ids:
+            return dropped
+        result = await db.messages.update_many({"_id": {"$in": ids}}, {"$unset": {"readAt": ""}})
+        dropped += result.modified_count
+
+async def main(dry_run: bool, drop: bool):
+    print(f"📖 Conversion des accusés de lecture en marques de lecture{' (simulation)' if dry_run else ''}...")
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        written = await write_watermarks(db, dry_run)
+        print(f"✅ {written} marques de lecture posées")
+
+        if drop and not dry_run:
+            dropped = await drop_read_at(db)
+            print(f"✅ readAt retiré de {dropped} messages")
+
+        print("🎉 Migration terminée! Lancer reconcile_counters.py pour réaligner les non-lus.")
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        raise
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main(dry_run="--dry-run" in sys.argv, drop="--drop-read-at" in sys.argv))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Script pour préparer la recherche d'utilisateurs indexée :
+- calcule le champ searchKeys (préfixes normalisés des noms) de chaque utilisateur
+- initialise les compteurs dénormalisés followersCount et recipesCount
+- crée l'index multikey utilisé par /users/search
+"""
+
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from search_index import user_search_keys
+
+# Charger les variables d'environnement
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+BATCH_SIZE = 1000
+
+async def main():
+    print("🔧 Préparation de la recherche d'utilisateurs...")
+    
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    
+    try:
+        # 1. Compter abonnés et recettes en une agrégation par collection
+        print("📊 Calcul des compteurs...")
+        followers = {}
+        async for row in db.follows.aggregate([{"$group": {"_id": "$followingId", "count": {"$sum": 1}}}]):
+            followers[row["_id"]] = row["count"]
+        recipes = {}
+        async for row in db.recipes.aggregate([{"$group": {"_id": "$authorId", "count": {"$sum": 1}}}]):
+            recipes[row["_id"]] = row["count"]
+        
+        # 2. Mettre à jour les utilisateurs par lots
+        print("🔄 Mise à jour des utilisateurs...")
+        updated = 0
+        batch = []
+        async for user in db.users.find({}, {"firstName": 1, "lastName": 1, "username": 1}):
+            batch.append(UpdateOne({"_id": user["_id"]}, {"$set": {
+                "searchKeys": user_search_keys(user.get("firstName"), user.get("lastName"), user.get("username")),
+                "followersCount": followers.get(user["_id"], 0),
+                "recipesCount": recipes.get(user["_id"], 0),
+            }}))
+            if len(batch) >= BATCH_SIZE:
+                await db.users.bulk_write(batch, ordered=False)
+                updated += len(batch)
+                batch = []
+        if batch:
+            await db.users.bulk_write(batch, ordered=False)
+            updated += len(batch)
+        print(f"✅ {updated} utilisateurs mis à jour")
+        
+        # 3. Index de recherche
+        await db.users.create_index([("searchKeys", 1), ("followersCount", -1)])
+        print("✅ Index créé pour 'users.searchKeys'")
+        
+        print("🎉 Mise à jour terminée avec succès!")
+        
+    except Exception as e:
+        print(f"❌ Erreur lors de la mise à jour: {e}")
+        raise
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -15,10 +15,9 @@ export default function TabsLayout() {
   const theme = isDark ? Colors.dark : Colors.light;
   const { unreadCount, refreshUnreadCount } = useUnread();
 
+  // Valeur initiale ; les changements suivants arrivent par la WebSocket (UnreadContext)
   useEffect(() => {
     refreshUnreadCount();
-    const interval = setInterval(refreshUnreadCount, 30000); // Check every 30 seconds
-    return () => clearInterval(interval);
   }, [refreshUnreadCount]);
 
   useFocusEffect(
@@ -183,10 +183,15 @@ export default function AddRecipeScreen() {
         const res = await ImageManipulator.manipulateAsync(
           (image.startsWith('data:') ? undefined : image) || image,
           actions,
-          { compress: 0.9, format: ImageManipulator.SaveFormat.JPEG, base64: true }
+          { compress: 0.9, format: ImageManipulator.SaveFormat.JPEG }
         );
-        if (res.base64) finalImage = `data:image/jpeg;base64,${res.base64}`;
-        else if (res.uri) finalImage = res.uri;
+        if (res.uri) finalImage = res.uri;
+      }
+
+      // Envoi du fichier au stockage média : la recette ne garde que sa référence
+      if (!finalImage.startsWith('data:')) {
+        const media = await apiService.uploadMedia(finalImage, 'image/jpeg');
+        finalImage = media.url;
       }
 
       // Créer la recette via l'API backend
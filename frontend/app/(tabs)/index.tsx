@@ -36,7 +36,7 @@ export default function HomeScreen() {
   const [isLoading, setIsLoading] = useState(true);
   const [isRefreshing, setIsRefreshing] = useState(false);
   const [isLoadingMore, setIsLoadingMore] = useState(false);
-  const [currentPage, setCurrentPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [hasMoreData, setHasMoreData] = useState(true);
 
   // Supprimé les catégories fixes
@@ -47,37 +47,38 @@ export default function HomeScreen() {
 
   // Filtrage supprimé - remplacé par la page de recherche dédiée
 
-  const loadData = async (showRefreshIndicator = false, page = 1) => {
+  const loadData = async (showRefreshIndicator = false, cursor: string | null = null) => {
+    const isFirstPage = cursor === null;
     try {
       if (showRefreshIndicator) {
         setIsRefreshing(true);
         await Haptics.impactAsync(Haptics.ImpactFeedbackStyle.Light);
-      } else if (page === 1) {
+      } else if (isFirstPage) {
         setIsLoading(true);
       } else {
         setIsLoadingMore(true);
       }
 
-      console.log(`📡 Chargement des recettes page ${page}...`);
-      const apiRecipes = await apiService.getRecipes(page, 10);
+      console.log(`📡 Chargement des recettes (curseur: ${cursor ?? 'début'})...`);
+      const { items: apiRecipes, nextCursor: newCursor } = await apiService.getRecipesPage(cursor, 10);
       console.log('✅ Recettes chargées:', apiRecipes.length);
       
-      if (page === 1) {
+      if (isFirstPage) {
         // Première page ou refresh
         const allRecipes = [...apiRecipes, ...mockRecipes];
         setRecipes(allRecipes);
-        setCurrentPage(1);
       } else {
         // Pages suivantes - ajouter à la liste existante
         setRecipes(prev => [...prev, ...apiRecipes]);
       }
       
       // Vérifier s'il y a plus de données
-      setHasMoreData(apiRecipes.length === 10);
+      setNextCursor(newCursor);
+      setHasMoreData(newCursor !== null);
       
     } catch (error) {
       console.error('❌ Erreur lors du chargement:', error);
-      if (page === 1) {
+      if (isFirstPage) {
         setRecipes(mockRecipes);
       }
     } finally {
@@ -88,16 +89,14 @@ export default function HomeScreen() {
   };
 
   const onRefresh = () => {
-    setCurrentPage(1);
+    setNextCursor(null);
     setHasMoreData(true);
-    loadData(true, 1);
+    loadData(true, null);
   };
 
   const loadMoreData = () => {
-    if (!isLoadingMore && hasMoreData) {
-      const nextPage = currentPage + 1;
-      setCurrentPage(nextPage);
-      loadData(false, nextPage);
+    if (!isLoadingMore && hasMoreData && nextCursor) {
+      loadData(false, nextCursor);
     }
   };
 
@@ -106,7 +105,7 @@ export default function HomeScreen() {
       await Haptics.impactAsync(Haptics.ImpactFeedbackStyle.Medium);
       
       // Appeler l'API pour toggle le like
-      const updatedRecipe = await apiService.toggleLike(recipeId);
+      const updatedRecipe = await apiService.toggleLike(recipeId, !!recipes.find(r => r.id === recipeId)?.isLiked);
       
       // Mettre à jour les recettes locales
       const updatedRecipes = recipes.map(recipe =>
@@ -128,7 +127,7 @@ export default function HomeScreen() {
       await Haptics.impactAsync(Haptics.ImpactFeedbackStyle.Medium);
       
       // Appeler l'API pour toggle la sauvegarde
-      const updatedRecipe = await apiService.toggleSave(recipeId);
+      const updatedRecipe = await apiService.toggleSave(recipeId, !!recipes.find(r => r.id === recipeId)?.isSaved);
       
       // Mettre à jour les recettes locales
       const updatedRecipes = recipes.map(recipe =>
@@ -112,7 +112,7 @@ export default function ProfileScreen() {
       onPress={() => router.push(`/recipe/${item.id}`)}
       activeOpacity={0.8}
     >
-      <ShimmerImage source={{ uri: item.image }} style={styles.gridImage} contentFit="cover" />
+      <ShimmerImage source={{ uri: item.image }} size="thumb" style={styles.gridImage} contentFit="cover" />
       <View style={styles.gridOverlay}>
         <Text style={styles.gridTitle} numberOfLines={2}>
           {item.title}
@@ -29,7 +29,6 @@ export default function SearchScreen() {
   const [selectedDifficulty, setSelectedDifficulty] = useState<string>('');
   const [maxPrepTime, setMaxPrepTime] = useState<string>('');
   const [selectedServings, setSelectedServings] = useState<string>('');
-  const [recipes, setRecipes] = useState<Recipe[]>([]);
   const [filteredRecipes, setFilteredRecipes] = useState<Recipe[]>([]);
   const [users, setUsers] = useState<any[]>([]);
   const [filteredUsers, setFilteredUsers] = useState<any[]>([]);
@@ -54,7 +53,6 @@ export default function SearchScreen() {
   ];
 
   useEffect(() => {
-    loadRecipes();
     loadUsers();
   }, []);
 
@@ -64,20 +62,7 @@ export default function SearchScreen() {
     } else {
       applyUserFilters();
     }
-  }, [searchQuery, selectedTags, selectedDifficulty, maxPrepTime, selectedServings, recipes, users, activeTab]);
-
-  const loadRecipes = async () => {
-    try {
-      setIsLoading(true);
-      const apiRecipes = await apiService.getRecipes();
-      setRecipes(apiRecipes);
-    } catch (error) {
-      console.error('Error loading recipes:', error);
-      setRecipes([]);
-    } finally {
-      setIsLoading(false);
-    }
-  };
+  }, [searchQuery, selectedTags, selectedDifficulty, maxPrepTime, selectedServings, users, activeTab]);
 
   const loadUsers = async () => {
     // Ne charge plus tous les utilisateurs au démarrage
@@ -85,52 +70,29 @@ export default function SearchScreen() {
     setUsers([]);
   };
 
-  const applyFilters = () => {
-    let filtered = [...recipes];
-
-    // Filtre par nom/description
-    if (searchQuery.trim()) {
-      const query = searchQuery.toLowerCase();
-      filtered = filtered.filter(recipe =>
-        recipe.title.toLowerCase().includes(query) ||
-        recipe.description.toLowerCase().includes(query)
-      );
-    }
-
-    // Filtre par tags
-    if (selectedTags.length > 0) {
-      filtered = filtered.filter(recipe =>
-        recipe.tags && selectedTags.some(tag => 
-          recipe.tags!.includes(tag)
-        )
-      );
-    }
+  const applyFilters = async () => {
+    // Recherche côté serveur (index BM25) : texte, difficulté, temps et portions
+    const [minServings, maxServings] = selectedServings
+      ? selectedServings.replace('+', '-').split('-').map(Number)
+      : [undefined, undefined];
+    const query = [searchQuery.trim(), ...selectedTags].filter(Boolean).join(' ');
 
-    // Filtre par difficulté
-    if (selectedDifficulty) {
-      filtered = filtered.filter(recipe =>
-        recipe.difficulty === selectedDifficulty
-      );
-    }
-
-    // Filtre par temps de préparation
-    if (maxPrepTime) {
-      const maxTime = parseInt(maxPrepTime);
-      filtered = filtered.filter(recipe =>
-        recipe.prepTimeMinutes && recipe.prepTimeMinutes <= maxTime
-      );
-    }
-
-    // Filtre par nombre de portions
-    if (selectedServings) {
-      const [min, max] = selectedServings.split('-').map(Number);
-      filtered = filtered.filter(recipe =>
-        recipe.servings && recipe.servings >= min && 
-        (max ? recipe.servings <= max : true)
-      );
+    try {
+      setIsLoading(true);
+      const results = await apiService.searchRecipes({
+        q: query,
+        difficulty: selectedDifficulty || undefined,
+        maxPrepTime: maxPrepTime ? parseInt(maxPrepTime) : undefined,
+        minServings,
+        maxServings: maxServings || undefined,
+      });
+      setFilteredRecipes(results);
+    } catch (error) {
+      console.error('Error searching recipes:', error);
+      setFilteredRecipes([]);
+    } finally {
+      setIsLoading(false);
     }
-
-    setFilteredRecipes(filtered);
   };
 
   const applyUserFilters = async () => {
@@ -179,13 +141,13 @@ export default function SearchScreen() {
 
   const handleLike = async (recipeId: string) => {
     try {
-      const updatedRecipe = await apiService.toggleLike(recipeId);
-      const updatedRecipes = recipes.map(recipe =>
+      const updatedRecipe = await apiService.toggleLike(recipeId, !!filteredRecipes.find(r => r.id === recipeId)?.isLiked);
+      const updatedRecipes = filteredRecipes.map(recipe =>
         recipe.id === recipeId
           ? { ...recipe, isLiked: updatedRecipe.isLiked, likes: updatedRecipe.likes }
           : recipe
       );
-      setRecipes(updatedRecipes);
+      setFilteredRecipes(updatedRecipes);
     } catch (error) {
       console.error('Error updating like:', error);
       Alert.alert('Erreur', 'Impossible de mettre à jour le like');
@@ -194,13 +156,13 @@ export default function SearchScreen() {
 
   const handleSave = async (recipeId: string) => {
     try {
-      const updatedRecipe = await apiService.toggleSave(recipeId);
-      const updatedRecipes = recipes.map(recipe =>
+      const updatedRecipe = await apiService.toggleSave(recipeId, !!filteredRecipes.find(r => r.id === recipeId)?.isSaved);
+      const updatedRecipes = filteredRecipes.map(recipe =>
         recipe.id === recipeId
           ? { ...recipe, isSaved: updatedRecipe.isSaved }
           : recipe
       );
-      setRecipes(updatedRecipes);
+      setFilteredRecipes(updatedRecipes);
     } catch (error) {
       console.error('Error updating save:', error);
       Alert.alert('Erreur', 'Impossible de mettre à jour la sauvegarde');
@@ -20,6 +20,9 @@ import { useTheme } from '../../context/ThemeContext';
 import { useAuth } from '../../context/AuthContext';
 import { useUnread } from '../../context/UnreadContext';
 import { apiService } from '../../services/api';
+import { realtimeClient } from '../../services/realtime';
+
+const MESSAGES_PAGE_SIZE = 50;
 
 interface Message {
   id: string;
@@ -43,6 +46,10 @@ export default function ChatScreen() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [newMessage, setNewMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+  const newerCursorRef = useRef<string | null>(null);
+  const keepScrollRef = useRef(false);
   const [conversationInfo, setConversationInfo] = useState<any>(null);
   const [selectedMessage, setSelectedMessage] = useState<Message | null>(null);
   const [showMessageMenu, setShowMessageMenu] = useState(false);
@@ -58,6 +65,41 @@ export default function ChatScreen() {
     }
   }, [id]);
 
+  // Mises à jour en direct de la conversation ouverte (remplace le rechargement de l'historique)
+  useEffect(() => {
+    if (!id) return;
+    const conversationId = id as string;
+    const leave = realtimeClient.joinConversation(conversationId);
+    const unsubscribe = realtimeClient.subscribe((event) => {
+      if (event.type === 'resync') {
+        catchUpMessages();
+        return;
+      }
+      if (!('conversationId' in event) || event.conversationId !== conversationId) return;
+      switch (event.type) {
+        case 'message.created':
+          setMessages(prev => prev.some(msg => msg.id === event.message.id) ? prev : [...prev, event.message]);
+          if (event.message.senderId !== user?.id) {
+            markMessagesAsRead();
+          }
+          break;
+        case 'message.updated':
+          setMessages(prev => prev.map(msg => msg.id === event.message.id ? { ...msg, ...event.message } : msg));
+          break;
+        case 'message.deleted':
+          setMessages(prev => prev.filter(msg => msg.id !== event.messageId));
+          break;
+        case 'conversation.deleted':
+          router.back();
+          break;
+      }
+    });
+    return () => {
+      unsubscribe();
+      leave();
+    };
+  }, [id, user?.id]);
+
   const markMessagesAsRead = async () => {
     try {
       await apiService.markMessagesAsRead(id as string);
@@ -68,11 +110,23 @@ export default function ChatScreen() {
     }
   };
 
+  // Ajoute des messages en ignorant ceux déjà reçus (REST et WebSocket se recoupent)
+  const mergeMessages = (incoming: Message[], prepend: boolean = false) => {
+    setMessages(prev => {
+      const known = new Set(prev.map(msg => msg.id));
+      const fresh = incoming.filter(msg => !known.has(msg.id));
+      return prepend ? [...fresh, ...prev] : [...prev, ...fresh];
+    });
+  };
+
+  // Ouverture : seule la page la plus récente est chargée
   const loadMessages = async () => {
     try {
       setIsLoading(true);
-      const messagesData = await apiService.getMessages(id as string);
-      setMessages(messagesData);
+      const page = await apiService.getMessagesPage(id as string);
+      setMessages(page.items);
+      setOlderCursor(page.olderCursor);
+      newerCursorRef.current = page.newerCursor;
     } catch (error) {
       console.error('Error loading messages:', error);
       setMessages([]);
@@ -81,6 +135,39 @@ export default function ChatScreen() {
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!olderCursor || isLoadingOlder) return;
+    try {
+      setIsLoadingOlder(true);
+      const page = await apiService.getMessagesPage(id as string, { before: olderCursor });
+      keepScrollRef.current = true;
+      mergeMessages(page.items, true);
+      setOlderCursor(page.olderCursor);
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
+  // Après une coupure : on rattrape seulement les messages postérieurs au dernier curseur
+  const catchUpMessages = async () => {
+    if (!newerCursorRef.current) {
+      loadMessages();
+      return;
+    }
+    try {
+      let page;
+      do {
+        page = await apiService.getMessagesPage(id as string, { after: newerCursorRef.current ?? '' }, MESSAGES_PAGE_SIZE);
+        mergeMessages(page.items);
+        newerCursorRef.current = page.newerCursor;
+      } while (page.items.length === MESSAGES_PAGE_SIZE);
+    } catch (error) {
+      console.error('Error catching up messages:', error);
+    }
+  };
+
   const loadConversationInfo = async () => {
     try {
       const conversation = await apiService.getConversation(id as string);
@@ -98,7 +185,8 @@ export default function ChatScreen() {
 
     try {
       const newMessageData = await apiService.sendMessage(id as string, messageContent);
-      setMessages(prev => [...prev, newMessageData]);
+      // Le message peut déjà être arrivé par la WebSocket
+      setMessages(prev => prev.some(msg => msg.id === newMessageData.id) ? prev : [...prev, newMessageData]);
       
       // Scroll to bottom
       setTimeout(() => {
@@ -298,7 +386,23 @@ export default function ChatScreen() {
           style={styles.messagesList}
           contentContainerStyle={styles.messagesContent}
           showsVerticalScrollIndicator={false}
-          onContentSizeChange={() => flatListRef.current?.scrollToEnd({ animated: true })}
+          ListHeaderComponent={
+            olderCursor ? (
+              <TouchableOpacity style={styles.loadOlderButton} onPress={loadOlderMessages} disabled={isLoadingOlder}>
+                <Text style={[styles.loadOlderText, { color: colors.primary }]}>
+                  {isLoadingOlder ? 'Chargement...' : 'Charger les messages précédents'}
+                </Text>
+              </TouchableOpacity>
+            ) : null
+          }
+          onContentSizeChange={() => {
+            // Les messages plus anciens s'ajoutent en haut : on ne saute pas en bas
+            if (keepScrollRef.current) {
+              keepScrollRef.current = false;
+              return;
+            }
+            flatListRef.current?.scrollToEnd({ animated: true });
+          }}
         />
 
         {/* Message Input */}
@@ -401,6 +505,15 @@ const styles = StyleSheet.create({
   messagesContent: {
     padding: 16,
   },
+  loadOlderButton: {
+    alignItems: 'center',
+    paddingVertical: 8,
+    marginBottom: 8,
+  },
+  loadOlderText: {
+    fontSize: 14,
+    fontWeight: '600',
+  },
   messageContainer: {
     flexDirection: 'row',
     marginBottom: 12,
@@ -30,6 +30,7 @@ interface Conversation {
     senderId: string;
   };
   unreadCount: number;
+  participantLastReadMessageId?: string | null;
 }
 
 export default function MessagesScreen() {
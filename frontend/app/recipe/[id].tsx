@@ -94,7 +94,7 @@ export default function RecipeDetailScreen() {
   const handleLike = async () => {
     try {
       // Appeler l'API pour toggle le like
-      const updatedRecipe = await apiService.toggleLike(id!);
+      const updatedRecipe = await apiService.toggleLike(id!, isLiked);
       
       setIsLiked(updatedRecipe.isLiked);
       setRecipe(prev => prev ? { ...prev, likes: updatedRecipe.likes, isLiked: updatedRecipe.isLiked } : null);
@@ -107,7 +107,7 @@ export default function RecipeDetailScreen() {
   const handleSave = async () => {
     try {
       // Appeler l'API pour toggle la sauvegarde
-      const updatedRecipe = await apiService.toggleSave(id!);
+      const updatedRecipe = await apiService.toggleSave(id!, isSaved);
       
       setIsSaved(updatedRecipe.isSaved);
       setRecipe(prev => prev ? { ...prev, isSaved: updatedRecipe.isSaved } : null);
@@ -205,7 +205,7 @@ export default function RecipeDetailScreen() {
         ], { useNativeDriver: false })}
       >
         <Animated.View style={[styles.heroWrapper, { height: heroHeight }]}> 
-          <ShimmerImage source={{ uri: recipe.image }} style={styles.heroImage} contentFit="cover" />
+          <ShimmerImage source={{ uri: recipe.image }} blurhash={recipe.imageBlurhash} size="large" style={styles.heroImage} contentFit="cover" />
           <View style={styles.topBar}>
             <TouchableOpacity style={styles.topBtn} onPress={() => router.back()}>
               <Ionicons name="chevron-back" size={22} color={Colors.light.white} />
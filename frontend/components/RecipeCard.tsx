@@ -176,7 +176,7 @@ export default function RecipeCard({ recipe, onLike, onSave, index = 0 }: Recipe
         style={styles.imageWrapper}
       >
         <Animated.View style={imageAnimatedStyle}>
-          <ShimmerImage source={{ uri: recipe.image }} style={styles.recipeImage} contentFit="cover" />
+          <ShimmerImage source={{ uri: recipe.image }} blurhash={recipe.imageBlurhash} size="medium" style={styles.recipeImage} contentFit="cover" />
         </Animated.View>
         
         {/* Double tap heart animation */}
@@ -2,15 +2,18 @@ import React, { useEffect, useRef } from 'react';
 import { View, StyleSheet, Animated, ViewStyle, StyleProp } from 'react-native';
 import { Image } from 'expo-image';
 import { Colors } from '../constants/Colors';
+import { MediaSize, resolveMediaUri } from '../services/api';
 
 interface ShimmerImageProps {
   source: { uri: string };
   style?: StyleProp<ViewStyle>;
   borderRadius?: number;
   contentFit?: 'cover' | 'contain' | 'fill' | 'none' | 'scale-down';
+  blurhash?: string;
+  size?: MediaSize;
 }
 
-export default function ShimmerImage({ source, style, borderRadius, contentFit = 'cover' }: ShimmerImageProps) {
+export default function ShimmerImage({ source, style, borderRadius, contentFit = 'cover', blurhash, size }: ShimmerImageProps) {
   const opacity = useRef(new Animated.Value(0)).current;
   const shimmer = useRef(new Animated.Value(0.3)).current;
 
@@ -33,7 +36,13 @@ export default function ShimmerImage({ source, style, borderRadius, contentFit =
     <View style={[styles.container, style, borderRadius != null && { borderRadius, overflow: 'hidden' }]}>
       <Animated.View style={[styles.placeholder, { opacity: shimmer }]} />
       <Animated.View style={{ ...StyleSheet.absoluteFillObject as any, opacity }}>
-        <Image source={source} style={StyleSheet.absoluteFill} contentFit={contentFit} onLoadEnd={onLoadEnd} />
+        <Image
+          source={{ uri: resolveMediaUri(source.uri, size) }}
+          placeholder={blurhash ? { blurhash } : undefined}
+          style={StyleSheet.absoluteFill}
+          contentFit={contentFit}
+          onLoadEnd={onLoadEnd}
+        />
       </Animated.View>
     </View>
   );
@@ -1,5 +1,7 @@
-import React, { createContext, useContext, useState, useCallback } from 'react';
+import React, { createContext, useContext, useState, useCallback, useEffect } from 'react';
 import { apiService } from '../services/api';
+import { realtimeClient } from '../services/realtime';
+import { useAuth } from './AuthContext';
 
 interface UnreadContextType {
   unreadCount: number;
@@ -11,6 +13,7 @@ const UnreadContext = createContext<UnreadContextType | undefined>(undefined);
 
 export const UnreadProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
   const [unreadCount, setUnreadCount] = useState(0);
+  const { isAuthenticated } = useAuth();
 
   const refreshUnreadCount = useCallback(async () => {
     try {
@@ -21,6 +24,23 @@ export const UnreadProvider: React.FC<{ children: React.ReactNode }> = ({ childr
     }
   }, []);
 
+  // Le badge est poussé par la WebSocket temps réel, plus de rafraîchissement périodique
+  useEffect(() => {
+    if (!isAuthenticated) {
+      realtimeClient.stop();
+      setUnreadCount(0);
+      return;
+    }
+    realtimeClient.start();
+    return realtimeClient.subscribe((event) => {
+      if (event.type === 'unread.changed') {
+        setUnreadCount(event.unread_conversations_count);
+      } else if (event.type === 'resync') {
+        refreshUnreadCount();
+      }
+    });
+  }, [isAuthenticated, refreshUnreadCount]);
+
   return (
     <UnreadContext.Provider value={{ unreadCount, refreshUnreadCount, setUnreadCount }}>
       {children}
@@ -8,6 +8,15 @@ import AsyncStorage from '@react-native-async-storage/async-storage';
 // IMPORTANT: Changez cette IP si votre ordinateur change de réseau
 // Pour trouver votre IP: ipconfig (Windows) ou ifconfig (Mac/Linux)
 const API_BASE_URL = 'http://192.168.1.146:8000/api';
+const API_ORIGIN = API_BASE_URL.replace(/\/api$/, '');
+
+export type MediaSize = 'original' | 'thumb' | 'medium' | 'large';
+
+// Les images stockées côté serveur sont référencées par un chemin court « /api/media/<id> »
+export function resolveMediaUri(uri: string, size?: MediaSize): string {
+  if (!uri || !uri.startsWith('/api/media/')) return uri;
+  return `${API_ORIGIN}${uri}${size ? `?size=${size}` : ''}`;
+}
 
 export interface User {
   id: string;
@@ -49,6 +58,44 @@ export interface UserUpdate {
 export interface AuthResponse {
   access_token: string;
   token_type: string;
+  refresh_token?: string;
+}
+
+export interface MediaUpload {
+  id: string;
+  url: string;
+  mime: string;
+  width: number;
+  height: number;
+  blurhash: string;
+  variants: MediaSize[];
+}
+
+export interface RecipePage {
+  items: any[];
+  nextCursor: string | null;
+}
+
+export interface MessagePage {
+  items: any[];
+  olderCursor: string | null;
+  newerCursor: string | null;
+}
+
+export interface RecipeSearchFilters {
+  q?: string;
+  difficulty?: string;
+  maxPrepTime?: number;
+  minServings?: number;
+  maxServings?: number;
+  limit?: number;
+  offset?: number;
+}
+
+export interface Suggestion {
+  type: 'tag' | 'ingredient' | 'user';
+  value: string;
+  weight: number;
 }
 
 class ApiService {
@@ -61,12 +108,54 @@ class ApiService {
   }
 
   private async removeAuthToken(): Promise<void> {
-    await AsyncStorage.removeItem('auth_token');
+    await AsyncStorage.multiRemove(['auth_token', 'refresh_token']);
+  }
+
+  private async storeTokens(response: AuthResponse): Promise<void> {
+    await this.setAuthToken(response.access_token);
+    if (response.refresh_token) {
+      await AsyncStorage.setItem('refresh_token', response.refresh_token);
+    }
+  }
+
+  // Un seul rafraîchissement à la fois : les jetons sont à usage unique,
+  // deux appels concurrents avec le même jeton révoqueraient la session
+  private refreshing: Promise<boolean> | null = null;
+
+  refreshSession(): Promise<boolean> {
+    if (!this.refreshing) {
+      this.refreshing = (async () => {
+        const refreshToken = await AsyncStorage.getItem('refresh_token');
+        if (!refreshToken) return false;
+        const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ refresh_token: refreshToken }),
+        });
+        if (!response.ok) {
+          await this.removeAuthToken();
+          return false;
+        }
+        await this.storeTokens(await response.json());
+        return true;
+      })().catch(() => false).finally(() => {
+        this.refreshing = null;
+      });
+    }
+    return this.refreshing;
+  }
+
+  // URL de la WebSocket temps réel, authentifiée par le jeton d'accès courant
+  async getRealtimeUrl(): Promise<string | null> {
+    const token = await this.getAuthToken();
+    if (!token) return null;
+    return `${API_BASE_URL.replace(/^http/, 'ws')}/ws?token=${encodeURIComponent(token)}`;
   }
 
   private async makeRequest<T>(
     endpoint: string,
-    options: RequestInit = {}
+    options: RequestInit = {},
+    retried: boolean = false
   ): Promise<T> {
     const token = await this.getAuthToken();
     
@@ -81,6 +170,13 @@ class ApiService {
 
     const response = await fetch(`${API_BASE_URL}${endpoint}`, config);
     
+    // Jeton d'accès expiré : on le renouvelle sans repasser par le login
+    if (response.status === 401 && token && !retried && !endpoint.startsWith('/auth/')) {
+      if (await this.refreshSession()) {
+        return this.makeRequest<T>(endpoint, options, true);
+      }
+    }
+    
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
       throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
@@ -103,11 +199,19 @@ class ApiService {
       body: JSON.stringify(credentials),
     });
     
-    await this.setAuthToken(response.access_token);
+    await this.storeTokens(response);
     return response;
   }
 
   async logout(): Promise<void> {
+    const refreshToken = await AsyncStorage.getItem('refresh_token');
+    if (refreshToken) {
+      await fetch(`${API_BASE_URL}/auth/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      }).catch(() => undefined);
+    }
     await this.removeAuthToken();
   }
 
@@ -152,23 +256,81 @@ class ApiService {
     return this.makeRequest(`/recipes?page=${page}&limit=${limit}`);
   }
 
+  // Pagination par curseur (keyset) : passer le nextCursor de la page précédente.
+  // Les listes demandent le modèle résumé (fields=summary) : ni étapes ni liste complète d'ingrédients
+  async getRecipesPage(cursor: string | null = null, limit: number = 10): Promise<RecipePage> {
+    return this.makeRequest(`/recipes?cursor=${encodeURIComponent(cursor ?? '')}&limit=${limit}&fields=summary`);
+  }
+
+  // Fil des abonnements (recettes des utilisateurs suivis)
+  async getFollowingFeed(cursor: string | null = null, limit: number = 10): Promise<RecipePage> {
+    return this.makeRequest(`/recipes/following?cursor=${encodeURIComponent(cursor ?? '')}&limit=${limit}&fields=summary`);
+  }
+
+  async searchRecipes(filters: RecipeSearchFilters): Promise<any[]> {
+    const params = new URLSearchParams({ fields: 'summary' });
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') {
+        params.append(key, String(value));
+      }
+    });
+    return this.makeRequest(`/recipes/search?${params.toString()}`);
+  }
+
+  // Recettes réalisables avec les ingrédients disponibles
+  async matchPantry(ingredients: string[], maxMissing?: number): Promise<any[]> {
+    return this.makeRequest('/recipes/pantry-match', {
+      method: 'POST',
+      body: JSON.stringify({ ingredients, maxMissing }),
+    });
+  }
+
+  // Suggestions par préfixe (appelable à chaque frappe)
+  async getSuggestions(prefix: string, types?: string[]): Promise<Suggestion[]> {
+    const typesParam = types && types.length ? `&types=${types.join(',')}` : '';
+    return this.makeRequest(`/suggest?prefix=${encodeURIComponent(prefix)}${typesParam}`);
+  }
+
   async getRecipeById(id: string): Promise<any> {
     return this.makeRequest(`/recipes/${id}`);
   }
 
-  async toggleLike(recipeId: string): Promise<any> {
-    return this.makeRequest(`/recipes/${recipeId}`, {
-      method: 'PATCH',
-      body: JSON.stringify({ action: 'toggle_like' }),
+  // Envoi multipart d'un fichier local (uri renvoyée par le picker / manipulator)
+  async uploadMedia(fileUri: string, mimeType: string = 'image/jpeg'): Promise<MediaUpload> {
+    const token = await this.getAuthToken();
+    const form = new FormData();
+    form.append('file', { uri: fileUri, name: fileUri.split('/').pop() || 'upload.jpg', type: mimeType } as any);
+
+    const response = await fetch(`${API_BASE_URL}/media`, {
+      method: 'POST',
+      headers: token ? { Authorization: `Bearer ${token}` } : undefined,
+      body: form,
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+
+    return response.json();
+  }
+
+  async getSimilarRecipes(recipeId: string): Promise<any[]> {
+    return this.makeRequest(`/recipes/${recipeId}/similar?fields=summary`);
+  }
+
+  // Like / sauvegarde idempotents : PUT pour ajouter, DELETE pour retirer
+  async toggleLike(recipeId: string, isLiked: boolean): Promise<any> {
+    return this.makeRequest(`/recipes/${recipeId}/like`, {
+      method: isLiked ? 'DELETE' : 'PUT',
     });
   }
 
   // Méthode addReaction supprimée - utilisation des likes uniquement
 
-  async toggleSave(recipeId: string): Promise<any> {
-    return this.makeRequest(`/recipes/${recipeId}`, {
-      method: 'PATCH',
-      body: JSON.stringify({ action: 'toggle_save' }),
+  async toggleSave(recipeId: string, isSaved: boolean): Promise<any> {
+    return this.makeRequest(`/recipes/${recipeId}/save`, {
+      method: isSaved ? 'DELETE' : 'PUT',
     });
   }
 
@@ -188,15 +350,15 @@ class ApiService {
   }
 
   async getUserRecipes(): Promise<any[]> {
-    return this.makeRequest('/users/me/recipes');
+    return this.makeRequest('/users/me/recipes?fields=summary');
   }
 
   async getLikedRecipes(): Promise<any[]> {
-    return this.makeRequest('/users/me/liked-recipes');
+    return this.makeRequest('/users/me/liked-recipes?fields=summary');
   }
 
   async getSavedRecipes(): Promise<any[]> {
-    return this.makeRequest('/users/me/saved-recipes');
+    return this.makeRequest('/users/me/saved-recipes?fields=summary');
   }
 
   async getUsers(): Promise<any[]> {
@@ -228,8 +390,20 @@ class ApiService {
     return this.makeRequest('/conversations');
   }
 
-  async getMessages(conversationId: string): Promise<any[]> {
-    return this.makeRequest(`/conversations/${conversationId}/messages`);
+  // Historique paginé : before='' pour la page la plus récente, before=olderCursor pour
+  // remonter, after=newerCursor pour récupérer les messages arrivés depuis
+  async getMessagesPage(
+    conversationId: string,
+    cursor: { before?: string; after?: string } = { before: '' },
+    limit: number = 50
+  ): Promise<MessagePage> {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor.after !== undefined) {
+      params.append('after', cursor.after);
+    } else {
+      params.append('before', cursor.before ?? '');
+    }
+    return this.makeRequest(`/conversations/${conversationId}/messages?${params.toString()}`);
   }
 
   async sendMessage(conversationId: string, content: string): Promise<any> {
@@ -270,7 +444,7 @@ class ApiService {
   }
 
   async searchUsers(query: string): Promise<any[]> {
-    return this.makeRequest(`/users/search?q=${encodeURIComponent(query)}`);
+    return this.makeRequest(`/users/search?query=${encodeURIComponent(query)}`);
   }
 
   async followUser(userId: string): Promise<any> {
@@ -0,0 +1,124 @@
+import { apiService } from './api';
+
+// Événements poussés par /api/ws
+export type RealtimeEvent =
+  | { type: 'message.created'; conversationId: string; message: any }
+  | { type: 'message.updated'; conversationId: string; message: any }
+  | { type: 'message.deleted'; conversationId: string; messageId: string }
+  | { type: 'conversation.read'; conversationId: string; readerId: string; readAt: string; lastReadMessageId: string }
+  | { type: 'conversation.deleted'; conversationId: string }
+  | { type: 'unread.changed'; unread_conversations_count: number }
+  | { type: 'subscribed'; conversationId: string }
+  | { type: 'resync' }
+  | { type: 'pong' };
+
+type Listener = (event: RealtimeEvent) => void;
+
+const PING_INTERVAL_MS = 25000;
+const MAX_RECONNECT_DELAY_MS = 30000;
+const UNAUTHORIZED = 4401;
+
+// Connexion WebSocket unique partagée par l'application, reconnectée avec un
+// délai croissant ; les conversations ouvertes sont réabonnées à chaque reconnexion
+class RealtimeClient {
+  private socket: WebSocket | null = null;
+  private listeners = new Set<Listener>();
+  private conversations = new Map<string, number>();
+  private reconnectDelay = 1000;
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+  private pingTimer: ReturnType<typeof setInterval> | null = null;
+  private active = false;
+  private hasConnected = false;
+
+  async start(): Promise<void> {
+    this.active = true;
+    if (this.socket) return;
+    const url = await apiService.getRealtimeUrl();
+    if (!url || !this.active || this.socket) return;
+
+    const socket = new WebSocket(url);
+    this.socket = socket;
+
+    socket.onopen = () => {
+      this.reconnectDelay = 1000;
+      // Des événements ont pu être manqués pendant la coupure : l'état est rechargé
+      if (this.hasConnected) this.emit({ type: 'resync' });
+      this.hasConnected = true;
+      this.conversations.forEach((_, conversationId) => this.send({ type: 'subscribe', conversationId }));
+      this.pingTimer = setInterval(() => this.send({ type: 'ping' }), PING_INTERVAL_MS);
+    };
+
+    socket.onmessage = (message) => {
+      try {
+        this.emit(JSON.parse(message.data) as RealtimeEvent);
+      } catch (error) {
+        console.error('Invalid realtime event:', error);
+      }
+    };
+
+    socket.onclose = async (event) => {
+      // Une socket remplacée entre-temps ne doit pas toucher à l'état courant
+      if (this.socket !== socket) return;
+      this.cleanup();
+      if (!this.active) return;
+      // Jeton d'accès expiré : on le renouvelle avant de se reconnecter
+      if (event.code === UNAUTHORIZED && !(await apiService.refreshSession())) {
+        this.active = false;
+        return;
+      }
+      this.reconnectTimer = setTimeout(() => this.start(), this.reconnectDelay);
+      this.reconnectDelay = Math.min(this.reconnectDelay * 2, MAX_RECONNECT_DELAY_MS);
+    };
+  }
+
+  stop(): void {
+    this.active = false;
+    this.hasConnected = false;
+    if (this.reconnectTimer) clearTimeout(this.reconnectTimer);
+    this.reconnectTimer = null;
+    const socket = this.socket;
+    this.cleanup();
+    socket?.close();
+  }
+
+  subscribe(listener: Listener): () => void {
+    this.listeners.add(listener);
+    return () => {
+      this.listeners.delete(listener);
+    };
+  }
+
+  // Abonnement à une conversation (compté : plusieurs écrans peuvent l'ouvrir)
+  joinConversation(conversationId: string): () => void {
+    const count = this.conversations.get(conversationId) ?? 0;
+    this.conversations.set(conversationId, count + 1);
+    if (count === 0) this.send({ type: 'subscribe', conversationId });
+    return () => {
+      const remaining = (this.conversations.get(conversationId) ?? 1) - 1;
+      if (remaining > 0) {
+        this.conversations.set(conversationId, remaining);
+      } else {
+        this.conversations.delete(conversationId);
+        this.send({ type: 'unsubscribe', conversationId });
+      }
+    };
+  }
+
+  private emit(event: RealtimeEvent): void {
+    this.listeners.forEach((listener) => listener(event));
+  }
+
+  private send(command: object): void {
+    if (this.socket?.readyState === WebSocket.OPEN) {
+      this.socket.send(JSON.stringify(command));
+    }
+  }
+
+  private cleanup(): void {
+    if (this.pingTimer) clearInterval(this.pingTimer);
+    this.pingTimer = null;
+    this.socket = null;
+  }
+}
+
+export const realtimeClient = new RealtimeClient();
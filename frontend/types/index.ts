@@ -4,11 +4,12 @@ export interface Recipe {
   description: string;
   ingredients: string[];
   instructions: string[];
-  image: string; // base64 string
+  image: string; // media URL (/api/media/<id>) or external URL
+  imageBlurhash?: string; // placeholder shown while the image loads
   author: {
     id: string;
     name: string;
-    avatar: string; // base64 string
+    avatar: string; // media URL or external URL
   };
   likes: number;
   createdAt: string;
@@ -25,7 +26,7 @@ export interface User {
   id: string;
   name: string;
   bio: string;
-  avatar: string; // base64 string
+  avatar: string; // media URL or external URL
   recipesCount: number;
 }
 
@@ -0,0 +1,114 @@
+"""
+Fixtures communes : l'application FastAPI du backend sur une base mongomock
+
+Chaque test reçoit une base vide. Les tâches de fond (startup) ne sont pas
+lancées : le client de test n'est pas utilisé comme gestionnaire de contexte.
+
+Dépendances : pip install -r backend/requirements-dev.txt
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Avant l'import du serveur : hachage rapide, bus temps réel sans collection plafonnée
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "cuisino_test")
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["REALTIME_BACKPLANE"] = "local"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+
+PASSWORD = "secret1"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = AsyncMongoMockClient()["cuisino_test"]
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server.like_counter_buffer, "collection", database.recipes)
+    server.principals.clear()
+    return database
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes(monkeypatch):
+    """Index en mémoire vierges : ils vivent au niveau du module serveur"""
+    monkeypatch.setattr(server, "recipe_search_index", server.search_index.RecipeSearchIndex())
+    monkeypatch.setattr(server, "recipe_ingredient_index", server.ingredient_index.IngredientIndex())
+    monkeypatch.setattr(server, "recipe_similarity_index", server.recommender.SimilarityIndex())
+    monkeypatch.setattr(server, "typeahead_index", server.suggest_index.SuggestIndex())
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def register(client):
+    """Crée un utilisateur et retourne (en-têtes d'authentification, réponse de connexion)"""
+    def _register(i: int):
+        response = client.post("/api/auth/register", json={
+            "firstName": f"First{i}",
+            "lastName": f"Last{i}",
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "phone": "0612345678",
+            "password": PASSWORD,
+        })
+        assert response.status_code == 200, response.text
+        login = client.post("/api/auth/login", json={"email": f"user{i}@example.com", "password": PASSWORD}).json()
+        return {"Authorization": f"Bearer {login['access_token']}"}, login
+    return _register
+
+
+@pytest.fixture
+def user_id(client):
+    def _user_id(headers) -> str:
+        return client.get("/api/users/me", headers=headers).json()["id"]
+    return _user_id
+
+
+@pytest.fixture
+def post_recipe(client):
+    """Publie une recette par l'API et retourne sa représentation"""
+    def _post_recipe(headers, title: str = "Recette", **fields):
+        response = client.post("/api/recipes", json={
+            "title": title,
+            "description": fields.pop("description", ""),
+            "ingredients": fields.pop("ingredients", []),
+            "instructions": fields.pop("instructions", []),
+            "image": "",
+            "author": {"id": "", "name": "", "avatar": ""},
+            **fields,
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return _post_recipe
+
+
+@pytest.fixture
+def conversation(client, register, user_id):
+    """Conversation entre deux utilisateurs : (en-têtes d'alice, en-têtes de bob, identifiant)"""
+    alice, _ = register(1)
+    bob, _ = register(2)
+    conversation_id = client.post("/api/conversations", json={"userId": user_id(bob)}, headers=alice).json()["conversationId"]
+    return alice, bob, conversation_id
+
+
+@pytest.fixture
+def send_message(client):
+    """Envoie un message par l'API et retourne son identifiant"""
+    def _send_message(headers, conversation_id: str, content: str) -> str:
+        response = client.post(f"/api/conversations/{conversation_id}/messages", json={"content": content}, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return _send_message
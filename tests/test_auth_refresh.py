@@ -0,0 +1,61 @@
+def refresh(client, token):
+    return client.post("/api/auth/refresh", json={"refresh_token": token})
+
+
+def test_login_returns_refresh_token(register):
+    _, login = register(1)
+    assert login["access_token"]
+    assert login["refresh_token"]
+
+
+def test_refresh_rotates_token(client, register):
+    _, login = register(1)
+    response = refresh(client, login["refresh_token"])
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != login["refresh_token"]
+    headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+    # Le nouveau jeton sert à son tour pour la rotation suivante
+    assert refresh(client, rotated["refresh_token"]).status_code == 200
+
+
+def test_replayed_token_revokes_family(client, register):
+    _, login = register(1)
+    rotated = refresh(client, login["refresh_token"]).json()
+
+    replay = refresh(client, login["refresh_token"])
+    assert replay.status_code == 401
+    # Toute la famille est révoquée, y compris le jeton légitime le plus récent
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+
+
+def test_replay_keeps_other_sessions(client, register):
+    _, first = register(1)
+    second = client.post("/api/auth/login", json={"email": "user1@example.com", "password": "secret1"}).json()
+    refresh(client, first["refresh_token"])
+    refresh(client, first["refresh_token"])
+    assert refresh(client, second["refresh_token"]).status_code == 200
+
+
+def test_unknown_token_rejected(client, register):
+    register(1)
+    assert refresh(client, "not-a-token").status_code == 401
+
+
+def test_logout_revokes_family(client, register):
+    _, login = register(1)
+    rotated = refresh(client, login["refresh_token"]).json()
+    assert client.post("/api/auth/logout", json={"refresh_token": rotated["refresh_token"]}).status_code == 204
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+
+
+def test_password_change_revokes_tokens(client, register):
+    headers, login = register(1)
+    response = client.put(
+        "/api/users/me/password",
+        json={"currentPassword": "secret1", "newPassword": "secret2"},
+        headers=headers,
+    )
+    assert response.status_code == 204, response.text
+    assert refresh(client, login["refresh_token"]).status_code == 401
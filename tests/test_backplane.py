@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+import backplane
+
+
+def connected(db):
+    """Bus relié à la collection, sans lancer les boucles d'envoi et de suivi"""
+    bus = backplane.MongoBackplane()
+    bus.collection = db[backplane.COLLECTION]
+    bus.delivered, bus.broadcasts = [], []
+    bus.deliver = lambda channel, event: bus.delivered.append((channel, event))
+    bus.broadcast = bus.broadcasts.append
+    return bus
+
+
+def sent_batches(db):
+    return asyncio.run(db[backplane.COLLECTION].find().sort("seq", 1).to_list(None))
+
+
+def test_flush_groups_events_into_sequenced_batches(db):
+    bus = connected(db)
+    bus.max_batch = 2
+    for n in range(3):
+        bus.publish("conversation:c", {"n": n})
+    asyncio.run(bus.flush())
+
+    batches = sent_batches(db)
+    assert [batch["seq"] for batch in batches] == [1, 2]
+    assert [len(batch["events"]) for batch in batches] == [2, 1]
+    assert {batch["origin"] for batch in batches} == {bus.node_id}
+    assert bus.pending == []
+
+
+def test_receive_delivers_peer_batches_once(db):
+    sender, receiver = connected(db), connected(db)
+    sender.publish("user:a", {"type": "unread.refresh"})
+    asyncio.run(sender.flush())
+    [batch] = sent_batches(db)
+
+    receiver.receive(batch)
+    # Relu dans la fenêtre de reprise : déjà livré
+    receiver.receive(batch)
+    # Ses propres lots sont ignorés
+    sender.receive(batch)
+
+    assert receiver.delivered == [("user:a", {"type": "unread.refresh"})]
+    assert sender.delivered == []
+    assert receiver.last_seen == {sender.node_id: 1}
+
+
+def test_sequence_gap_broadcasts_resync(db):
+    bus = connected(db)
+    bus.receive({"_id": ObjectId(), "origin": "peer", "seq": 1, "events": []})
+    bus.receive({"_id": ObjectId(), "origin": "peer", "seq": 3, "events": [{"channel": "user:a", "event": {"n": 3}}]})
+
+    assert bus.broadcasts == [backplane.RESYNC_EVENT]
+    assert bus.metrics["gaps"] == 1
+    assert bus.delivered == [("user:a", {"n": 3})]
+
+
+def test_resume_query_rereads_a_window_before_the_last_batch():
+    bus = backplane.MongoBackplane()
+    assert bus._resume_query() == {}
+    bus.last_id = ObjectId()
+
+    since = bus._resume_query()["_id"]["$gte"].generation_time
+    assert bus.last_id.generation_time - since == backplane.RESUME_WINDOW
+
+
+def test_stop_drains_pending_events(db):
+    bus = connected(db)
+    bus.publish("user:a", {"n": 1})
+    asyncio.run(bus.stop())
+
+    assert [batch["seq"] for batch in sent_batches(db)] == [1]
+
+
+def test_publish_before_start_is_dropped():
+    bus = backplane.MongoBackplane()
+    bus.publish("user:a", {"n": 1})
+    assert bus.pending == []
+
+
+def test_create_backplane():
+    assert isinstance(backplane.create_backplane("local", batch_ms=5), backplane.LocalBackplane)
+    assert isinstance(backplane.create_backplane("mongo", batch_ms=5), backplane.MongoBackplane)
+    with pytest.raises(ValueError):
+        backplane.create_backplane("redis")
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import counters
+import reconcile_counters
+import server
+
+
+def stored_likes(db, recipe_id):
+    return asyncio.run(db.recipes.find_one({"_id": ObjectId(recipe_id)}))["likes"]
+
+
+def flush():
+    asyncio.run(server.like_counter_buffer.flush())
+
+
+@pytest.fixture(autouse=True)
+def empty_buffer(monkeypatch):
+    monkeypatch.setattr(server.like_counter_buffer, "pending", {})
+    monkeypatch.setattr(server.like_counter_buffer, "in_flight", {})
+    monkeypatch.setattr(server.like_counter_buffer, "pending_events", 0)
+
+
+def test_like_is_idempotent_and_coalesced(client, db, register, post_recipe):
+    author, _ = register(1)
+    fan, _ = register(2)
+    recipe_id = post_recipe(author)["id"]
+
+    for headers in (author, fan, fan):
+        response = client.put(f"/api/recipes/{recipe_id}/like", headers=headers)
+    assert response.json() == {"id": recipe_id, "likes": 2, "isLiked": True, "isSaved": None}
+    # Rien n'est écrit sur la recette avant le flush, qui n'envoie qu'un $inc
+    assert stored_likes(db, recipe_id) == 0
+    assert server.like_counter_buffer.pending == {ObjectId(recipe_id): 2}
+    flush()
+    assert stored_likes(db, recipe_id) == 2
+
+    assert client.delete(f"/api/recipes/{recipe_id}/like", headers=fan).json()["likes"] == 1
+    assert client.delete(f"/api/recipes/{recipe_id}/like", headers=fan).json()["likes"] == 1
+    flush()
+    assert stored_likes(db, recipe_id) == 1
+
+
+def test_like_unknown_recipe_leaves_no_membership(client, db, register):
+    headers, _ = register(1)
+    assert client.put(f"/api/recipes/{ObjectId()}/like", headers=headers).status_code == 404
+    assert asyncio.run(db.user_likes.count_documents({})) == 0
+
+
+def test_in_flight_deltas_stay_visible_and_failures_are_requeued():
+    class FailingCollection:
+        async def bulk_write(self, requests, ordered):
+            # Pendant l'écriture, le lot reste compté
+            assert buffer.pending_delta("a") == 2
+            raise BulkWriteError({"writeErrors": [{"index": 1, "code": 2, "errmsg": "bad"}]})
+
+    buffer = counters.CounterBuffer(FailingCollection(), "likes")
+    buffer.add("a", 1)
+    buffer.add("a", 1)
+    buffer.add("b", -1)
+    asyncio.run(buffer.flush())
+    assert buffer.pending == {"b": -1}
+    assert buffer.pending_delta("a") == 0
+    assert buffer.metrics["failures"] == 1
+
+
+def test_reconcile_repairs_lost_deltas_only_on_quiet_recipes(db):
+    old = datetime.utcnow() - timedelta(hours=1)
+    quiet, active = ObjectId(), ObjectId()
+    asyncio.run(db.recipes.insert_many([{"_id": quiet, "likes": 0}, {"_id": active, "likes": 0}]))
+    asyncio.run(db.user_likes.insert_many([
+        {"userId": ObjectId(), "recipeId": quiet, "createdAt": old},
+        {"userId": ObjectId(), "recipeId": quiet, "createdAt": old},
+        # Like récent : son delta peut encore être dans le tampon d'un worker
+        {"userId": ObjectId(), "recipeId": active, "createdAt": datetime.utcnow()},
+    ]))
+
+    assert asyncio.run(reconcile_counters.reconcile_likes(db)) == 1
+    assert stored_likes(db, quiet) == 2
+    assert stored_likes(db, active) == 0
+
+
+def test_reconcile_skips_recipes_with_recent_unlikes(client, db, register, post_recipe):
+    headers, _ = register(1)
+    recipe_id = post_recipe(headers)["id"]
+    asyncio.run(db.recipes.update_one({"_id": ObjectId(recipe_id)}, {"$set": {"likes": 1}}))
+    client.put(f"/api/recipes/{recipe_id}/like", headers=headers)
+    client.delete(f"/api/recipes/{recipe_id}/like", headers=headers)
+
+    # Like puis retrait récents : leurs deltas peuvent encore attendre dans un tampon
+    assert asyncio.run(reconcile_counters.reconcile_likes(db, quiet_period=timedelta(minutes=10))) == 0
+    assert asyncio.run(reconcile_counters.reconcile_likes(db, quiet_period=timedelta(0))) == 1
@@ -0,0 +1,100 @@
+import pytest
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def empty_buffer(monkeypatch):
+    monkeypatch.setattr(server.like_counter_buffer, "pending", {})
+    monkeypatch.setattr(server.like_counter_buffer, "in_flight", {})
+    monkeypatch.setattr(server.like_counter_buffer, "pending_events", 0)
+
+
+def revalidate(client, url, etag, headers=None):
+    return client.get(url, headers={**(headers or {}), "If-None-Match": etag})
+
+
+def test_recipe_etag_and_cache_scope(client, db, register, post_recipe):
+    author, _ = register(1)
+    recipe_id = post_recipe(author)["id"]
+    url = f"/api/recipes/{recipe_id}"
+
+    anonymous = client.get(url)
+    assert anonymous.status_code == 200
+    assert anonymous.headers["cache-control"] == server.PUBLIC_CACHE_CONTROL
+    not_modified = revalidate(client, url, anonymous.headers["etag"])
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == anonymous.headers["etag"]
+
+    # L'état du lecteur fait partie de la représentation : réponse privée
+    viewer = client.get(url, headers=author)
+    assert viewer.headers["cache-control"] == server.PRIVATE_CACHE_CONTROL
+    assert revalidate(client, url, viewer.headers["etag"], author).status_code == 304
+
+
+def test_recipe_etag_changes_after_like(client, db, register, post_recipe):
+    author, _ = register(1)
+    fan, _ = register(2)
+    recipe_id = post_recipe(author)["id"]
+    url = f"/api/recipes/{recipe_id}"
+    etag = client.get(url).headers["etag"]
+
+    client.put(f"/api/recipes/{recipe_id}/like", headers=fan)
+
+    # Le like encore dans le tampon suffit à invalider l'ETag
+    response = revalidate(client, url, etag)
+    assert response.status_code == 200
+    assert response.json()["likes"] == 1
+    assert response.headers["etag"] != etag
+
+
+def test_comments_etag(client, db, register, post_recipe):
+    author, _ = register(1)
+    recipe_id = post_recipe(author)["id"]
+    url = f"/api/recipes/{recipe_id}/comments"
+    etag = client.get(url).headers["etag"]
+    assert revalidate(client, url, etag).status_code == 304
+
+    client.post("/api/comments", json={
+        "content": "Délicieux",
+        "recipeId": recipe_id,
+        "author": {"id": "", "name": "First1", "avatar": ""},
+    }, headers=author)
+
+    response = revalidate(client, url, etag)
+    assert response.status_code == 200
+    assert [comment["content"] for comment in response.json()] == ["Délicieux"]
+
+
+def test_profile_etag(client, db, register, post_recipe, user_id):
+    author, _ = register(1)
+    viewer, _ = register(2)
+    url = f"/api/users/{user_id(author)}/profile"
+    first = client.get(url, headers=viewer)
+    assert first.status_code == 200
+    assert revalidate(client, url, first.headers["etag"], viewer).status_code == 304
+
+    post_recipe(author, "Nouvelle recette")
+
+    assert revalidate(client, url, first.headers["etag"], viewer).status_code == 200
+
+
+def test_conversations_listed_with_participants_and_etag(client, db, register, user_id):
+    me, _ = register(1)
+    others = [register(i) for i in (2, 3, 4)]
+    for headers, _ in others:
+        response = client.post("/api/conversations", json={"userId": user_id(headers)}, headers=me)
+        assert response.status_code == 200
+
+    response = client.get("/api/conversations", headers=me)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == server.PRIVATE_CACHE_CONTROL
+    assert sorted(conv["participant"]["name"] for conv in response.json()) == [
+        "First2 Last2", "First3 Last3", "First4 Last4"
+    ]
+    assert revalidate(client, "/api/conversations", response.headers["etag"], me).status_code == 304
+
+    conversation_id = response.json()[0]["id"]
+    client.post(f"/api/conversations/{conversation_id}/messages", json={"content": "Salut"}, headers=me)
+
+    assert revalidate(client, "/api/conversations", response.headers["etag"], me).status_code == 200
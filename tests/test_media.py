@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import media_store
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture(autouse=True)
+def media_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_store, "MEDIA_ROOT", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def stored_media(db):
+    media_id = hashlib.sha256(DATA).hexdigest()
+    media_store._write_file(media_store.media_path(media_id, "original"), DATA)
+    asyncio.run(db.media.insert_one({"_id": media_id, "mime": "image/png", "size": len(DATA)}))
+    return media_id
+
+
+def test_concurrent_writes_of_the_same_content(media_root, monkeypatch):
+    path = media_store.media_path("ab" * 32, "original")
+    replace = media_store.os.replace
+    both_written = threading.Barrier(2)
+
+    def synchronized_replace(source, destination):
+        # Les deux ingestions ont écrit leur fichier temporaire avant tout renommage
+        both_written.wait(timeout=5)
+        replace(source, destination)
+
+    monkeypatch.setattr(media_store.os, "replace", synchronized_replace)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(lambda _: media_store._write_file(path, DATA), range(2)))
+    assert path.read_bytes() == DATA
+    assert not list(path.parent.glob("*.tmp"))
+
+
+def test_failed_write_leaves_no_temporary_file(media_root, monkeypatch):
+    path = media_store.media_path("cd" * 32, "original")
+
+    def failing_replace(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(media_store.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        media_store._write_file(path, DATA)
+    assert not path.exists()
+    assert not list(path.parent.glob("*.tmp"))
+
+
+def test_full_and_ranged_reads(client, stored_media):
+    full = client.get(f"/api/media/{stored_media}")
+    assert full.status_code == 200
+    assert full.content == DATA
+    assert full.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    ranged = client.get(f"/api/media/{stored_media}", headers={"Range": "bytes=100-199"})
+    assert ranged.status_code == 206
+    assert ranged.content == DATA[100:200]
+    assert ranged.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+
+    suffix = client.get(f"/api/media/{stored_media}", headers={"Range": "bytes=-10"})
+    assert suffix.content == DATA[-10:]
+
+
+def test_etag_revalidation(client, stored_media):
+    etag = client.get(f"/api/media/{stored_media}").headers["etag"]
+    assert client.get(f"/api/media/{stored_media}", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_unknown_media(client):
+    assert client.get(f"/api/media/{'0' * 64}").status_code == 404
+    assert client.get("/api/media/not-a-hash").status_code == 404
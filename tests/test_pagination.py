@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+
+def open_conversation(client, register, user_id):
+    alice, _ = register(1)
+    bob, _ = register(2)
+    response = client.post("/api/conversations", json={"userId": user_id(bob)}, headers=alice)
+    return alice, bob, response.json()["conversationId"]
+
+
+def insert_messages(db, conversation_id, sender_id, timestamps):
+    """Messages insérés directement pour maîtriser createdAt (égalités comprises)"""
+    docs = [
+        {
+            "_id": ObjectId(),
+            "conversationId": ObjectId(conversation_id),
+            "content": f"m{i}",
+            "senderId": sender_id,
+            "sender": {"id": sender_id, "name": "First1 Last1", "avatar": ""},
+            "createdAt": created_at,
+        }
+        for i, created_at in enumerate(timestamps)
+    ]
+    asyncio.run(db.messages.insert_many(docs))
+    return [doc["content"] for doc in docs]
+
+
+def walk_older(client, headers, conversation_id, limit):
+    pages, cursor = [], ""
+    while cursor is not None:
+        page = client.get(
+            f"/api/conversations/{conversation_id}/messages",
+            params={"before": cursor, "limit": limit},
+            headers=headers,
+        ).json()
+        pages.append([item["content"] for item in page["items"]])
+        cursor = page["olderCursor"]
+    return pages
+
+
+def test_before_walks_history_without_gaps_or_duplicates(client, db, register, user_id):
+    alice, _, conversation_id = open_conversation(client, register, user_id)
+    base = datetime(2024, 1, 1)
+    # Trois messages partagent le même createdAt : le départage se fait sur _id
+    timestamps = [base, base + timedelta(seconds=1), base + timedelta(seconds=1), base + timedelta(seconds=1),
+                  base + timedelta(seconds=2), base + timedelta(seconds=3), base + timedelta(seconds=4)]
+    contents = insert_messages(db, conversation_id, user_id(alice), timestamps)
+
+    pages = walk_older(client, alice, conversation_id, limit=2)
+    assert [content for page in reversed(pages) for content in page] == contents
+    # Chaque page est rendue dans l'ordre chronologique
+    assert pages[0] == contents[-2:]
+
+
+def test_exact_page_boundary_ends_with_empty_page(client, db, register, user_id):
+    alice, _, conversation_id = open_conversation(client, register, user_id)
+    base = datetime(2024, 1, 1)
+    contents = insert_messages(db, conversation_id, user_id(alice), [base + timedelta(seconds=i) for i in range(4)])
+
+    pages = walk_older(client, alice, conversation_id, limit=2)
+    # Une page pleine annonce un curseur ; la page suivante est vide et le termine
+    assert pages == [contents[2:], contents[:2], []]
+
+
+def test_after_returns_only_newer_messages(client, db, register, user_id):
+    alice, bob, conversation_id = open_conversation(client, register, user_id)
+    base = datetime(2024, 1, 1)
+    insert_messages(db, conversation_id, user_id(alice), [base + timedelta(seconds=i) for i in range(3)])
+    latest = client.get(
+        f"/api/conversations/{conversation_id}/messages", params={"before": "", "limit": 10}, headers=bob
+    ).json()
+
+    caught_up = client.get(
+        f"/api/conversations/{conversation_id}/messages", params={"after": latest["newerCursor"]}, headers=bob
+    ).json()
+    assert caught_up["items"] == []
+    assert caught_up["newerCursor"] == latest["newerCursor"]
+
+    client.post(f"/api/conversations/{conversation_id}/messages", json={"content": "new"}, headers=alice)
+    caught_up = client.get(
+        f"/api/conversations/{conversation_id}/messages", params={"after": latest["newerCursor"]}, headers=bob
+    ).json()
+    assert [item["content"] for item in caught_up["items"]] == ["new"]
+
+
+def test_invalid_cursor_rejected(client, register, user_id):
+    alice, _, conversation_id = open_conversation(client, register, user_id)
+    response = client.get(
+        f"/api/conversations/{conversation_id}/messages", params={"before": "garbage"}, headers=alice
+    )
+    assert response.status_code == 400
+
+
+def test_recipe_keyset_pages_cover_all_recipes(client, db, register):
+    headers, _ = register(1)
+    created_at = datetime(2024, 1, 1)
+    # Même createdAt pour toutes : seul _id ordonne les pages
+    asyncio.run(db.recipes.insert_many([
+        {"title": f"r{i}", "description": "", "ingredients": [], "instructions": [], "tags": [],
+         "image": "", "author": {"id": "a", "name": "n", "avatar": ""}, "authorId": ObjectId(),
+         "likes": 0, "createdAt": created_at, "updatedAt": created_at}
+        for i in range(5)
+    ]))
+
+    titles, cursor = [], ""
+    while True:
+        page = client.get("/api/recipes", params={"cursor": cursor, "limit": 2}, headers=headers).json()
+        titles += [item["title"] for item in page["items"]]
+        if not page["nextCursor"]:
+            break
+        cursor = page["nextCursor"]
+    assert sorted(titles) == [f"r{i}" for i in range(5)]
+    assert len(titles) == 5
+
+
+@pytest.mark.parametrize("params", [
+    {"cursor": "", "limit": 0},
+    {"cursor": "", "limit": -1},
+    {"cursor": "", "limit": 51},
+    {"page": 0},
+    {"page": -3},
+])
+def test_recipe_page_bounds_rejected(client, params):
+    assert client.get("/api/recipes", params=params).status_code == 422
+
+
+@pytest.mark.parametrize("limit", [0, -1, 51])
+def test_following_feed_limit_bounds_rejected(client, register, limit):
+    headers, _ = register(1)
+    response = client.get("/api/recipes/following", params={"cursor": "", "limit": limit}, headers=headers)
+    assert response.status_code == 422
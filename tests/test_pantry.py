@@ -0,0 +1,50 @@
+import ingredient_index
+
+
+def pantry(client, ingredients, **body):
+    response = client.post("/api/recipes/pantry-match", json={"ingredients": ingredients, **body})
+    assert response.status_code == 200, response.text
+    return [(item["recipe"]["title"], item["matchedCount"], item["missingIngredients"]) for item in response.json()]
+
+
+def test_ingredient_terms_drop_quantities_and_units():
+    assert ingredient_index.ingredient_terms("200 g de chocolat noir") == ingredient_index.ingredient_terms("Chocolat noir")
+    assert ingredient_index.ingredient_name("2 cuillères à soupe d'huile d'olive") == "huile d'olive"
+
+
+def test_fewest_missing_first(client, register, post_recipe):
+    headers, _ = register(1)
+    post_recipe(headers, "Omelette", ingredients=["3 œufs", "10 g de beurre"])
+    post_recipe(headers, "Crêpes", ingredients=["250 g de farine", "4 oeufs", "50 cl de lait"])
+    post_recipe(headers, "Salade", ingredients=["1 laitue"])
+
+    assert pantry(client, ["oeufs", "beurre", "lait"]) == [
+        ("Omelette", 2, []),
+        ("Crêpes", 2, ["250 g de farine"]),
+    ]
+
+
+def test_pantry_item_must_cover_every_term(client, register, post_recipe):
+    headers, _ = register(1)
+    post_recipe(headers, "Mousse", ingredients=["200 g de chocolat noir"])
+    assert pantry(client, ["chocolat blanc"]) == []
+    assert pantry(client, ["chocolat"]) == [("Mousse", 1, [])]
+
+
+def test_max_missing_and_limit(client, register, post_recipe):
+    headers, _ = register(1)
+    post_recipe(headers, "Simple", ingredients=["riz"])
+    post_recipe(headers, "Complet", ingredients=["riz", "safran", "poulet"])
+    assert pantry(client, ["riz"], maxMissing=0) == [("Simple", 1, [])]
+    assert len(pantry(client, ["riz"], limit=1)) == 1
+
+
+def test_deleted_recipe_not_matched(client, register, post_recipe):
+    headers, _ = register(1)
+    recipe = post_recipe(headers, "Risotto", ingredients=["riz arborio"])
+    client.delete(f"/api/recipes/{recipe['id']}", headers=headers)
+    assert pantry(client, ["riz"]) == []
+
+
+def test_empty_pantry_rejected(client):
+    assert client.post("/api/recipes/pantry-match", json={"ingredients": []}).status_code == 422
@@ -0,0 +1,88 @@
+import asyncio
+
+import principal_cache
+import server
+
+
+def test_cache_serves_principal_without_users_lookup(client, db, register, monkeypatch):
+    headers, _ = register(1)
+    client.get("/api/users/me", headers=headers)
+    assert len(server.principals) == 1
+
+    lookups = []
+    find_one = db.users.find_one
+
+    async def counting_find_one(*args, **kwargs):
+        lookups.append(args)
+        return await find_one(*args, **kwargs)
+
+    monkeypatch.setattr(db.users, "find_one", counting_find_one)
+    response = client.get("/api/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == "user1@example.com"
+    assert lookups == []
+
+
+def test_profile_update_invalidates_local_entry(client, db, register):
+    headers, _ = register(1)
+    client.get("/api/users/me", headers=headers)
+
+    client.put("/api/users/me", json={"firstName": "Renommé"}, headers=headers)
+
+    assert client.get("/api/users/me", headers=headers).json()["firstName"] == "Renommé"
+
+
+def test_deactivated_user_is_rejected_immediately(client, db, register):
+    headers, _ = register(1)
+    client.get("/api/users/me", headers=headers)
+
+    assert client.post("/api/users/me/deactivate", headers=headers).status_code == 204
+
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+
+
+def test_sync_evicts_entries_changed_by_another_worker(client, db, register):
+    headers, _ = register(1)
+    client.get("/api/users/me", headers=headers)
+    cache = server.principals
+    cache.watermark = None
+    assert asyncio.run(cache.sync(db.users)) == 0
+
+    # Écriture faite par un autre worker : seul le tampon en base avance
+    asyncio.run(db.users.update_one(
+        {"email": "user1@example.com"},
+        {"$set": {"firstName": "Ailleurs", "principalVersion": principal_cache.new_version() + 1}},
+    ))
+
+    assert asyncio.run(cache.sync(db.users)) == 1
+    assert client.get("/api/users/me", headers=headers).json()["firstName"] == "Ailleurs"
+
+
+def test_sync_keeps_entries_whose_version_is_unchanged(db):
+    cache = principal_cache.PrincipalCache()
+    version = principal_cache.new_version()
+    asyncio.run(db.users.insert_one({"email": "a@example.com", "principalVersion": version}))
+    cache.watermark = version
+    cache.put("a@example.com", "principal", version)
+
+    assert asyncio.run(cache.sync(db.users)) == 0
+    assert cache.get("a@example.com") == "principal"
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principal_cache.time, "monotonic", lambda: now[0])
+    cache = principal_cache.PrincipalCache(ttl_seconds=60, max_entries=2)
+    cache.put("a", "A", 1)
+    cache.put("b", "B", 1)
+    assert cache.get("a") == "A"
+    cache.put("c", "C", 1)
+
+    # "b" est le moins récemment utilisé
+    assert cache.get("b") is None
+    assert cache.metrics["evictions"] == 1
+
+    now[0] += 60
+    assert cache.get("a") is None
+    assert cache.metrics["expired"] == 1
+    assert cache.snapshot()["entries"] == 1
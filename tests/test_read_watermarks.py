@@ -0,0 +1,50 @@
+import asyncio
+
+from bson import ObjectId
+
+
+def reads_of(db, conversation_id, user):
+    conv = asyncio.run(db.conversations.find_one({"_id": ObjectId(conversation_id)}))
+    return (conv.get("reads") or {}).get(user)
+
+
+def mark_read(client, headers, conversation_id):
+    return client.post(f"/api/conversations/{conversation_id}/mark-read", headers=headers).json()
+
+
+def test_mark_read_sets_watermark_without_touching_messages(client, db, conversation, send_message, user_id):
+    alice, bob, conversation_id = conversation
+    send_message(alice, conversation_id, "a")
+    last_id = send_message(alice, conversation_id, "b")
+
+    assert mark_read(client, bob, conversation_id) == {"marked_as_read": 2}
+    assert reads_of(db, conversation_id, user_id(bob))["lastReadMessageId"] == ObjectId(last_id)
+    # Plus d'écriture readAt message par message
+    assert asyncio.run(db.messages.count_documents({"readAt": {"$exists": True}})) == 0
+
+    # Relire une conversation déjà lue ne change rien
+    assert mark_read(client, bob, conversation_id) == {"marked_as_read": 0}
+
+
+def test_sender_sees_participant_watermark(client, db, conversation, send_message):
+    alice, bob, conversation_id = conversation
+    last_id = send_message(alice, conversation_id, "a")
+    [listed] = client.get("/api/conversations", headers=alice).json()
+    assert listed["participantLastReadMessageId"] is None
+
+    mark_read(client, bob, conversation_id)
+
+    [listed] = client.get("/api/conversations", headers=alice).json()
+    assert listed["participantLastReadMessageId"] == last_id
+
+
+def test_watermark_never_moves_backwards(client, db, conversation, send_message, user_id):
+    alice, bob, conversation_id = conversation
+    send_message(alice, conversation_id, "a")
+    newest = send_message(alice, conversation_id, "b")
+    mark_read(client, bob, conversation_id)
+
+    # lastMessage redevient un message plus ancien que la marque
+    client.delete(f"/api/messages/{newest}", headers=alice)
+    assert mark_read(client, bob, conversation_id) == {"marked_as_read": 0}
+    assert reads_of(db, conversation_id, user_id(bob))["lastReadMessageId"] == ObjectId(newest)
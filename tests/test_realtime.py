@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+import realtime
+import server
+
+
+@pytest.fixture(autouse=True)
+def fresh_hub(monkeypatch):
+    monkeypatch.setattr(server, "realtime_hub", realtime.Hub())
+
+
+def conversation_between(client, headers, other_id):
+    return client.post("/api/conversations", json={"userId": other_id}, headers=headers).json()["conversationId"]
+
+
+def test_socket_rejects_invalid_token(client, db):
+    with client.websocket_connect("/api/ws?token=invalide") as socket:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_text()
+    assert closed.value.code == server.WS_UNAUTHORIZED
+
+
+def test_ping_and_subscribe(client, db, register, user_id):
+    me, login = register(1)
+    other, _ = register(2)
+    stranger, _ = register(3)
+    conversation_id = conversation_between(client, me, user_id(other))
+    foreign_id = conversation_between(client, other, user_id(stranger))
+
+    with client.websocket_connect(f"/api/ws?token={login['access_token']}") as socket:
+        socket.send_json({"type": "ping"})
+        assert socket.receive_json() == {"type": "pong"}
+
+        # Conversation dont l'utilisateur n'est pas participant : ignorée
+        socket.send_json({"type": "subscribe", "conversationId": foreign_id})
+        socket.send_json({"type": "subscribe", "conversationId": "pas-un-id"})
+        socket.send_json({"type": "subscribe", "conversationId": conversation_id})
+        assert socket.receive_json() == {"type": "subscribed", "conversationId": conversation_id}
+
+        hub = server.realtime_hub
+        assert hub.has_subscribers(realtime.conversation_channel(conversation_id))
+        assert not hub.has_subscribers(realtime.conversation_channel(foreign_id))
+        assert hub.has_subscribers(realtime.user_channel(user_id(me)))
+
+        socket.send_json({"type": "unsubscribe", "conversationId": conversation_id})
+        socket.send_json({"type": "ping"})
+        assert socket.receive_json() == {"type": "pong"}
+        assert not hub.has_subscribers(realtime.conversation_channel(conversation_id))
+
+    assert server.realtime_hub.snapshot()["connections"] == 0
+
+
+def test_hub_publishes_to_channel_subscribers_only():
+    hub = realtime.Hub()
+    first, second = hub.connect("a"), hub.connect("b")
+    hub.subscribe(first, realtime.conversation_channel("c"))
+
+    assert hub.publish(realtime.conversation_channel("c"), {"type": "message.created"}) == 1
+    assert json.loads(first.queue.get_nowait()) == {"type": "message.created"}
+    assert second.queue.empty()
+
+    hub.disconnect(first)
+    assert not hub.has_subscribers(realtime.conversation_channel("c"))
+    assert hub.broadcast({"type": "resync"}) == 1
+
+
+def test_slow_subscriber_is_flagged_on_overflow():
+    hub = realtime.Hub()
+    subscriber = realtime.Subscriber("a", max_queued=1)
+    hub.subscribe(subscriber, "user:a")
+
+    assert hub.publish("user:a", {"n": 1}) == 1
+    assert hub.publish("user:a", {"n": 2}) == 0
+    assert subscriber.overflowed
+    assert hub.snapshot()["dropped"] == 1
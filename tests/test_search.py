@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import search_index
+
+
+def search(client, **params):
+    return [item["title"] for item in client.get("/api/recipes/search", params=params).json()]
+
+
+def test_analyzer_folds_accents_and_stems():
+    assert search_index.analyze("Crème BRÛLÉE aux fraises") == search_index.analyze("creme brulee fraise")
+    assert "et" not in search_index.analyze("sel et poivre")
+
+
+def test_title_match_outranks_description(client, register, post_recipe):
+    headers, _ = register(1)
+    post_recipe(headers, "Salade niçoise", description="Un plat de thon")
+    post_recipe(headers, "Tarte au thon")
+    post_recipe(headers, "Gratin", description="Sans poisson")
+    assert search(client, q="thon") == ["Tarte au thon", "Salade niçoise"]
+
+
+def test_rare_term_weighs_more_than_common_one(client, register, post_recipe):
+    headers, _ = register(1)
+    for i in range(4):
+        post_recipe(headers, f"Poulet {i}")
+    post_recipe(headers, "Poulet au safran")
+    assert search(client, q="poulet safran")[0] == "Poulet au safran"
+
+
+def test_filters_and_pagination(client, register, post_recipe):
+    headers, _ = register(1)
+    post_recipe(headers, "Soupe rapide", difficulty="easy", prepTimeMinutes=10, servings=2)
+    post_recipe(headers, "Soupe longue", difficulty="hard", prepTimeMinutes=90, servings=6)
+    post_recipe(headers, "Soupe moyenne", difficulty="medium", prepTimeMinutes=30, servings=4)
+
+    assert search(client, q="soupe", difficulty="easy") == ["Soupe rapide"]
+    assert sorted(search(client, q="soupe", maxPrepTime=30)) == ["Soupe moyenne", "Soupe rapide"]
+    assert search(client, q="soupe", minServings=5) == ["Soupe longue"]
+    first = search(client, q="soupe", limit=2)
+    rest = search(client, q="soupe", limit=2, offset=2)
+    assert len(first) == 2 and len(rest) == 1
+    assert set(first + rest) == {"Soupe rapide", "Soupe longue", "Soupe moyenne"}
+
+
+def test_unknown_term_returns_nothing(client, register, post_recipe):
+    headers, _ = register(1)
+    post_recipe(headers, "Quiche lorraine")
+    assert search(client, q="sushi") == []
+
+
+def test_deleted_recipe_leaves_results(client, register, post_recipe):
+    headers, _ = register(1)
+    recipe = post_recipe(headers, "Tarte tatin")
+    client.delete(f"/api/recipes/{recipe['id']}", headers=headers)
+    assert search(client, q="tatin") == []
+
+
+def test_sync_index_picks_up_other_workers_recipes(db):
+    index = search_index.RecipeSearchIndex()
+    now = datetime.utcnow()
+    asyncio.run(db.recipes.insert_one({"_id": ObjectId(), "title": "Local", "createdAt": now}))
+    assert asyncio.run(search_index.sync_index(db, index)) == 1
+
+    # Une recette ajoutée localement, plus récente, ne masque pas celle d'un autre worker
+    index.add({"_id": ObjectId(), "title": "Locale récente", "createdAt": now + timedelta(seconds=10)})
+    asyncio.run(db.recipes.insert_one({"_id": ObjectId(), "title": "Distante", "createdAt": now + timedelta(seconds=5)}))
+    assert asyncio.run(search_index.sync_index(db, index)) == 1
+    assert len(index.search("distante")) == 1
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+import recommender
+
+
+def similar(client, recipe_id):
+    return client.get(f"/api/recipes/{recipe_id}/similar")
+
+
+def titles(response):
+    return [item["title"] for item in response.json()]
+
+
+def test_neighbours_ranked_by_shared_terms(client, register, post_recipe):
+    headers, _ = register(1)
+    base = post_recipe(headers, "Tarte aux pommes", ingredients=["pommes", "pâte brisée", "cannelle"], tags=["dessert"])
+    post_recipe(headers, "Crumble pommes cannelle", ingredients=["pommes", "cannelle", "farine"], tags=["dessert"])
+    post_recipe(headers, "Compote", ingredients=["pommes"])
+    post_recipe(headers, "Chili", ingredients=["haricots rouges", "boeuf"])
+
+    response = similar(client, base["id"])
+    assert response.status_code == 200
+    assert titles(response) == ["Crumble pommes cannelle", "Compote"]
+
+
+def test_unknown_and_invalid_ids(client):
+    assert similar(client, str(ObjectId())).status_code == 404
+    assert similar(client, "not-an-id").status_code == 400
+
+
+def test_recipe_from_another_worker_is_indexed_on_demand(client, db, register, post_recipe):
+    headers, _ = register(1)
+    post_recipe(headers, "Risotto aux cèpes", ingredients=["riz arborio", "cèpes"])
+    # Insérée par un autre worker : absente de l'index local
+    remote_id = ObjectId()
+    asyncio.run(db.recipes.insert_one({
+        "_id": remote_id, "title": "Risotto safran", "ingredients": ["riz arborio", "safran"],
+        "createdAt": datetime.utcnow(),
+    }))
+    assert titles(similar(client, remote_id)) == ["Risotto aux cèpes"]
+
+
+def test_empty_neighbour_list_not_cached(client, db, register, post_recipe):
+    headers, _ = register(1)
+    lonely = post_recipe(headers, "Sushi", ingredients=["riz vinaigré", "saumon"])
+    assert titles(similar(client, lonely["id"])) == []
+    assert asyncio.run(db.similar_recipes.count_documents({})) == 0
+
+    post_recipe(headers, "Poke bowl", ingredients=["saumon", "avocat"])
+    assert titles(similar(client, lonely["id"])) == ["Poke bowl"]
+
+
+def test_build_index_matches_incremental_and_precomputes(db, monkeypatch):
+    monkeypatch.setattr(recommender, "BUILD_BATCH_SIZE", 2)
+    docs = [
+        {"_id": ObjectId(), "title": f"Gratin {i}", "ingredients": ["pommes de terre", "crème"],
+         "likes": i, "createdAt": datetime(2024, 1, 1, 0, 0, i)}
+        for i in range(5)
+    ]
+    asyncio.run(db.recipes.insert_many(docs))
+
+    built = asyncio.run(recommender.build_index(db))
+    incremental = recommender.SimilarityIndex()
+    incremental.add_many(docs)
+    assert built.doc_ids == incremental.doc_ids
+    assert built.watermark == docs[-1]["createdAt"]
+    assert built.similar(docs[0]["_id"]) == incremental.similar(docs[0]["_id"])
+
+    assert asyncio.run(recommender.precompute_popular(db, built, limit=3)) == 3
+    stored = asyncio.run(db.similar_recipes.find_one({"_id": docs[4]["_id"]}))
+    assert docs[4]["_id"] not in stored["similar"]
+    assert len(stored["similar"]) == 4
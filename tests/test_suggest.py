@@ -0,0 +1,83 @@
+import asyncio
+
+import suggest_index
+
+
+def suggest(client, prefix, **params):
+    return [(item["type"], item["value"]) for item in client.get("/api/suggest", params={"prefix": prefix, **params}).json()]
+
+
+def test_new_recipe_entries_are_suggested(client, register, post_recipe):
+    headers, _ = register(1)
+    post_recipe(headers, "Tajine", ingredients=["500 g de carottes"], tags=["Marocain"])
+    assert suggest(client, "car") == [("ingredient", "carottes")]
+    assert suggest(client, "MARO") == [("tag", "Marocain")]
+
+
+def test_kind_filter_is_not_crowded_out(client, register, post_recipe):
+    headers, _ = register(1)
+    for i in range(10):
+        post_recipe(headers, f"Recette {i}", tags=["pasta"])
+    post_recipe(headers, "Carbonara", ingredients=["pâtes fraîches"])
+
+    assert suggest(client, "pa", limit=1) == [("tag", "pasta")]
+    assert suggest(client, "pa", types="ingredient") == [("ingredient", "pâtes fraîches")]
+
+
+def test_follow_weight_is_taken_back_on_unfollow(client, register, user_id):
+    alice, _ = register(1)
+    bob, _ = register(2)
+    weight = lambda: {item["value"]: item["weight"] for item in client.get("/api/suggest", params={"prefix": "user"}).json()}
+
+    client.post("/api/follows", json={"followingId": user_id(bob)}, headers=alice)
+    assert weight()["user2"] == weight()["user1"] + 1
+    client.delete(f"/api/follows/{user_id(bob)}", headers=alice)
+    assert weight()["user2"] == weight()["user1"]
+
+
+def test_build_index_weights_users_by_followers_count(db):
+    asyncio.run(db.users.insert_many([
+        {"username": "chef", "followersCount": 41},
+        {"username": "chouquette", "followersCount": 0},
+        {"username": "cheffe", "followersCount": 3, "isActive": False},
+    ]))
+    asyncio.run(db.recipes.insert_one({"tags": ["chocolat"], "ingredients": ["200 g de chocolat noir"]}))
+
+    index = asyncio.run(suggest_index.build_index(db))
+    assert [(s["type"], s["value"], s["weight"]) for s in index.suggest("ch", kinds=["user"])] == [
+        ("user", "chef", 42), ("user", "chouquette", 1),
+    ]
+    assert [s["value"] for s in index.suggest("choc")] == ["chocolat", "chocolat noir"]
+
+
+def test_replacement_replays_journal():
+    live = suggest_index.SuggestIndex()
+    live.bump("tag", "vegan")
+    live.rebuild()
+    live.journal = []
+    live.bump("tag", "vegan", 2)
+    live.discard("tag", "vegan")
+    live.bump("tag", "végétarien")
+
+    replacement = suggest_index.SuggestIndex()
+    replacement.bump("tag", "vegan", 5)
+    replacement.rebuild()
+    replacement.replay(live.journal)
+    assert [s["value"] for s in replacement.suggest("veg")] == ["végétarien"]
+
+
+def test_pending_overflow_rebuilds_off_the_request(monkeypatch):
+    monkeypatch.setattr(suggest_index, "MAX_PENDING", 3)
+
+    async def scenario():
+        index = suggest_index.SuggestIndex()
+        for name in ("abricot", "ail", "amande", "aneth"):
+            index.bump("ingredient", name)
+        # Reconstruction planifiée, pas exécutée dans l'appel
+        assert len(index.pending) == 4
+        await index._rebuild_task
+        return index
+
+    index = asyncio.run(scenario())
+    assert not index.pending
+    assert len(index.suggest("a")) == 4
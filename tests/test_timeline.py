@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def small_fanout_limit(monkeypatch):
+    monkeypatch.setattr(server, "FANOUT_MAX_FOLLOWERS", 1)
+    monkeypatch.setattr(server, "FANOUT_RESUME_FOLLOWERS", 1)
+    monkeypatch.setitem(server._fanout_on_read_authors, "loadedAt", None)
+
+
+def feed_titles(client, headers):
+    page = client.get("/api/recipes/following", params={"cursor": ""}, headers=headers).json()
+    return [item["title"] for item in page["items"]]
+
+
+def author_doc(db, author_id):
+    return asyncio.run(db.users.find_one({"_id": ObjectId(author_id)}))
+
+
+def test_follow_backfills_and_fans_out(client, register, user_id, post_recipe):
+    author, _ = register(1)
+    follower, _ = register(2)
+    post_recipe(author, "old")
+    client.post("/api/follows", json={"followingId": user_id(author)}, headers=follower)
+    post_recipe(author, "new")
+    assert feed_titles(client, follower) == ["new", "old"]
+
+
+def test_large_author_is_served_on_read_then_back_on_write(client, db, register, user_id, post_recipe):
+    author, _ = register(1)
+    first, _ = register(2)
+    second, _ = register(3)
+    author_id = user_id(author)
+    for headers in (first, second):
+        client.post("/api/follows", json={"followingId": author_id}, headers=headers)
+
+    # Deux abonnés > 1 : la recette n'est pas écrite dans les fils
+    post_recipe(author, "on-read")
+    assert author_doc(db, author_id)["fanoutOnRead"] is True
+    assert asyncio.run(db.timelines.count_documents({"authorId": ObjectId(author_id)})) == 0
+    assert feed_titles(client, first) == ["on-read"]
+
+    # Retour sous le seuil : le drapeau tombe et les fils sont rattrapés
+    client.delete(f"/api/follows/{author_id}", headers=second)
+    assert "fanoutOnRead" not in author_doc(db, author_id)
+    assert asyncio.run(db.timelines.count_documents({"authorId": ObjectId(author_id)})) == 1
+    post_recipe(author, "on-write")
+    assert feed_titles(client, first) == ["on-write", "on-read"]
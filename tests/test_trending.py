@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import ranking
+
+
+@pytest.fixture(autouse=True)
+def no_ingest_lag(monkeypatch):
+    monkeypatch.setattr(ranking, "INGEST_LAG", timedelta(0))
+
+
+def refresh(db, **kwargs):
+    return asyncio.run(ranking.refresh_trending(db, **kwargs))
+
+
+def scores(db) -> dict:
+    return {doc["_id"]: doc["score"] for doc in asyncio.run(db.recipe_scores.find().to_list(None))}
+
+
+def insert_likes(db, recipe_ids, created_at):
+    asyncio.run(db.user_likes.insert_many([
+        {"userId": ObjectId(), "recipeId": recipe_id, "createdAt": created_at} for recipe_id in recipe_ids
+    ]))
+
+
+def test_batches_split_inside_a_createdat_tie(db, monkeypatch):
+    monkeypatch.setattr(ranking, "BATCH_SIZE", 2)
+    recipe_ids = [ObjectId() for _ in range(5)]
+    # Cinq événements au même createdAt : les lots de deux coupent l'égalité
+    insert_likes(db, recipe_ids, datetime.utcnow() - timedelta(minutes=1))
+
+    assert refresh(db)["user_likes"] == 5
+    assert set(scores(db)) == set(recipe_ids)
+    assert len(set(round(score, 9) for score in scores(db).values())) == 1
+
+
+def test_replayed_batches_are_not_counted_twice(db, monkeypatch):
+    monkeypatch.setattr(ranking, "BATCH_SIZE", 2)
+    recipe_id = ObjectId()
+    insert_likes(db, [recipe_id] * 3 + [ObjectId()], datetime.utcnow() - timedelta(minutes=1))
+    refresh(db)
+    before = scores(db)
+
+    # Interruption avant l'enregistrement des watermarks : tous les lots sont relus
+    asyncio.run(db.ranking_state.update_one({"_id": "trending"}, {"$set": {"watermarks.user_likes": None}}))
+    refresh(db)
+    assert scores(db) == pytest.approx(before)
+
+
+def test_unlike_is_subtracted_incrementally(client, db, register, post_recipe):
+    headers, _ = register(1)
+    liked = post_recipe(headers, "liked")["id"]
+    unliked = post_recipe(headers, "unliked")["id"]
+    client.put(f"/api/recipes/{liked}/like", headers=headers)
+    client.put(f"/api/recipes/{unliked}/like", headers=headers)
+    refresh(db)
+    assert client.get("/api/recipes/trending").json()[0]["id"] in {liked, unliked}
+
+    client.delete(f"/api/recipes/{unliked}/like", headers=headers)
+    refresh(db)
+    assert scores(db)[ObjectId(unliked)] == pytest.approx(0, abs=ranking.MIN_SCORE)
+    assert [item["id"] for item in client.get("/api/recipes/trending").json()] == [liked]
+
+
+def test_removal_before_ingest_subtracts_nothing(client, db, register, post_recipe):
+    headers, _ = register(1)
+    recipe_id = post_recipe(headers)["id"]
+    refresh(db)
+    client.put(f"/api/recipes/{recipe_id}/save", headers=headers)
+    client.delete(f"/api/recipes/{recipe_id}/save", headers=headers)
+
+    stats = refresh(db)
+    assert stats[ranking.REMOVALS] == 1
+    assert ObjectId(recipe_id) not in scores(db)
+
+
+def test_full_run_ignores_earlier_removals(client, db, register, post_recipe):
+    headers, _ = register(1)
+    recipe_id = post_recipe(headers)["id"]
+    client.put(f"/api/recipes/{recipe_id}/like", headers=headers)
+    client.put(f"/api/recipes/{recipe_id}/save", headers=headers)
+    refresh(db)
+    client.delete(f"/api/recipes/{recipe_id}/save", headers=headers)
+
+    refresh(db, full=True)
+    weight, _ = ranking.ENGAGEMENT_SOURCES["user_likes"]
+    assert client.get("/api/recipes/trending").json()[0]["id"] == recipe_id
+    assert scores(db)[ObjectId(recipe_id)] == pytest.approx(weight, rel=1e-3)
+
+
+def test_lease_skips_concurrent_run(db):
+    holder = ranking.Lease(db)
+    assert asyncio.run(holder.acquire())
+    assert refresh(db) == {"skipped": True}
+    asyncio.run(holder.release())
+    assert not refresh(db).get("skipped")
@@ -0,0 +1,78 @@
+import asyncio
+
+from bson import ObjectId
+
+import reconcile_counters
+
+
+def conversation_doc(db, conversation_id):
+    return asyncio.run(db.conversations.find_one({"_id": ObjectId(conversation_id)}))
+
+
+def unread_of(db, conversation_id, user):
+    return (conversation_doc(db, conversation_id).get("unread") or {}).get(user, 0)
+
+
+def assert_counters_reconciled(db, conversation_id):
+    """Le compteur matérialisé doit égaler le décompte recalculé depuis les marques"""
+    expected = asyncio.run(reconcile_counters.unread_by_conversation(db))[ObjectId(conversation_id)]
+    stored = conversation_doc(db, conversation_id).get("unread") or {}
+    assert {user: stored.get(user, 0) for user in expected} == expected
+
+
+def unread_conversations(client, headers):
+    return client.get("/api/conversations/unread-count", headers=headers).json()["unread_conversations_count"]
+
+
+def test_send_increments_recipient_only(client, db, conversation, send_message, user_id):
+    alice, bob, conversation_id = conversation
+    send_message(alice, conversation_id, "a")
+    send_message(alice, conversation_id, "b")
+    assert unread_of(db, conversation_id, user_id(bob)) == 2
+    assert unread_of(db, conversation_id, user_id(alice)) == 0
+    assert unread_conversations(client, bob) == 1
+    assert unread_conversations(client, alice) == 0
+    assert_counters_reconciled(db, conversation_id)
+
+
+def test_mark_read_resets_counter(client, db, conversation, send_message, user_id):
+    alice, bob, conversation_id = conversation
+    send_message(alice, conversation_id, "a")
+    send_message(alice, conversation_id, "b")
+
+    response = client.post(f"/api/conversations/{conversation_id}/mark-read", headers=bob)
+    assert response.json() == {"marked_as_read": 2}
+    assert unread_of(db, conversation_id, user_id(bob)) == 0
+    assert unread_conversations(client, bob) == 0
+    assert_counters_reconciled(db, conversation_id)
+
+
+def test_deleting_unread_message_decrements(client, db, conversation, send_message, user_id):
+    alice, bob, conversation_id = conversation
+    send_message(alice, conversation_id, "a")
+    second = send_message(alice, conversation_id, "b")
+    assert client.delete(f"/api/messages/{second}", headers=alice).status_code == 200
+    assert unread_of(db, conversation_id, user_id(bob)) == 1
+    assert_counters_reconciled(db, conversation_id)
+
+
+def test_deleting_read_message_keeps_counter(client, db, conversation, send_message, user_id):
+    alice, bob, conversation_id = conversation
+    first = send_message(alice, conversation_id, "a")
+    client.post(f"/api/conversations/{conversation_id}/mark-read", headers=bob)
+    send_message(alice, conversation_id, "b")
+
+    client.delete(f"/api/messages/{first}", headers=alice)
+    assert unread_of(db, conversation_id, user_id(bob)) == 1
+    assert_counters_reconciled(db, conversation_id)
+
+
+def test_counter_never_goes_negative(client, db, conversation, send_message, user_id):
+    alice, bob, conversation_id = conversation
+    message_id = send_message(alice, conversation_id, "a")
+    # Compteur déjà remis à zéro sans que la marque n'avance (état dégradé)
+    asyncio.run(db.conversations.update_one(
+        {"_id": ObjectId(conversation_id)}, {"$set": {f"unread.{user_id(bob)}": 0}}
+    ))
+    client.delete(f"/api/messages/{message_id}", headers=alice)
+    assert unread_of(db, conversation_id, user_id(bob)) == 0
@@ -0,0 +1,117 @@
+import hashlib
+
+import pytest
+
+import media_store
+
+CHUNK = 1024
+DATA = bytes(range(256)) * 10  # 2560 octets : deux morceaux pleins et un partiel
+
+
+@pytest.fixture(autouse=True)
+def uploads_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_store, "UPLOADS_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(media_store, "UPLOAD_CHUNK_BYTES", CHUNK)
+    return tmp_path / "uploads"
+
+
+def sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk(index: int) -> bytes:
+    return DATA[index * CHUNK:(index + 1) * CHUNK]
+
+
+def put_chunk(client, headers, upload_id, index, body, checksum=None):
+    return client.put(
+        f"/api/media/uploads/{upload_id}/chunks/{index}",
+        content=body,
+        headers={**headers, "X-Chunk-SHA256": checksum or sha(body)},
+    )
+
+
+@pytest.fixture
+def session(client, register):
+    headers, _ = register(1)
+    created = client.post("/api/media/uploads", json={"size": len(DATA)}, headers=headers).json()
+    return headers, created["uploadId"]
+
+
+def test_chunks_in_order_advance_offset(client, session):
+    headers, upload_id = session
+    for index in range(3):
+        response = put_chunk(client, headers, upload_id, index, chunk(index))
+        assert response.status_code == 200
+    assert response.json()["offset"] == len(DATA)
+    assert media_store.upload_part_path(upload_id).read_bytes() == DATA
+
+
+def test_checksum_mismatch_keeps_offset(client, session):
+    headers, upload_id = session
+    response = put_chunk(client, headers, upload_id, 0, chunk(0), checksum="0" * 64)
+    assert response.status_code == 400
+    status = client.get(f"/api/media/uploads/{upload_id}", headers=headers).json()
+    assert status["offset"] == 0
+    assert status["nextChunk"] == 0
+
+
+def test_missing_checksum_rejected(client, session):
+    headers, upload_id = session
+    response = client.put(f"/api/media/uploads/{upload_id}/chunks/0", content=chunk(0), headers=headers)
+    assert response.status_code == 400
+
+
+def test_out_of_order_chunk_conflicts(client, session):
+    headers, upload_id = session
+    assert put_chunk(client, headers, upload_id, 1, chunk(1)).status_code == 409
+
+
+def test_valid_retry_is_idempotent(client, session):
+    headers, upload_id = session
+    put_chunk(client, headers, upload_id, 0, chunk(0))
+    response = put_chunk(client, headers, upload_id, 0, chunk(0))
+    assert response.status_code == 200
+    assert response.json()["offset"] == CHUNK
+
+
+@pytest.mark.parametrize("bad_body", [b"x" * CHUNK, chunk(0)[:100]], ids=["corrupted", "truncated"])
+def test_bad_retry_does_not_overwrite_accepted_bytes(client, session, bad_body):
+    headers, upload_id = session
+    put_chunk(client, headers, upload_id, 0, chunk(0))
+    # Le renvoi annonce la somme du morceau d'origine mais transporte d'autres octets
+    response = put_chunk(client, headers, upload_id, 0, bad_body, checksum=sha(chunk(0)))
+    assert response.status_code == 400
+
+    for index in (1, 2):
+        put_chunk(client, headers, upload_id, index, chunk(index))
+    assert media_store.upload_part_path(upload_id).read_bytes() == DATA
+
+
+def test_retry_with_different_bytes_and_matching_checksum_conflicts(client, session):
+    headers, upload_id = session
+    put_chunk(client, headers, upload_id, 0, chunk(0))
+    # Autres octets, accompagnés de leur propre somme : cohérents pour le client
+    forged = b"y" * CHUNK
+    response = put_chunk(client, headers, upload_id, 0, forged)
+    assert response.status_code == 409
+    assert media_store.upload_part_path(upload_id).read_bytes()[:CHUNK] == chunk(0)
+
+
+def test_oversized_chunk_rejected(client, session):
+    headers, upload_id = session
+    body = chunk(0) + b"extra"
+    assert put_chunk(client, headers, upload_id, 0, body).status_code == 413
+
+
+def test_complete_requires_all_chunks(client, session):
+    headers, upload_id = session
+    put_chunk(client, headers, upload_id, 0, chunk(0))
+    assert client.post(f"/api/media/uploads/{upload_id}/complete", headers=headers).status_code == 409
+
+
+def test_session_is_private(client, session, register):
+    _, upload_id = session
+    other, _ = register(2)
+    assert client.get(f"/api/media/uploads/{upload_id}", headers=other).status_code == 404
+    assert put_chunk(client, other, upload_id, 0, chunk(0)).status_code == 404